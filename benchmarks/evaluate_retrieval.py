@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality vs speed, across configurations, in one table.
+
+Runs a labelled question set through `vectorstore.query` once per
+configuration and reports recall@k, MRR and nDCG@k next to p50/p95 latency
+and embedding tokens/cost.
+
+Questions file (JSON list); `relevant` holds DOIs or OpenAlex IDs, either as
+a list or as {id: grade} for graded relevance:
+    [
+      {"question": "How do Reformed theologians read Romans 9?",
+       "relevant": ["10.1017/s0036930600012345", "https://openalex.org/W123"]}
+    ]
+
+A configuration is a name plus setting overrides, e.g.
+    --config baseline
+    --config "int8:QUANTIZATION=int8,RESCORE_MULTIPLIER=2"
+    --config "hash4:SHARD_MODE=hash,SHARD_COUNT=4"
+Overrides apply to the running process; caches are reset between
+configurations, and each configuration gets an empty shared state database
+so its query embeddings are paid for (and counted) again. That spend is
+added to the real usage budget afterwards. Settings that only take effect when a collection is built
+(HNSW_*, SHARD_MODE) need a store built that way, e.g. with
+CHROMA_PERSIST_DIRECTORY pointing at a copy.
+
+Usage:
+    python benchmarks/evaluate_retrieval.py questions.json --k 5 \\
+        --config baseline --config "binary:QUANTIZATION=binary,RESCORE_MULTIPLIER=4"
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import metrics, usage_tracker, vectorstore  # noqa: E402
+from src.config import get_settings  # noqa: E402
+from src.ingest import normalize_doi  # noqa: E402
+from src.retrieval_metrics import ndcg_at_k, reciprocal_rank  # noqa: E402
+
+SETTINGS = get_settings()
+
+
+def parse_config(spec: str) -> Tuple[str, Dict[str, str]]:
+    """Split "name:KEY=VAL,KEY=VAL" into (name, {field: value})."""
+    name, _, assignments = spec.partition(":")
+    overrides = {}
+    for assignment in filter(None, assignments.split(",")):
+        key, _, value = assignment.partition("=")
+        field = key.strip().lower()
+        if field not in type(SETTINGS).model_fields:
+            raise SystemExit(f"[ERROR] Unknown setting '{key}' in --config {spec!r}")
+        overrides[field] = value.strip()
+    return name, overrides
+
+
+def apply_overrides(overrides: Dict[str, str], defaults: Dict[str, object], state_db: Optional[str] = None) -> None:
+    """Reset SETTINGS to `defaults`, apply `overrides` (coerced to each field's type) and drop caches.
+
+    With `state_db`, the shared state (embedding cache, usage) goes to that file instead.
+    """
+    for field, value in defaults.items():
+        setattr(SETTINGS, field, value)
+    for field, raw in overrides.items():
+        annotation = type(SETTINGS).model_fields[field].annotation
+        if raw.lower() in ("", "none", "null"):
+            raw = None
+        setattr(SETTINGS, field, TypeAdapter(annotation).validate_python(raw))
+    if state_db:
+        SETTINGS.state_db = state_db
+    vectorstore._collections.clear()
+    vectorstore._quantized_indexes.clear()
+    vectorstore._centroids.clear()
+
+
+def hit_keys(hit: dict) -> List[str]:
+    """Identifiers a hit can be matched on: its DOI and its OpenAlex URL."""
+    meta = hit.get("metadata") or {}
+    return [normalize_doi(v) for v in (meta.get("doi"), meta.get("url")) if v]
+
+
+def evaluate(questions: List[dict], k: int) -> dict:
+    """Run every question once and average the quality metrics."""
+    recalls, rrs, ndcgs, latencies = [], [], [], []
+    model = SETTINGS.embedding_model
+    tokens_before = metrics.TOKENS.value(model_type=model)
+    cost_before = metrics.COST.value(model_type=model)
+
+    for item in questions:
+        relevant = item["relevant"]
+        if isinstance(relevant, dict):
+            relevant = {normalize_doi(key): grade for key, grade in relevant.items()}
+        else:
+            relevant = [normalize_doi(key) for key in relevant]
+
+        start = time.perf_counter()
+        hits = vectorstore.query(item["question"], top_k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        # One identifier per hit: whichever of its keys is labelled, else its first key
+        retrieved = []
+        for hit in hits:
+            keys = hit_keys(hit)
+            retrieved.append(next((key for key in keys if key in relevant), keys[0] if keys else hit["id"]))
+
+        # Share of all labelled papers found in the top k
+        found = len(set(relevant) & set(retrieved[:k]))
+        recalls.append(found / len(relevant) if relevant else 1.0)
+        rrs.append(reciprocal_rank(relevant, retrieved, k))
+        ndcgs.append(ndcg_at_k(relevant, retrieved, k))
+
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return {
+        "recall": float(np.mean(recalls)),
+        "mrr": float(np.mean(rrs)),
+        "ndcg": float(np.mean(ndcgs)),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "embed_model": model,
+        "embed_tokens": int(metrics.TOKENS.value(model_type=model) - tokens_before),
+        "embed_cost": metrics.COST.value(model_type=model) - cost_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality-vs-speed comparison")
+    parser.add_argument("questions", help="Labelled questions JSON")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--config", action="append", default=[],
+                        help='"name" or "name:KEY=VAL,KEY=VAL" (repeatable; default: baseline)')
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Passes per configuration (warms caches); the last pass's quality and latency "
+                             "and the first pass's tokens/cost are reported")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args()
+
+    questions = json.loads(Path(args.questions).read_text())
+    configs = [parse_config(spec) for spec in (args.config or ["baseline"])]
+    defaults = {field: getattr(SETTINGS, field) for field in type(SETTINGS).model_fields}
+
+    print(f"{len(questions)} questions, k={args.k}\n")
+    header = (f"{'config':<16}{'recall@k':>9}{'MRR':>7}{'nDCG@k':>8}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'tokens':>8}{'cost $':>10}")
+    print(header)
+    print("-" * len(header))
+    results = []
+    state_dir = Path(tempfile.mkdtemp(prefix="grayson-eval-"))
+    for index, (name, overrides) in enumerate(configs):
+        # A fresh embedding cache per configuration, so every one pays for its own query embeddings
+        apply_overrides(overrides, defaults, state_db=str(state_dir / f"config-{index}.sqlite3"))
+        passes = [evaluate(questions, args.k) for _ in range(args.repeat)]
+        row = dict(passes[-1], config=name, overrides=overrides,
+                   embed_tokens=passes[0]["embed_tokens"], embed_cost=passes[0]["embed_cost"])
+        results.append(row)
+        print(f"{name:<16}{row['recall']:>9.3f}{row['mrr']:>7.3f}{row['ndcg']:>8.3f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['embed_tokens']:>8}{row['embed_cost']:>10.6f}")
+    apply_overrides({}, defaults)
+
+    # The temporary databases kept the spend out of the real budget; add it there now
+    for model in {row["embed_model"] for row in results}:
+        tokens = sum(row["embed_tokens"] for row in results if row["embed_model"] == model)
+        if tokens:
+            usage_tracker.record_usage(model, tokens)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-ins for every upstream API GRAYSON calls.
+
+Serves, on one port:
+- OpenAI:           POST /v1/embeddings, POST /v1/chat/completions (incl. streaming)
+- OpenAlex:         GET  /works
+- Unpaywall:        GET  /v2/{doi}
+- Semantic Scholar: GET  /graph/v1/paper/DOI:{doi}, GET /graph/v1/paper/search
+
+With --rpm-limit/--tpm-limit the OpenAI routes enforce a 60 s sliding
+window the way the real API does: x-ratelimit-* headers on every response,
+429 + retry-after-ms once the window is spent.
+
+Embeddings are bag-of-words hashes, so similar texts get similar vectors
+and every run produces the same numbers. Latencies are configurable so
+benchmarks can model a realistic (or a degraded) upstream without
+spending money.
+
+Usage:
+    python benchmarks/fake_upstreams.py --port 9100 --chat-ttft-ms 400
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENALEX_BASE_URL=http://127.0.0.1:9100 ...
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = re.compile(r"[a-z0-9]+")
+
+VOCABULARY = (
+    "grace covenant scripture church doctrine faith salvation spirit trinity "
+    "christ god sin hope resurrection kingdom ethics hermeneutics tradition "
+    "reformation patristic eschatology atonement revelation creation mission"
+).split()
+
+
+@dataclass
+class FakeConfig:
+    embed_latency_ms: float = 30.0
+    chat_ttft_ms: float = 300.0  # time to first token
+    chat_tokens_per_sec: float = 80.0
+    completion_tokens: int = 200
+    pdf_latency_ms: float = 80.0
+    pdf_hit_rate: float = 0.3
+    openalex_latency_ms: float = 150.0
+    dimensions: int = 1536
+    rpm_limit: int = 0  # OpenAI requests per minute; 0 = unlimited
+    tpm_limit: int = 0  # OpenAI tokens per minute; 0 = unlimited
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+@lru_cache(maxsize=100_000)
+def _word_vector(word: str, dims: int) -> np.ndarray:
+    return np.random.default_rng(_seed(word)).standard_normal(dims).astype(np.float32)
+
+
+def fake_embedding(text: str, dims: int) -> np.ndarray:
+    """Deterministic unit vector: normalized sum of per-word random vectors."""
+    words = WORDS.findall(text.lower()) or [text]
+    vector = np.sum([_word_vector(w, dims) for w in words], axis=0)
+    return (vector / max(float(np.linalg.norm(vector)), 1e-12)).astype(np.float32)
+
+
+def _tokens(text: str) -> int:
+    return max(1, int(len(text.split()) * 1.3))
+
+
+def _answer_words(prompt: str, count: int) -> list:
+    match = re.search(r"USER QUESTION:\s*(.+)", prompt)
+    question = match.group(1).strip() if match else "the question"
+    rng = random.Random(_seed(prompt))
+    words = f"Scholars discuss {question} as follows.".split()
+    # Cite numbered sources the way the real prompt asks, so marker expansion is exercised
+    markers = [f"[S{n}]" for n in re.findall(r"^\[S(\d+)\]", prompt, re.MULTILINE)]
+    while len(words) < count:
+        if markers and len(words) % 12 == 11:
+            words.append(rng.choice(markers))
+        else:
+            words.append(rng.choice(VOCABULARY))
+    return words[:count]
+
+
+class RateWindow:
+    """60-second sliding window of (time, tokens) per OpenAI call."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm, self.tpm = rpm, tpm
+        self.calls = deque()
+
+    def _headers(self, now: float) -> dict:
+        used = sum(tokens for _, tokens in self.calls)
+        reset = f"{max(0.0, self.calls[0][0] + 60 - now):.3f}s" if self.calls else "0s"
+        headers = {}
+        if self.rpm:
+            headers.update({"x-ratelimit-limit-requests": str(self.rpm),
+                            "x-ratelimit-remaining-requests": str(max(0, self.rpm - len(self.calls))),
+                            "x-ratelimit-reset-requests": reset})
+        if self.tpm:
+            headers.update({"x-ratelimit-limit-tokens": str(self.tpm),
+                            "x-ratelimit-remaining-tokens": str(max(0, self.tpm - used)),
+                            "x-ratelimit-reset-tokens": reset})
+        return headers
+
+    def admit(self, tokens: int):
+        """(allowed, headers)."""
+        now = time.monotonic()
+        while self.calls and self.calls[0][0] <= now - 60:
+            self.calls.popleft()
+        used = sum(t for _, t in self.calls)
+        over_requests = self.rpm and len(self.calls) + 1 > self.rpm
+        over_tokens = self.tpm and self.calls and used + tokens > self.tpm
+        if over_requests or over_tokens:
+            headers = self._headers(now)
+            headers["retry-after-ms"] = str(int((self.calls[0][0] + 60 - now) * 1000) + 1)
+            return False, headers
+        self.calls.append((now, tokens))
+        return True, self._headers(now)
+
+
+def _rate_limited(headers: dict) -> JSONResponse:
+    error = {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}
+    return JSONResponse({"error": error}, status_code=429, headers=headers)
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="GRAYSON fake upstreams")
+    window = RateWindow(config.rpm_limit, config.tpm_limit)
+
+    # ---------------------------------------------------------
+    # OpenAI
+    # ---------------------------------------------------------
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dims = body.get("dimensions") or config.dimensions
+        allowed, headers = window.admit(sum(_tokens(t) for t in inputs))
+        if not allowed:
+            return _rate_limited(headers)
+        await asyncio.sleep(config.embed_latency_ms / 1000)
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(text, dims)
+            if body.get("encoding_format") == "base64":
+                encoded = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                encoded = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": encoded})
+        tokens = sum(_tokens(t) for t in inputs)
+        return JSONResponse({
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }, headers=headers)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        count = min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens)
+        allowed, headers = window.admit(_tokens(prompt) + (body.get("max_tokens") or count))
+        if not allowed:
+            return _rate_limited(headers)
+        words = _answer_words(prompt, count)
+        usage = {
+            "prompt_tokens": _tokens(prompt),
+            "completion_tokens": len(words),
+            "total_tokens": _tokens(prompt) + len(words),
+        }
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model", "fake")}
+        per_token = 1.0 / config.chat_tokens_per_sec if config.chat_tokens_per_sec > 0 else 0.0
+
+        if body.get("stream"):
+            async def events():
+                await asyncio.sleep(config.chat_ttft_ms / 1000)
+                for i, word in enumerate(words):
+                    chunk = dict(base, object="chat.completion.chunk", choices=[{
+                        "index": 0, "delta": {"content": word + " "}, "finish_reason": None,
+                    }])
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(per_token)
+                final = dict(base, object="chat.completion.chunk",
+                             choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    final["usage"] = usage
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+        await asyncio.sleep(config.chat_ttft_ms / 1000 + per_token * len(words))
+        return JSONResponse(dict(base, object="chat.completion", usage=usage, choices=[{
+            "index": 0,
+            "message": {"role": "assistant", "content": " ".join(words)},
+            "finish_reason": "stop",
+        }]), headers=headers)
+
+    # ---------------------------------------------------------
+    # OpenAlex
+    # ---------------------------------------------------------
+    @app.get("/works")
+    async def openalex_works(request: Request, search: str = ""):
+        per_page = int(request.query_params.get("per-page", 25))
+        await asyncio.sleep(config.openalex_latency_ms / 1000)
+        results = []
+        for i in range(per_page):
+            seed = _seed(f"{search}:{i}")
+            rng = random.Random(seed)
+            words = search.lower().split() + [rng.choice(VOCABULARY) for _ in range(120)]
+            rng.shuffle(words)
+            inverted = {}
+            for pos, word in enumerate(words):
+                inverted.setdefault(word, []).append(pos)
+            results.append({
+                "id": f"https://openalex.org/W{seed % 10**10}",
+                "title": f"{search.title()}: Study {i + 1}",
+                "doi": f"https://doi.org/10.5555/fake.{seed % 10**8}",
+                "publication_year": 1950 + seed % 75,
+                "updated_date": "2024-01-01T00:00:00",
+                "abstract_inverted_index": inverted,
+            })
+        return {"meta": {"count": len(results)}, "results": results}
+
+    # ---------------------------------------------------------
+    # Unpaywall / Semantic Scholar
+    # ---------------------------------------------------------
+    def _has_pdf(key: str) -> bool:
+        return (_seed(key) % 1000) / 1000 < config.pdf_hit_rate
+
+    @app.get("/v2/{doi:path}")
+    async def unpaywall(doi: str):
+        await asyncio.sleep(config.pdf_latency_ms / 1000)
+        if not _has_pdf("unpaywall:" + doi):
+            return {"doi": doi, "best_oa_location": None, "oa_locations": []}
+        url = f"https://example.org/pdf/{_seed(doi) % 10**8}.pdf"
+        return {"doi": doi, "best_oa_location": {"url_for_pdf": url}, "oa_locations": []}
+
+    @app.get("/graph/v1/paper/search")
+    async def semantic_scholar_search(query: str = ""):
+        await asyncio.sleep(config.pdf_latency_ms / 1000)
+        pdf = {"url": f"https://example.org/s2/{_seed(query) % 10**8}.pdf"} if _has_pdf("s2s:" + query) else None
+        return {"total": 1, "data": [{"paperId": str(_seed(query)), "openAccessPdf": pdf}]}
+
+    @app.get("/graph/v1/paper/{paper_id:path}")
+    async def semantic_scholar_paper(paper_id: str):
+        await asyncio.sleep(config.pdf_latency_ms / 1000)
+        if not _has_pdf("s2:" + paper_id):
+            return JSONResponse({"paperId": paper_id, "openAccessPdf": None})
+        return {"paperId": paper_id, "openAccessPdf": {"url": f"https://example.org/s2/{_seed(paper_id) % 10**8}.pdf"}}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Latency/shape flags shared with run_benchmark.py."""
+    defaults = FakeConfig()
+    parser.add_argument("--embed-latency-ms", type=float, default=defaults.embed_latency_ms)
+    parser.add_argument("--chat-ttft-ms", type=float, default=defaults.chat_ttft_ms)
+    parser.add_argument("--chat-tokens-per-sec", type=float, default=defaults.chat_tokens_per_sec)
+    parser.add_argument("--completion-tokens", type=int, default=defaults.completion_tokens)
+    parser.add_argument("--pdf-latency-ms", type=float, default=defaults.pdf_latency_ms)
+    parser.add_argument("--pdf-hit-rate", type=float, default=defaults.pdf_hit_rate)
+    parser.add_argument("--openalex-latency-ms", type=float, default=defaults.openalex_latency_ms)
+    parser.add_argument("--dimensions", type=int, default=defaults.dimensions)
+    parser.add_argument("--rpm-limit", type=int, default=defaults.rpm_limit)
+    parser.add_argument("--tpm-limit", type=int, default=defaults.tpm_limit)
+
+
+def config_from_args(args) -> FakeConfig:
+    return FakeConfig(
+        embed_latency_ms=args.embed_latency_ms,
+        chat_ttft_ms=args.chat_ttft_ms,
+        chat_tokens_per_sec=args.chat_tokens_per_sec,
+        completion_tokens=args.completion_tokens,
+        pdf_latency_ms=args.pdf_latency_ms,
+        pdf_hit_rate=args.pdf_hit_rate,
+        openalex_latency_ms=args.openalex_latency_ms,
+        dimensions=args.dimensions,
+        rpm_limit=args.rpm_limit,
+        tpm_limit=args.tpm_limit,
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI/OpenAlex/Unpaywall/Semantic Scholar server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
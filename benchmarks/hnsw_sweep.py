@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Sweep HNSW parameters and report recall@k against p50/p99 query latency.
+
+Copies the vectors of a built collection into throw-away in-memory
+collections, one per (M, construction_ef, search_ef) setting, and runs the
+query set against each. Results are compared to exact brute-force
+neighbours so settings can be chosen from data instead of defaults.
+
+Changing search_ef on a loaded collection does not reach the index that is
+already in memory, so every setting gets a fresh build.
+
+By default the queries are a sample of stored vectors (no API cost).
+Pass --questions to embed real questions instead.
+
+Usage:
+    python benchmarks/hnsw_sweep.py --m 8,16,32 --construction-ef 100,200 --search-ef 10,50,100
+    python benchmarks/hnsw_sweep.py --questions questions.txt --json sweep.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import chromadb
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.retrieval_metrics import exact_top_k, recall_at_k
+from src.vectorstore import collection_space, get_collection, hnsw_metadata, iter_embeddings
+
+ADD_BATCH_SIZE = 1000
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+def load_vectors(collection_name: str):
+    collection = get_collection(collection_name)
+    all_ids = []
+    pages = []
+    for ids, vectors in iter_embeddings(collection):
+        all_ids.extend(ids)
+        pages.append(vectors)
+    vectors = np.concatenate(pages) if pages else np.zeros((0, 0), dtype=np.float32)
+    return all_ids, vectors, collection_space(collection)
+
+
+def load_queries(args, vectors: np.ndarray) -> np.ndarray:
+    if args.questions:
+        from src.embeddings import embed_texts
+
+        questions = [q for q in Path(args.questions).read_text().splitlines() if q.strip()]
+        return embed_texts(questions)
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    return vectors[sample]
+
+
+def build_index(client, ids, vectors, space: str, m: int, construction_ef: int, search_ef: int):
+    """Create an in-memory collection with the given HNSW settings and load the vectors."""
+    name = f"sweep-{m}-{construction_ef}-{search_ef}"
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    collection = client.create_collection(
+        name, metadata=hnsw_metadata(space, m, construction_ef, search_ef)
+    )
+    for start in range(0, len(ids), ADD_BATCH_SIZE):
+        collection.add(
+            ids=ids[start:start + ADD_BATCH_SIZE],
+            embeddings=vectors[start:start + ADD_BATCH_SIZE],
+        )
+    return collection
+
+
+def run_queries(collection, queries, truth, k: int):
+    latencies_ms = []
+    recalls = []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[q], n_results=k, include=[])
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+        recalls.append(recall_at_k(expected, result["ids"][0], k))
+    return float(np.mean(recalls)), latencies_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW recall/latency sweep")
+    parser.add_argument("--collection", default="grayson")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--space", help="Distance space (default: the collection's own)")
+    parser.add_argument("--m", default="8,16,32")
+    parser.add_argument("--construction-ef", default="100,200")
+    parser.add_argument("--search-ef", default="10,25,50,100,200")
+    parser.add_argument("--queries", type=int, default=200, help="Stored vectors to sample as queries")
+    parser.add_argument("--questions", help="Text file with one question per line (uses the embeddings API)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    ids, vectors, space = load_vectors(args.collection)
+    if not ids:
+        print(f"Collection '{args.collection}' is empty.")
+        return
+    space = args.space or space
+    queries = load_queries(args, vectors)
+    truth = [exact_top_k(q, ids, vectors, args.k, space) for q in queries]
+
+    print(f"{len(ids)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, "
+          f"k={args.k}, space={space}\n")
+    print(f"{'M':>4}{'constr_ef':>11}{'search_ef':>11}{'build s':>9}"
+          f"{'recall@k':>10}{'p50 ms':>9}{'p99 ms':>9}")
+
+    client = chromadb.EphemeralClient()
+    rows = []
+    for m in _ints(args.m):
+        for construction_ef in _ints(args.construction_ef):
+            for search_ef in _ints(args.search_ef):
+                start = time.perf_counter()
+                collection = build_index(client, ids, vectors, space, m, construction_ef, search_ef)
+                build_s = time.perf_counter() - start
+                recall, latencies_ms = run_queries(collection, queries, truth, args.k)
+                p50, p99 = np.percentile(latencies_ms, [50, 99])
+                rows.append({
+                    "m": m, "construction_ef": construction_ef, "search_ef": search_ef,
+                    "build_seconds": build_s, "recall_at_k": recall,
+                    "p50_ms": float(p50), "p99_ms": float(p99),
+                })
+                print(f"{m:>4}{construction_ef:>11}{search_ef:>11}{build_s:>9.2f}"
+                      f"{recall:>10.3f}{p50:>9.3f}{p99:>9.3f}")
+                client.delete_collection(collection.name)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "collection": args.collection, "vectors": len(ids), "k": args.k,
+            "space": space, "queries": len(queries), "results": rows,
+        }, indent=2))
+        print(f"\nSaved {len(rows)} rows to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
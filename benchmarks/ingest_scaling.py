@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+How ingestion and search scale with corpus size.
+
+For each size, a fresh process loads a synthetic corpus (see
+synthetic_corpus.py) into an empty temporary chroma_db/ through
+`vectorstore.add_documents` with precomputed embeddings, then times
+`vectorstore.query_by_embedding`. Reports ingest docs/sec, peak RSS,
+on-disk size and query p50/p99 per size.
+
+No API calls are made. The current SHARD_MODE / QUANTIZATION / HNSW_*
+settings apply, so the same run can compare configurations.
+
+Usage:
+    python benchmarks/ingest_scaling.py --sizes 10000,100000,1000000
+    python benchmarks/ingest_scaling.py --sizes 50000 --dims 512 --json scaling.json
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def run_one(size: int, dims: int, batch_size: int, num_queries: int, top_k: int, seed: int) -> dict:
+    """Load `size` documents and time queries. Runs inside the per-size child process."""
+    sys.path.insert(0, str(ROOT))
+    sys.path.insert(0, str(Path(__file__).parent))
+    from synthetic_corpus import generate_embeddings, generate_queries, generate_records
+
+    from src import vectorstore
+
+    generate_seconds = 0.0
+    ingest_seconds = 0.0
+    for start in range(0, size, batch_size):
+        n = min(batch_size, size - start)
+        t0 = time.perf_counter()
+        records = generate_records(start, n, seed)
+        embeddings = generate_embeddings(start, n, dims, seed)
+        t1 = time.perf_counter()
+        vectorstore.add_documents(records, embeddings=embeddings)
+        ingest_seconds += time.perf_counter() - t1
+        generate_seconds += t1 - t0
+
+    # First queries load the index (and build quantized copies / centroids); time them apart
+    queries = generate_queries(num_queries, dims, seed)
+    t0 = time.perf_counter()
+    vectorstore.query_by_embedding(queries[0], top_k)
+    first_query_ms = (time.perf_counter() - t0) * 1000
+
+    latencies = []
+    for q in queries[1:]:
+        t0 = time.perf_counter()
+        vectorstore.query_by_embedding(q, top_k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    p50, p99 = np.percentile(latencies, [50, 99]) if latencies else (0.0, 0.0)
+
+    return {
+        "size": size,
+        "dims": dims,
+        "ingest_seconds": ingest_seconds,
+        "generate_seconds": generate_seconds,
+        "docs_per_second": size / ingest_seconds if ingest_seconds else 0.0,
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        "disk_mib": _dir_size(Path(vectorstore.SETTINGS.chroma_persist_directory)) / 2**20,
+        "first_query_ms": first_query_ms,
+        "query_p50_ms": float(p50),
+        "query_p99_ms": float(p99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest/query scaling benchmark on a synthetic corpus")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated corpus sizes")
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=5000, help="Documents per add_documents call")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary chroma_db/ directories")
+    parser.add_argument("--json", help="Also write results to this file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_one(args.child, args.dims, args.batch_size, args.queries, args.top_k, args.seed)))
+        return
+
+    results = []
+    print(f"{'docs':>10}{'docs/s':>10}{'peak RSS MiB':>14}{'disk MiB':>10}"
+          f"{'1st query ms':>14}{'p50 ms':>9}{'p99 ms':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        workdir = Path(tempfile.mkdtemp(prefix=f"grayson-scale-{size}-"))
+        env = dict(os.environ, CHROMA_PERSIST_DIRECTORY=str(workdir))
+        # A separate process per size: a clean RSS high-water mark and no cached handles
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", str(size), "--dims", str(args.dims),
+             "--batch-size", str(args.batch_size), "--queries", str(args.queries),
+             "--top-k", str(args.top_k), "--seed", str(args.seed)],
+            env=env, cwd=ROOT, capture_output=True, text=True,
+        )
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        if proc.returncode != 0:
+            print(f"{size:>10}  [ERROR] {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(r)
+        print(f"{r['size']:>10}{r['docs_per_second']:>10.0f}{r['peak_rss_mib']:>14.0f}{r['disk_mib']:>10.1f}"
+              f"{r['first_query_ms']:>14.1f}{r['query_p50_ms']:>9.2f}{r['query_p99_ms']:>9.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Measure recall and memory of the quantized first-stage index.
+
+Loads the vectors of a built collection, runs a query set through the
+int8 / binary index with full-precision re-scoring, and compares the
+results to exact brute-force neighbours.
+
+By default the queries are a sample of stored vectors (no API cost).
+Pass --questions to embed real questions instead.
+
+Usage:
+    python benchmarks/quantization_recall.py --k 5 --multipliers 1,2,4,8
+    python benchmarks/quantization_recall.py --questions questions.txt
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.quantization import QuantizedIndex, rescore
+from src.retrieval_metrics import exact_top_k, recall_at_k
+from src.vectorstore import collection_space, get_collection, iter_embeddings
+
+
+def load_vectors(collection_name: str):
+    collection = get_collection(collection_name)
+    all_ids = []
+    pages = []
+    for ids, vectors in iter_embeddings(collection):
+        all_ids.extend(ids)
+        pages.append(vectors)
+    vectors = np.concatenate(pages) if pages else np.zeros((0, 0), dtype=np.float32)
+    return all_ids, vectors, collection_space(collection)
+
+
+def load_queries(args, vectors: np.ndarray) -> np.ndarray:
+    if args.questions:
+        from src.embeddings import embed_texts
+
+        questions = [q for q in Path(args.questions).read_text().splitlines() if q.strip()]
+        return embed_texts(questions)
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    return vectors[sample]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized index recall/memory report")
+    parser.add_argument("--collection", default="grayson")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--modes", default="int8,binary")
+    parser.add_argument("--multipliers", default="1,2,4,8")
+    parser.add_argument("--queries", type=int, default=100, help="Stored vectors to sample as queries")
+    parser.add_argument("--questions", help="Text file with one question per line (uses the embeddings API)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ids, vectors, space = load_vectors(args.collection)
+    if not ids:
+        print(f"Collection '{args.collection}' is empty.")
+        return
+    queries = load_queries(args, vectors)
+    truth = [exact_top_k(q, ids, vectors, args.k, space) for q in queries]
+    by_id = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    print(f"{len(ids)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"float32 vectors: {vectors.nbytes / 1024:.1f} KiB\n")
+    print(f"{'mode':<8}{'mult':>6}{'recall@k':>10}{'index KiB':>11}{'shrink':>8}{'ms/query':>10}")
+
+    for mode in args.modes.split(","):
+        index = QuantizedIndex(ids, vectors, mode=mode)
+        for mult in (int(m) for m in args.multipliers.split(",")):
+            recalls = []
+            start = time.perf_counter()
+            for q, expected in zip(queries, truth):
+                candidates, _ = index.search(q, args.k * mult)
+                candidate_vectors = vectors[[by_id[c] for c in candidates]]
+                ranked = rescore(q, candidates, candidate_vectors, args.k, space)
+                recalls.append(recall_at_k(expected, [doc_id for doc_id, _ in ranked], args.k))
+            elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            print(
+                f"{mode:<8}{mult:>6}{np.mean(recalls):>10.3f}"
+                f"{index.nbytes / 1024:>11.1f}{vectors.nbytes / index.nbytes:>7.1f}x"
+                f"{elapsed_ms:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
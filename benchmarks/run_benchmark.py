@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the GRAYSON API.
+
+Starts the fake upstreams (OpenAI, OpenAlex, Unpaywall, Semantic Scholar)
+and the real app in separate processes, ingests a corpus through /ingest,
+then drives /query at a fixed concurrency. Reports p50/p95/p99 latency,
+requests per second and a per-stage breakdown scraped from /metrics.
+
+Nothing leaves the machine and no money is spent: the app runs against a
+temporary chroma_db/ and shared state database.
+
+Usage:
+    python benchmarks/run_benchmark.py --requests 200 --concurrency 8 --output bench.json
+    python benchmarks/run_benchmark.py --compare bench.json   # fails on regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fake_upstreams import add_arguments  # noqa: E402
+from src.ingest import THEOLOGY_QUERIES  # noqa: E402
+
+# Workers share /metrics through STATE_DB; publish often so scrapes see every worker's latest values
+METRICS_PUBLISH_SECONDS = 1.0
+STAGE_LINE = re.compile(r'^grayson_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} ([0-9.eE+-]+)$')
+
+QUESTION_TEMPLATES = (
+    "What is {topic}?",
+    "How has {topic} developed in recent scholarship?",
+    "Which scholars disagree about {topic}, and why?",
+    "How does {topic} relate to Romans 8?",
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_ready(url: str, timeout: float = 120.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def _wait_for_job(base_url: str, job_id: int, timeout: float = 300.0) -> None:
+    """Wait for a queued /ingest job (multi-worker mode) to finish."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = httpx.get(f"{base_url}/jobs/{job_id}", timeout=10.0).json()
+        if job["status"] == "done":
+            return
+        if job["status"] == "failed":
+            raise RuntimeError(f"Ingest job {job_id} failed: {job['error']}")
+        time.sleep(0.25)
+    raise RuntimeError(f"Ingest job {job_id} did not finish within {timeout:.0f}s")
+
+
+def _fake_args(args) -> list:
+    flags = []
+    for name in ("embed_latency_ms", "chat_ttft_ms", "chat_tokens_per_sec", "completion_tokens",
+                 "pdf_latency_ms", "pdf_hit_rate", "openalex_latency_ms", "dimensions", "rpm_limit", "tpm_limit"):
+        flags += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    return flags
+
+
+def start_processes(args, workdir: Path):
+    fake_port, app_port = _free_port(), _free_port()
+    fake = subprocess.Popen(
+        [sys.executable, str(Path(__file__).parent / "fake_upstreams.py"), "--port", str(fake_port)]
+        + _fake_args(args),
+        cwd=ROOT,
+    )
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="sk-fake-benchmark",
+        OPENAI_BASE_URL=f"{fake_url}/v1",
+        OPENALEX_BASE_URL=fake_url,
+        UNPAYWALL_BASE_URL=fake_url,
+        SEMANTIC_SCHOLAR_BASE_URL=fake_url,
+        CHROMA_PERSIST_DIRECTORY=str(workdir / "chroma_db"),
+        STATE_DB=str(workdir / "state.sqlite3"),
+        LLM_MODE="api",
+        RATE_LIMIT_PER_MINUTE="0",  # one client drives all the load; measure capacity, not the limiter
+        METRICS_PUBLISH_SECONDS=str(METRICS_PUBLISH_SECONDS),
+        # The questions repeat; without this most of the run would be answer-cache hits
+        ANSWER_CACHE_TTL=os.environ.get("ANSWER_CACHE_TTL", "86400") if args.answer_cache else "0",
+        QUERY_LOG_ENABLED="true" if args.answer_cache else "false",
+    )
+    if args.workers > 1:
+        # Supported multi-worker mode: read-only workers plus one writer process
+        command = ["gunicorn", "-c", "gunicorn.conf.py", "--workers", str(args.workers),
+                   "--bind", f"127.0.0.1:{app_port}", "--log-level", "warning", "--access-logfile", "/dev/null",
+                   "src.main:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1",
+                   "--port", str(app_port), "--log-level", "warning"]
+    app = subprocess.Popen(command, cwd=ROOT, env=env)
+    _wait_until_ready(f"{fake_url}/health")
+    _wait_until_ready(f"http://127.0.0.1:{app_port}/health")
+    return fake, app, f"http://127.0.0.1:{app_port}"
+
+
+def scrape_stages(base_url: str, workers: int = 1) -> dict:
+    """{stage: [sum_seconds, count]} from /metrics."""
+    if workers > 1:
+        time.sleep(METRICS_PUBLISH_SECONDS * 1.5)  # let every worker publish its latest values
+    stages = {}
+    for line in httpx.get(f"{base_url}/metrics", timeout=10.0).text.splitlines():
+        match = STAGE_LINE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            stages.setdefault(stage, [0.0, 0.0])[0 if kind == "sum" else 1] += float(value)
+    return stages
+
+
+async def run_load(base_url: str, questions: list, concurrency: int, top_k: Optional[int]):
+    latencies_ms = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        async def one(question: str):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    body = {"question": question} if top_k is None else {"question": question, "top_k": top_k}
+                    response = await client.post("/query", json=body)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                elapsed = (time.perf_counter() - start) * 1000
+                if ok:
+                    latencies_ms.append(elapsed)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in questions))
+        wall_s = time.perf_counter() - start
+    return latencies_ms, errors, wall_s
+
+
+def summarize(latencies_ms: list, errors: int, wall_s: float, before: dict, after: dict) -> dict:
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if latencies_ms else (0, 0, 0)
+    stages = {}
+    for stage, (total, count) in after.items():
+        prev_total, prev_count = before.get(stage, [0.0, 0.0])
+        calls = count - prev_count
+        if calls > 0:
+            stages[stage] = {"calls": int(calls), "mean_ms": (total - prev_total) * 1000 / calls}
+    return {
+        "requests": len(latencies_ms) + errors,
+        "errors": errors,
+        "wall_seconds": wall_s,
+        "rps": len(latencies_ms) / wall_s if wall_s else 0.0,
+        "latency_ms": {
+            "p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "mean": float(np.mean(latencies_ms)) if latencies_ms else 0.0,
+            "max": float(np.max(latencies_ms)) if latencies_ms else 0.0,
+        },
+        "stages": stages,
+    }
+
+
+def print_report(result: dict) -> None:
+    lat = result["latency_ms"]
+    print(f"\nRequests: {result['requests']}  errors: {result['errors']}  "
+          f"wall: {result['wall_seconds']:.1f}s  throughput: {result['rps']:.1f} req/s")
+    print(f"Latency ms  p50 {lat['p50']:.0f}  p95 {lat['p95']:.0f}  p99 {lat['p99']:.0f}  "
+          f"mean {lat['mean']:.0f}  max {lat['max']:.0f}")
+    if result["stages"]:
+        print(f"\n{'stage':<20}{'calls':>8}{'mean ms':>10}")
+        for stage, info in sorted(result["stages"].items(), key=lambda kv: -kv[1]["mean_ms"]):
+            print(f"{stage:<20}{info['calls']:>8}{info['mean_ms']:>10.1f}")
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> bool:
+    """Print deltas against a saved run; False if latency or throughput regressed too far."""
+    ok = True
+    print(f"\n{'metric':<12}{'baseline':>10}{'current':>10}{'change':>9}")
+    for key in ("p50", "p95", "p99"):
+        old, new = baseline["latency_ms"][key], result["latency_ms"][key]
+        change = (new - old) / old if old else 0.0
+        flag = " !" if key == "p95" and change > max_regression else ""
+        ok = ok and not flag
+        print(f"{key + ' ms':<12}{old:>10.0f}{new:>10.0f}{change:>+8.1%}{flag}")
+    old, new = baseline["rps"], result["rps"]
+    change = (new - old) / old if old else 0.0
+    flag = " !" if change < -max_regression else ""
+    ok = ok and not flag
+    print(f"{'req/s':<12}{old:>10.1f}{new:>10.1f}{change:>+8.1%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end GRAYSON benchmark")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup-requests", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=None, help="Sources per query (default: the router's per tier)")
+    parser.add_argument("--topics", type=int, default=len(THEOLOGY_QUERIES), help="Topics to ingest")
+    parser.add_argument("--docs-per-topic", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes; above 1 runs gunicorn.conf.py (read-only workers + writer)")
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="Keep the answer cache and query log on (repeated questions become cache hits)")
+    parser.add_argument("--output", help="Save results as JSON")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed p95/throughput regression vs the baseline (fraction)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="grayson-bench-"))
+    fake, app, base_url = start_processes(args, workdir)
+    try:
+        topics = THEOLOGY_QUERIES[:args.topics]
+        print(f"Ingesting {len(topics)} topics x {args.docs_per_topic} docs...")
+        for topic in topics:
+            response = httpx.post(f"{base_url}/ingest", json={"query": topic, "max_results": args.docs_per_topic},
+                                  timeout=120.0)
+            response.raise_for_status()
+            if response.status_code == 202:
+                _wait_for_job(base_url, response.json()["job_id"])
+        _wait_until_ready(f"{base_url}/ready")
+
+        questions = [QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(topic=topics[i % len(topics)])
+                     for i in range(args.requests)]
+        asyncio.run(run_load(base_url, questions[:args.warmup_requests], args.concurrency, args.top_k))
+
+        print(f"Running {args.requests} queries at concurrency {args.concurrency}...")
+        before = scrape_stages(base_url, args.workers)
+        latencies_ms, errors, wall_s = asyncio.run(run_load(base_url, questions, args.concurrency, args.top_k))
+        after = scrape_stages(base_url, args.workers)
+    finally:
+        app.terminate()
+        fake.terminate()
+        app.wait(timeout=30)
+        fake.wait(timeout=30)
+
+    result = summarize(latencies_ms, errors, wall_s, before, after)
+    result["timestamp"] = datetime.now().isoformat(timespec="seconds")
+    result["config"] = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    print_report(result)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+        print(f"\nSaved results to {args.output}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if not compare(result, baseline, args.max_regression):
+            print("\n[FAIL] Regression beyond --max-regression")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
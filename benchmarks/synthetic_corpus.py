@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Synthetic OpenAlex-shaped corpus with matching embeddings, at any scale.
+
+Works look like OpenAlex API results (including `abstract_inverted_index`),
+so they go through the same parsing as real ingestion. Embeddings are
+clustered by topic (one cluster per entry in THEOLOGY_QUERIES), which keeps
+nearest-neighbour search realistic instead of uniformly random.
+
+Works are derived from (seed, row index) and embeddings from (seed, chunk
+start), so a 1M-row corpus can be produced chunk by chunk without ever
+holding it in memory.
+
+Usage:
+    python benchmarks/synthetic_corpus.py --count 100000 --out synthetic/
+    # -> synthetic/works.jsonl, synthetic/embeddings.npy
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.ingest import THEOLOGY_QUERIES, openalex_record, parse_openalex_work  # noqa: E402
+
+VOCABULARY = (
+    "grace covenant scripture church doctrine faith salvation spirit trinity christ "
+    "god sin hope resurrection kingdom ethics hermeneutics tradition reformation "
+    "patristic eschatology atonement revelation creation mission liturgy sacrament "
+    "prophecy gospel apostle wisdom justice mercy worship prayer community history "
+    "interpretation theology philosophy tradition text argument early modern medieval"
+).split()
+
+NOISE = 0.6  # spread of each topic cluster relative to the unit-length centers
+
+
+def _rng(seed: int, index: int) -> random.Random:
+    return random.Random(seed * 1_000_003 + index)
+
+
+def topic_for(index: int, topics: List[str] = THEOLOGY_QUERIES) -> str:
+    return topics[index % len(topics)]
+
+
+def generate_work(index: int, seed: int = 0, abstract_words: int = 150,
+                  topics: List[str] = THEOLOGY_QUERIES) -> Dict:
+    """One OpenAlex work, deterministic in (seed, index)."""
+    rng = _rng(seed, index)
+    topic = topic_for(index, topics)
+    words = topic.split() * 3 + [rng.choice(VOCABULARY) for _ in range(abstract_words)]
+    rng.shuffle(words)
+    inverted: Dict[str, List[int]] = {}
+    for position, word in enumerate(words):
+        inverted.setdefault(word, []).append(position)
+    work_id = 10**9 + seed * 10**7 + index
+    return {
+        "id": f"https://openalex.org/W{work_id}",
+        "doi": f"https://doi.org/10.5555/synthetic.{seed}.{index}",
+        "title": f"{topic.title()}: {rng.choice(VOCABULARY).title()} and {rng.choice(VOCABULARY).title()}",
+        "publication_year": 1950 + rng.randrange(75),
+        "abstract_inverted_index": inverted,
+        "topic": topic,
+    }
+
+
+def generate_records(start: int, count: int, seed: int = 0, abstract_words: int = 150) -> List[Dict]:
+    """Vector store records (as `ingest_openalex_query` returns them) for rows [start, start+count)."""
+    return [openalex_record(parse_openalex_work(generate_work(i, seed, abstract_words)))
+            for i in range(start, start + count)]
+
+
+def topic_centers(dims: int, seed: int = 0, topics: List[str] = THEOLOGY_QUERIES) -> np.ndarray:
+    centers = np.random.default_rng(seed).standard_normal((len(topics), dims)).astype(np.float32)
+    return centers / np.linalg.norm(centers, axis=1, keepdims=True)
+
+
+def generate_embeddings(start: int, count: int, dims: int = 1536, seed: int = 0,
+                        topics: List[str] = THEOLOGY_QUERIES) -> np.ndarray:
+    """Unit float32 vectors for rows [start, start+count), clustered around their topic."""
+    centers = topic_centers(dims, seed, topics)
+    rng = np.random.default_rng([seed, start])
+    noise = rng.standard_normal((count, dims)).astype(np.float32) * (NOISE / np.sqrt(dims))
+    vectors = centers[np.arange(start, start + count) % len(topics)] + noise
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def generate_queries(count: int, dims: int = 1536, seed: int = 0,
+                     topics: List[str] = THEOLOGY_QUERIES) -> np.ndarray:
+    """Query vectors drawn from the same clusters as the corpus (but not in it)."""
+    centers = topic_centers(dims, seed, topics)
+    rng = np.random.default_rng([seed, 2**31])
+    noise = rng.standard_normal((count, dims)).astype(np.float32) * (NOISE / np.sqrt(dims))
+    vectors = centers[rng.integers(0, len(topics), count)] + noise
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic OpenAlex-shaped corpus")
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--abstract-words", type=int, default=150)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--out", required=True, help="Output directory")
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    matrix = np.lib.format.open_memmap(out / "embeddings.npy", mode="w+", dtype=np.float32,
+                                       shape=(args.count, args.dims))
+    with open(out / "works.jsonl", "w", encoding="utf-8") as f:
+        for start in range(0, args.count, args.chunk_size):
+            n = min(args.chunk_size, args.count - start)
+            for i in range(start, start + n):
+                f.write(json.dumps(generate_work(i, args.seed, args.abstract_words)) + "\n")
+            matrix[start:start + n] = generate_embeddings(start, n, args.dims, args.seed)
+    matrix.flush()
+    print(f"[OK] wrote {args.count} works and a {args.count}x{args.dims} float32 matrix to {out}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Gunicorn settings for serving GRAYSON with several worker processes.
+#
+# WHY YOU NEED IT:
+# - One uvicorn process uses one CPU; this runs one per core
+# - Serving workers are read-only; a single writer process (python -m src.jobs)
+#   is started alongside them to apply queued /ingest jobs
+# - Shared state (usage budget, caches, job queue) lives in SQLite, not in memory
+#
+# Run with: gunicorn -c gunicorn.conf.py src.main:app
+# ================================================================================
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker opens its own Chroma client; don't import the app before forking
+preload_app = False
+
+# LLM calls can take a while; keep this above the slowest expected /query
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+# Workers only read the index and queue writes
+raw_env = ["READ_ONLY=true"]
+
+_writer = None
+
+
+def when_ready(server):
+    """Start the single writer process once the master is up (before workers fork)."""
+    global _writer
+    if os.getenv("START_WRITER", "true").lower() in ("0", "false", "no"):
+        return
+    env = dict(os.environ, READ_ONLY="false")
+    _writer = subprocess.Popen([sys.executable, "-m", "src.jobs"], env=env)
+    server.log.info(f"Started index writer (pid {_writer.pid})")
+
+
+def on_exit(server):
+    if _writer is not None and _writer.poll() is None:
+        _writer.terminate()
+        _writer.wait(timeout=30)
@@ -4,57 +4,130 @@ Bulk ingestion script for theology papers.
 
 This script populates ChromaDB with theology research papers from OpenAlex.
 Run this to set up your RAG system's knowledge base.
+
+Usage:
+    python ingest_theology.py                      # ingest every topic
+    python ingest_theology.py --shard grayson-h02  # rebuild one shard from what it stores
+    python ingest_theology.py --incremental        # only works new/changed since the last run
+    python ingest_theology.py --incremental --every 24   # ...and repeat every 24 hours
+
+Each pass takes the writer lock; if the writer process holds it, the pass is
+queued as a job for it instead.
 """
+import argparse
 import sys
 import time
+from contextlib import ExitStack
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.ingest import ingest_openalex_query
-from src.vectorstore import add_documents
-
-# Theology topics to ingest
-THEOLOGY_QUERIES = [
-    "systematic theology",
-    "biblical theology",
-    "theological anthropology",
-    "doctrine of God",
-    "Christology",
-    "pneumatology",
-    "soteriology",
-    "ecclesiology",
-    "eschatology",
-    "theological hermeneutics",
-    "doctrine of sin",
-    "doctrine of salvation",
-    "doctrine of Trinity",
-    "covenant theology",
-    "theological ethics",
-]
+from src import jobs
+from src.incremental import ingest_topic
+from src.ingest import THEOLOGY_QUERIES
+from src.reindex import reindex
+from src.sharding import all_shards
+from src.vectorstore import list_collection_names, resolve_alias
 
 def main():
     """Ingest theology papers into ChromaDB."""
+    parser = argparse.ArgumentParser(description="GRAYSON theology ingestion")
+    parser.add_argument("--shard", help="Rebuild only this shard from its stored texts and vectors (see SHARD_MODE)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fetch only works new or updated since each topic's last run")
+    parser.add_argument("--every", type=float, metavar="HOURS",
+                        help="With --incremental: keep running, once every HOURS")
+    args = parser.parse_args()
+    if args.shard and args.incremental:
+        parser.error("--shard rebuilds a shard from what it stores; it can't be combined with --incremental")
+    if args.every and not args.incremental:
+        parser.error("--every requires --incremental")
+
+    while True:
+        run(args)
+        if not args.every:
+            break
+        print(f"\nNext run in {args.every:g} hour(s).")
+        time.sleep(args.every * 3600)
+
+
+def run(args):
+    """One pass here under the writer lock, or queued for the writer process if it holds the lock."""
+    if args.shard:
+        check_shard(args.shard)
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(jobs.writer_lock())
+        except RuntimeError:
+            pass
+        else:
+            ingest(args)
+            return
+    if args.shard:
+        job_id = jobs.enqueue("reindex", {"names": [args.shard]})
+    else:
+        job_id = jobs.enqueue("ingest_incremental", {"incremental": args.incremental})
+    print(f"[OK] Another process holds the writer lock; queued job {job_id} (see GET /jobs/{job_id})")
+
+
+def check_shard(shard: str) -> None:
+    """Exit unless `shard` exists and has something stored to rebuild from."""
+    if shard not in all_shards():
+        print(f"Unknown shard '{shard}'. Shards: {', '.join(all_shards())}")
+        sys.exit(1)
+    if resolve_alias(shard) not in list_collection_names():
+        print(f"Shard '{shard}' has nothing stored yet; run a full ingestion instead.")
+        sys.exit(1)
+
+
+def rebuild_shard(shard: str) -> None:
+    """Rebuild one shard from the texts and vectors it already stores.
+
+    Re-fetching from OpenAlex would lose documents added through POST /ingest
+    (and, in hash mode, anything beyond each topic's top results), so the
+    shard is copied into a new version, validated and swapped in like
+    `scripts/reindex.py build` does, without downtime.
+    """
+    check_shard(shard)
+    print(f"Rebuilding shard '{shard}' from its stored documents...")
+    result = reindex([shard])
+    built = result["builds"][shard]
+    if not result["swapped"]:
+        print(f"[ERROR] Validation of '{built['target']}' failed; '{shard}' unchanged: {result['validation'][shard]}")
+        sys.exit(1)
+    print(f"[OK] '{shard}' now serves '{built['target']}' ({built['copied']} documents)")
+
+
+def ingest(args):
+    """One pass over the topics (or a rebuild of one shard)."""
+    if args.shard:
+        rebuild_shard(args.shard)
+        return
+    topics = THEOLOGY_QUERIES
+
     print("=" * 60)
     print("GRAYSON Theology Database Ingestion")
     print("=" * 60)
-    print(f"\nIngesting {len(THEOLOGY_QUERIES)} theology topics...")
-    print(f"This will take several minutes.\n")
+    if args.incremental:
+        print(f"\nRefreshing {len(topics)} theology topics (new and changed works only)...")
+    else:
+        print(f"\nIngesting {len(topics)} theology topics...")
+        print(f"This will take several minutes.\n")
 
     total_ingested = 0
 
-    for i, query in enumerate(THEOLOGY_QUERIES, 1):
-        print(f"[{i}/{len(THEOLOGY_QUERIES)}] Fetching: {query}")
+    for i, query in enumerate(topics, 1):
+        print(f"[{i}/{len(topics)}] Fetching: {query}")
         try:
-            # Fetch papers from OpenAlex
-            records = ingest_openalex_query(query, max_results=20)
-
-            if records:
-                # Add to ChromaDB
-                add_documents(records)
-                total_ingested += len(records)
-                print(f"  [OK] Added {len(records)} papers")
+            # Fetch papers from OpenAlex and embed only the ones not already indexed unchanged
+            # (each record lands in its shard when sharding is on)
+            result = ingest_topic(query, max_results=20, incremental=args.incremental)
+
+            if result["fetched"]:
+                total_ingested += result["changed"]
+                since = f" since {result['since']}" if result["since"] else ""
+                print(f"  [OK] {result['fetched']} papers{since}, {result['changed']} new or changed")
             else:
                 print(f"  [WARN] No papers found")
 
@@ -66,7 +139,7 @@ def main():
             continue
 
     print("\n" + "=" * 60)
-    print(f"Ingestion complete! Total papers: {total_ingested}")
+    print(f"Ingestion complete! Papers added or updated: {total_ingested}")
     print("=" * 60)
     print("\nYour ChromaDB is now populated with theology research.")
     print("You can start querying your RAG system!")
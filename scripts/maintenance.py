@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Inspect and shrink the vector store.
+
+`stats` only reads and is safe against a live server. `clean` and `compact`
+list what they would do unless `--apply` is given; applied, they run under
+the writer lock (or are queued for the writer process if it is running).
+
+Usage:
+    python scripts/maintenance.py stats
+    python scripts/maintenance.py clean             # dry run
+    python scripts/maintenance.py clean --apply
+    python scripts/maintenance.py compact --apply --drop-previous
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import jobs, maintenance
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1e6:.1f} MB"
+
+
+def print_stats(report: dict) -> None:
+    print(f"chroma.sqlite3: {_mb(report['sqlite_bytes'])} ({_mb(report['sqlite_free_bytes'])} free pages)")
+    print(f"Orphaned: {report['orphan_segment_dirs']} segment dir(s) ({_mb(report['orphan_segment_bytes'])}), "
+          f"{report['orphan_log_entries']} log entries")
+    if "docstore" in report:
+        d = report["docstore"]
+        print(f"Document store: {d['documents']} documents, {d['blobs']} blobs, {_mb(d['file_bytes'])}")
+    print(f"\n{'collection':<34} {'count':>8} {'frag':>6} {'log':>7} {'disk':>9} {'memory':>9}  aliases")
+    for c in report["collections"]:
+        print(f"{c['name']:<34} {c['count']:>8} {c['fragmentation']:>6.1%} {c['log_entries']:>7} "
+              f"{_mb(c['disk_bytes']):>9} {_mb(c['memory_bytes']):>9}  {', '.join(c['aliases']) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GRAYSON vector store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    stats_cmd = sub.add_parser("stats", help="Counts, sizes, fragmentation (read-only)")
+    stats_cmd.add_argument("--json", action="store_true")
+
+    clean_cmd = sub.add_parser("clean", help="Remove duplicate-DOI entries and orphaned data")
+    clean_cmd.add_argument("--apply", action="store_true", help="Delete (default: only report)")
+    clean_cmd.add_argument("--wait", action="store_true", help="If queued, wait for the job to finish")
+
+    compact_cmd = sub.add_parser("compact", help="Clean, rebuild every shard compactly and VACUUM")
+    compact_cmd.add_argument("--collection", action="append", help="Alias to rebuild (repeatable, default: every shard)")
+    compact_cmd.add_argument("--drop-previous", action="store_true",
+                             help="Also delete the replaced version (no rollback) to reclaim its space")
+    compact_cmd.add_argument("--grace", type=float, default=30.0,
+                             help="Seconds readers get to switch before the replaced version is dropped")
+    compact_cmd.add_argument("--apply", action="store_true", help="Run (default: only report)")
+    compact_cmd.add_argument("--wait", action="store_true", help="If queued, wait for the job to finish")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(message)s", datefmt="%H:%M:%S")
+
+    start = time.perf_counter()
+    try:
+        if args.command == "stats":
+            report = maintenance.stats()
+            if args.json:
+                print(json.dumps(report, indent=2))
+            else:
+                print_stats(report)
+            return
+        if not args.apply:
+            if args.command == "clean":
+                result = maintenance.clean(dry_run=True)
+            else:
+                result = maintenance.compact(args.collection, dry_run=True)
+                print_stats(result)
+                result = {"would_rebuild": result["would_rebuild"], **maintenance.clean(dry_run=True)}
+            print(json.dumps(result, indent=2))
+            print("[OK] Dry run; use --apply to make changes")
+            return
+
+        if args.command == "clean":
+            kind, payload = "maintenance_clean", {}
+        else:
+            kind, payload = "maintenance_compact", {"names": args.collection, "drop_previous": args.drop_previous,
+                                                    "grace_seconds": args.grace}
+        result, job_id = jobs.run_or_enqueue(kind, payload)
+        if job_id is not None:
+            print(f"[OK] Another process holds the writer lock; queued job {job_id}")
+            if not args.wait:
+                return
+            job = jobs.wait_for(job_id)
+            if job["status"] == "failed":
+                raise RuntimeError(f"Job {job_id} failed: {job['error']}")
+            result = job["result"]
+        print(json.dumps(result, indent=2))
+        if args.command == "compact" and not result["swapped"]:
+            print("[ERROR] Validation failed; aliases unchanged")
+            sys.exit(1)
+        print(f"[OK] {args.command} finished in {time.perf_counter() - start:.1f}s")
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
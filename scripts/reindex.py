@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Rebuild the vector index without downtime.
+
+`build` copies every shard into a new versioned collection (re-embedding
+only if the embedding model changed), validates it, and swaps the aliases
+the API reads through. The previous version is kept for `rollback`.
+
+Builds take the writer lock; if the API's job worker holds it, the build is
+queued as a job instead and runs there.
+
+Usage:
+    python scripts/reindex.py build --queries eval/queries.txt
+    python scripts/reindex.py build --collection grayson --reembed --wait
+    python scripts/reindex.py status
+    python scripts/reindex.py rollback
+    python scripts/reindex.py prune --apply
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import jobs, reindex
+
+
+def _run_or_enqueue(kind: str, payload: dict, wait: bool):
+    """Run a writer task here if we can take the writer lock, else queue it for the writer."""
+    result, job_id = jobs.run_or_enqueue(kind, payload)
+    if job_id is None:
+        return result
+    print(f"[OK] Another process holds the writer lock; queued job {job_id}")
+    if not wait:
+        return None
+    job = jobs.wait_for(job_id)
+    if job["status"] == "failed":
+        raise RuntimeError(f"Job {job_id} failed: {job['error']}")
+    return job["result"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GRAYSON zero-downtime reindexing")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_cmd = sub.add_parser("build", help="Build, validate and swap in new versions")
+    build_cmd.add_argument("--collection", action="append", help="Alias to rebuild (repeatable, default: every shard)")
+    embed = build_cmd.add_mutually_exclusive_group()
+    embed.add_argument("--reembed", dest="reembed", action="store_true", default=None,
+                       help="Re-embed every text (default: only if the embedding model changed)")
+    embed.add_argument("--no-reembed", dest="reembed", action="store_false", help="Always reuse stored vectors")
+    build_cmd.add_argument("--queries", help="File with one validation query per line")
+    build_cmd.add_argument("--force", action="store_true", help="Swap even if validation fails")
+    build_cmd.add_argument("--batch-size", type=int, default=500)
+    build_cmd.add_argument("--pause", type=float, default=0.1, help="Seconds to sleep between batches")
+    build_cmd.add_argument("--wait", action="store_true", help="If queued, wait for the job to finish")
+
+    status_cmd = sub.add_parser("status", help="Show aliases and versions")
+    status_cmd.add_argument("--collection", action="append")
+
+    rollback_cmd = sub.add_parser("rollback", help="Point aliases back at their previous version")
+    rollback_cmd.add_argument("--collection", action="append")
+
+    prune_cmd = sub.add_parser("prune", help="Delete versions older than the rollback target")
+    prune_cmd.add_argument("--collection", action="append")
+    prune_cmd.add_argument("--apply", action="store_true", help="Delete (default: only list)")
+    prune_cmd.add_argument("--wait", action="store_true", help="If queued, wait for the job to finish")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(message)s", datefmt="%H:%M:%S")
+
+    start = time.perf_counter()
+    try:
+        if args.command == "build":
+            queries = None
+            if args.queries:
+                queries = [line.strip() for line in Path(args.queries).read_text().splitlines() if line.strip()]
+            payload = {"names": args.collection, "reembed": args.reembed, "queries": queries,
+                       "force": args.force, "batch_size": args.batch_size, "pause": args.pause}
+            result = _run_or_enqueue("reindex", payload, args.wait)
+            if result is None:
+                return
+            print(json.dumps(result["validation"], indent=2))
+            if not result["swapped"]:
+                print("[ERROR] Validation failed; aliases unchanged")
+                sys.exit(1)
+            copied = sum(b["copied"] for b in result["builds"].values())
+            print(f"[OK] Swapped {len(result['builds'])} alias(es), {copied} rows in {time.perf_counter() - start:.1f}s")
+        elif args.command == "status":
+            print(json.dumps(reindex.status(args.collection), indent=2))
+        elif args.command == "rollback":
+            targets = reindex.rollback(args.collection)
+            print(f"[OK] Rolled back: {', '.join(f'{a} -> {t}' for a, t in targets.items())}")
+        elif not args.apply:
+            names = reindex.prune(args.collection, dry_run=True)
+            print(f"[OK] Would delete {len(names)} version(s): {', '.join(names) or '-'} (use --apply)")
+        else:
+            result = _run_or_enqueue("reindex_prune", {"names": args.collection}, args.wait)
+            if result is not None:
+                print(f"[OK] Deleted {len(result['deleted'])} version(s): {', '.join(result['deleted']) or '-'}")
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Export or import a compact snapshot of the vector store.
+
+A snapshot holds IDs, float32 embeddings, documents and metadata, so a new
+node can be loaded in seconds without re-ingesting or re-embedding.
+
+Imports take the writer lock; if the API's job worker holds it, the import is
+queued as a job instead and runs there.
+
+Usage:
+    python scripts/snapshot.py export snapshots/2024-06-01
+    python scripts/snapshot.py import snapshots/2024-06-01 --replace
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import jobs
+from src.snapshot import export_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GRAYSON vector store snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="Write collections to a snapshot directory")
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--collection", action="append", help="Collection to export (repeatable, default: all)")
+    export_cmd.add_argument("--chunk-size", type=int, default=1000)
+
+    import_cmd = sub.add_parser("import", help="Bulk-load a snapshot directory")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--collection", action="append", help="Collection to import (repeatable, default: all)")
+    import_cmd.add_argument("--chunk-size", type=int, default=1000)
+    import_cmd.add_argument("--replace", action="store_true", help="Drop existing collections first")
+    import_cmd.add_argument("--force", action="store_true", help="Ignore an embedding model mismatch")
+    import_cmd.add_argument("--wait", action="store_true", help="If queued, wait for the job to finish")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(message)s", datefmt="%H:%M:%S")
+
+    start = time.perf_counter()
+    try:
+        if args.command == "export":
+            manifest = export_snapshot(args.path, args.collection, args.chunk_size)
+            rows = sum(c["count"] for c in manifest["collections"].values())
+        else:
+            # The writer may run in another directory, so the job gets an absolute path
+            payload = {"in_dir": str(Path(args.path).resolve()), "names": args.collection,
+                       "replace": args.replace, "chunk_size": args.chunk_size, "force": args.force}
+            imported, job_id = jobs.run_or_enqueue("snapshot_import", payload)
+            if job_id is not None:
+                print(f"[OK] Another process holds the writer lock; queued job {job_id}")
+                if not args.wait:
+                    return
+                job = jobs.wait_for(job_id)
+                if job["status"] == "failed":
+                    raise RuntimeError(f"Job {job_id} failed: {job['error']}")
+                imported = job["result"]
+            rows = sum(imported.values())
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    print(f"[OK] {args.command}ed {rows} rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Pre-answer the most popular questions so they are served from the caches.
+
+Reads the query log (normalized questions per day), ranks questions by
+recency-weighted frequency, and runs the full /query pipeline for each one
+that isn't cached yet, filling the embedding, PDF and answer caches. Stops
+once `--spend-cap` dollars have been spent. Only reads the index, so it is
+safe to run next to a live server; schedule it off-peak (cron, or
+WARM_CACHE_HOUR for the writer process).
+
+Usage:
+    python scripts/warm_cache.py --dry-run      # list what would be warmed
+    python scripts/warm_cache.py --limit 30 --spend-cap 0.10
+    python scripts/warm_cache.py --top 20       # show the query log ranking
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import warming
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GRAYSON predictive cache warming")
+    parser.add_argument("--limit", type=int, default=None, help="Questions to warm (default: WARM_MAX_QUESTIONS)")
+    parser.add_argument("--spend-cap", type=float, default=None, help="Dollars this run may spend (default: WARM_SPEND_CAP)")
+    parser.add_argument("--no-topics", action="store_true", help="Don't fill a thin log with THEOLOGY_QUERIES")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the questions")
+    parser.add_argument("--top", type=int, default=None, metavar="N", help="Print the N most popular questions and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(message)s", datefmt="%H:%M:%S")
+
+    if args.top:
+        print(f"{'score':>8} {'asked':>6}  question")
+        for entry in warming.popular_questions(args.top):
+            print(f"{entry['score']:>8.2f} {entry['count']:>6}  {entry['question']}")
+        return
+
+    result = warming.warm(limit=args.limit, spend_cap=args.spend_cap, include_topics=not args.no_topics,
+                          dry_run=args.dry_run)
+    if args.dry_run:
+        print(json.dumps(result["questions"], indent=2))
+        print("[OK] Dry run; nothing was answered")
+        return
+    print(f"[OK] {result['warmed']} warmed, {result['already_cached']} already cached, ${result['spent']:.4f} spent"
+          + (f" (stopped: {result['stopped']})" if result["stopped"] else ""))
+
+
+if __name__ == "__main__":
+    main()
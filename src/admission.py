@@ -0,0 +1,216 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Admission control for /query: per-client rate limits, a concurrency cap with
+# a short bounded queue, and load shedding.
+#
+# WHY YOU NEED IT:
+# - A burst of queries otherwise becomes unbounded concurrent OpenAI calls,
+#   every request slows down together and the monthly budget drains
+# - Rejects early with 429/503 + Retry-After instead of timing out late
+# - Under pressure, answers get cheaper (no PDF lookups, then retrieval only)
+#   so tail latency stays bounded
+# ================================================================================
+
+"""Token-bucket rate limiting, a bounded wait queue and degraded modes."""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics, shared_state
+from .config import get_settings
+
+SETTINGS = get_settings()
+
+# Degraded modes, from cheapest change to most drastic
+FULL = "full"
+SKIP_PDFS = "skip_pdfs"  # no Unpaywall / Semantic Scholar lookups
+RETRIEVAL_ONLY = "retrieval_only"  # no LLM call, answer from retrieved sources
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    client TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+# Buckets untouched this long are full again and are deleted (checked at most this often, per process)
+PURGE_INTERVAL = 600.0
+_last_purge = 0.0
+
+
+class Rejected(Exception):
+    """Request turned away; becomes a 429/503 response with Retry-After."""
+
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+# ---------------------------------------------------------
+# Per-client token bucket
+# ---------------------------------------------------------
+def take_token(client: str, now: Optional[float] = None, cost: int = 1) -> float:
+    """Spend `cost` tokens (one per question) from `client`'s bucket.
+
+    Buckets live in the shared state database, so the limit holds across
+    worker processes. Refills at `rate_limit_per_minute`, holds up to
+    `rate_limit_burst` tokens. A cost above the burst needs a full bucket and
+    leaves it in debt, so a large batch is paid off before the next request.
+    Blocks on SQLite: call it off the event loop.
+
+    Returns:
+        0.0 if allowed, otherwise seconds until a token is available
+    """
+    rate = SETTINGS.rate_limit_per_minute / 60.0
+    if rate <= 0:
+        return 0.0
+    burst = max(1.0, float(SETTINGS.rate_limit_burst))
+    now = time.time() if now is None else now
+
+    shared_state.connect().execute(_SCHEMA)
+    # BEGIN IMMEDIATE: two workers can't both spend the last token
+    with shared_state.transaction() as conn:
+        row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE client = ?", (client,)).fetchone()
+        tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+        needed = min(float(cost), burst)
+        if tokens < needed:
+            return (needed - tokens) / rate
+        conn.execute("INSERT OR REPLACE INTO rate_buckets (client, tokens, updated_at) VALUES (?, ?, ?)",
+                     (client, tokens - cost, now))
+    if now - _last_purge >= PURGE_INTERVAL:
+        purge_buckets(now)
+    return 0.0
+
+
+def purge_buckets(now: Optional[float] = None) -> int:
+    """Delete buckets that have refilled completely (same as no row); returns how many were removed."""
+    global _last_purge
+    rate = SETTINGS.rate_limit_per_minute / 60.0
+    if rate <= 0:
+        return 0
+    now = time.time() if now is None else now
+    _last_purge = now
+    full_after = max(1.0, float(SETTINGS.rate_limit_burst)) / rate
+    shared_state.connect().execute(_SCHEMA)
+    with shared_state.transaction() as conn:
+        # A bucket in debt (after a batch) takes longer to fill
+        return conn.execute("DELETE FROM rate_buckets WHERE updated_at - MIN(tokens, 0) / ? < ?",
+                            (rate, now - full_after)).rowcount
+
+
+# ---------------------------------------------------------
+# Concurrency cap with a bounded wait queue
+# ---------------------------------------------------------
+class AdmissionController:
+    """At most `max_concurrent` requests run; up to `max_queue` wait at most `max_wait` seconds.
+
+    Limits are per worker process.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, max_wait: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def pressure(self) -> float:
+        """How full the wait queue is, 0.0 - 1.0."""
+        if self.max_queue == 0:
+            return 1.0 if self.active >= self.max_concurrent else 0.0
+        return min(1.0, self.waiting / self.max_queue)
+
+    def mode_for(self, pressure: float) -> str:
+        if pressure >= SETTINGS.degrade_retrieval_only_at:
+            return RETRIEVAL_ONLY
+        if pressure >= SETTINGS.degrade_skip_pdfs_at:
+            return SKIP_PDFS
+        return FULL
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a concurrency slot for the duration of the block; yields the degraded mode.
+
+        Raises:
+            Rejected: queue full, or no slot freed up within `max_wait`
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        mode = self.mode_for(self.pressure())
+        start = time.perf_counter()
+        if self._semaphore.locked() or self.waiting:
+            if self.waiting >= self.max_queue:
+                metrics.ADMISSIONS.inc(result="shed")
+                raise Rejected(503, self.max_wait, "Server busy, please retry shortly")
+            self.waiting += 1
+            metrics.QUEUE_DEPTH.set(self.waiting)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                metrics.ADMISSIONS.inc(result="timeout")
+                raise Rejected(503, self.max_wait, "Server busy, please retry shortly")
+            finally:
+                self.waiting -= 1
+                metrics.QUEUE_DEPTH.set(self.waiting)
+        else:
+            await self._semaphore.acquire()
+        metrics.QUEUE_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+        self.active += 1
+        metrics.ADMISSIONS.inc(result="admitted")
+        try:
+            yield mode
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            SETTINGS.max_concurrent_queries, SETTINGS.max_queued_queries, SETTINGS.max_queue_wait_seconds
+        )
+    return _controller
+
+
+def client_id(request) -> str:
+    """Who a request counts against: the first X-Forwarded-For hop if trusted, else the peer address."""
+    if SETTINGS.trust_forwarded_for:
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+@asynccontextmanager
+async def admit(request, cost: int = 1):
+    """Rate-limit, then queue for a slot; yields the degraded mode to serve the request in.
+
+    `cost` is how many rate-limit tokens the request spends (a batch pays one per question).
+
+    Raises:
+        Rejected: over the client's rate (429) or the server is saturated (503)
+    """
+    # SQLite write with BEGIN IMMEDIATE: keep it off the event loop
+    retry_after = await run_in_threadpool(take_token, client_id(request), None, cost)
+    if retry_after > 0:
+        metrics.ADMISSIONS.inc(result="rate_limited")
+        raise Rejected(429, retry_after, "Too many requests, please slow down")
+
+    async with get_controller().slot() as mode:
+        yield mode
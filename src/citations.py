@@ -0,0 +1,90 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Expands compact source markers ([S1], [S2, S4]) in LLM output into links,
+# and renders the Sources section on the server.
+#
+# WHY YOU NEED IT:
+# - OMNI/JSTOR/free-PDF URLs are hundreds of characters; having the model copy
+#   them spends completion tokens (latency and money) on strings we already have
+# - The model writes "[S1]"; we substitute the real links, so they're never mistyped
+# - Works on a token stream: a marker split across chunks is held back until complete
+# ================================================================================
+
+"""Source markers in, markdown links and a Sources section out."""
+
+import re
+from typing import Dict, List, Optional
+
+# "[S1]", "[S1, S3]", "[S1; S3]"
+_MARKER = re.compile(r"\[S(\d+)((?:\s*[,;]\s*S\d+)*)\]")
+# Text at the end of a chunk that may still grow into a marker
+_PARTIAL = re.compile(r"\[(?:S\d*(?:\s*[,;]\s*(?:S\d*)?)*)?\Z")
+_MAX_MARKER_LENGTH = 40
+
+
+def source_links(hit: dict) -> Dict[str, Optional[str]]:
+    """Title plus OMNI, JSTOR and free-PDF links for one retrieved hit."""
+    from .llm import generate_library_links  # llm imports this module
+
+    meta = hit.get("metadata") or {}
+    title = meta.get("title") or hit.get("id") or "Untitled"
+    links = generate_library_links(title)
+    return {"title": title, "omni": links["omni"], "jstor": links["jstor"], "free_pdf": meta.get("free_pdf")}
+
+
+class CitationExpander:
+    """Rewrites markers to links as text arrives and remembers which sources were cited."""
+
+    def __init__(self, hits: List[dict]):
+        self.links = [source_links(hit) for hit in hits]
+        self.cited: List[int] = []  # 1-based source numbers, in order of first citation
+        self._pending = ""
+
+    def _expand(self, text: str) -> str:
+        def replace(match: re.Match) -> str:
+            numbers = [int(match.group(1))] + [int(n) for n in re.findall(r"\d+", match.group(2))]
+            parts = []
+            for number in numbers:
+                if not 1 <= number <= len(self.links):
+                    continue  # a source that wasn't in the context; drop it
+                if number not in self.cited:
+                    self.cited.append(number)
+                parts.append(f"[[{number}]]({self.links[number - 1]['omni']})")
+            return "".join(parts)
+
+        return _MARKER.sub(replace, text)
+
+    def feed(self, chunk: str) -> str:
+        """Expanded text that is safe to emit now; a possible partial marker is kept back."""
+        text = self._pending + chunk
+        self._pending = ""
+        start = text.rfind("[")
+        if start != -1 and len(text) - start <= _MAX_MARKER_LENGTH and _PARTIAL.match(text, start):
+            text, self._pending = text[:start], text[start:]
+        return self._expand(text)
+
+    def close(self) -> str:
+        """Whatever is still held back, followed by the Sources section."""
+        text = self._expand(self._pending)
+        self._pending = ""
+        return text + "\n\n" + self.sources_section()
+
+    def sources_section(self) -> str:
+        """Markdown list of the cited sources by number (all of them if none were cited)."""
+        numbers = sorted(self.cited) or list(range(1, len(self.links) + 1))
+        if not numbers:
+            return ""
+        lines = ["**Sources:**"]
+        for number in numbers:
+            link = self.links[number - 1]
+            line = f"- **[{number}]** [{link['title']}]({link['omni']}) | [JSTOR]({link['jstor']})"
+            if link["free_pdf"]:
+                line += f" | [Free PDF]({link['free_pdf']})"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def expand_citations(text: str, hits: List[dict]) -> str:
+    """Expand every marker in a complete answer and append the Sources section."""
+    expander = CitationExpander(hits)
+    return expander.feed(text) + expander.close()
@@ -116,18 +116,131 @@ class Settings(BaseSettings):
     semantic_scholar_api_key: str | None = Field(default=None)
     discord_webhook_url: str | None = Field(default=None)
 
+    # Upstream API endpoints (overridable so benchmarks can point at local fakes)
+    openai_base_url: str | None = Field(default=None)  # None = api.openai.com
+    openalex_base_url: str = Field(default="https://api.openalex.org")
+    unpaywall_base_url: str = Field(default="https://api.unpaywall.org")
+    semantic_scholar_base_url: str = Field(default="https://api.semanticscholar.org")
+    openalex_api_key: str | None = Field(default=None)  # premium key; enables from_updated_date filters
+
     # Vector DB / embeddings
     chroma_persist_directory: str = Field(default="./chroma_db")
     embedding_model: str = Field(default="text-embedding-3-small")
+    embedding_dimensions: int | None = Field(default=None)  # None = model's native size
     chunk_size: int = Field(default=500)
 
+    # Document store (see src/docstore.py): texts live outside Chroma, fetched per prompt
+    docstore_enabled: bool = Field(default=True)
+    docstore_path: str | None = Field(default=None)  # None = inside chroma_db/
+    docstore_cache_size: int = Field(default=2048)  # decompressed documents kept per process
+    docstore_inline_max_chars: int = Field(default=256)  # longer metadata strings move to the store
+
+    # Quantized first-stage search
+    quantization: str = Field(default="none")  # "none", "int8" or "binary"
+    rescore_multiplier: int = Field(default=4)  # candidates fetched per result before re-scoring
+
+    # HNSW index (applied when a collection is first created)
+    hnsw_space: str = Field(default="l2")  # "l2", "cosine" or "ip"
+    hnsw_m: int = Field(default=16)  # graph neighbours per node
+    hnsw_construction_ef: int = Field(default=100)
+    hnsw_search_ef: int = Field(default=100)
+    hnsw_sync_threshold: int = Field(default=1000)  # writes kept in Chroma's log before the index is saved
+
+    # Sharding across several collections
+    shard_mode: str = Field(default="none")  # "none", "topic" or "hash"
+    shard_count: int = Field(default=4)  # hash mode only
+    shard_router: bool = Field(default=False)  # search only the shards closest to the query
+    shard_router_top_n: int = Field(default=3)
+
     # LLM settings
     llm_mode: str = Field(default="api")  # "api" or "local"
     model_name: str = Field(default="gpt-3.5-turbo")
 
+    # Complexity routing (see src/router.py); a tier's model falls back to model_name
+    router_enabled: bool = Field(default=True)
+    router_simple_model: str | None = Field(default=None)
+    router_simple_max_tokens: int = Field(default=200)
+    router_simple_top_k: int = Field(default=3)
+    router_standard_model: str | None = Field(default=None)
+    router_standard_max_tokens: int = Field(default=512)
+    router_standard_top_k: int = Field(default=5)
+    router_complex_model: str | None = Field(default=None)
+    router_complex_max_tokens: int = Field(default=1024)
+    router_complex_top_k: int = Field(default=8)
+
+    # Extractive answers (see src/extractive.py): degraded mode, no API key, spent budget
+    extractive_max_sentences: int = Field(default=4)
+    extractive_preview: bool = Field(default=True)  # /query/stream sends one before the LLM answer
+
+    # Query log and cache warming (see src/warming.py)
+    query_log_enabled: bool = Field(default=True)  # count normalized questions per day
+    answer_cache_ttl: int = Field(default=24 * 3600)  # full /query responses, seconds; 0 = off
+    warm_cache_hour: int = Field(default=-1)  # UTC hour the writer warms the caches; -1 = off
+    warm_max_questions: int = Field(default=50)
+    warm_spend_cap: float = Field(default=0.25)  # dollars per warming run
+    warm_window_days: int = Field(default=14)  # query log history considered (and kept)
+    warm_half_life_days: float = Field(default=3.0)  # a day's count weighs half as much this many days later
+
     # Server settings
     host: str = Field(default="0.0.0.0")
     port: int = Field(default=8000)
+    warmup_queries: int = Field(default=3)  # index queries run at startup before /ready passes
+    warmup_retry_max_seconds: float = Field(default=60.0)  # a failed warm-up is retried, backing off up to this
+    gzip_minimum_size: int = Field(default=1000)  # bytes; smaller responses go out uncompressed
+    frontend_cache_seconds: int = Field(default=0)  # 0 = browsers revalidate with the ETag every visit
+
+    # Multi-worker serving (see gunicorn.conf.py)
+    read_only: bool = Field(default=False)  # serving workers: never write the index, queue /ingest jobs
+    state_db: str | None = Field(default=None)  # shared SQLite state; None = next to chroma_db/
+    store_refresh_seconds: float = Field(default=2.0)  # how often readers check for index changes
+    embedding_cache_ttl: int = Field(default=7 * 24 * 3600)  # query embeddings, seconds
+    pdf_cache_ttl: int = Field(default=24 * 3600)  # free-PDF lookups, seconds
+
+    # Admission control on /query (see src/admission.py)
+    rate_limit_per_minute: float = Field(default=30.0)  # per client, shared by all workers; 0 = off
+    rate_limit_burst: int = Field(default=10)
+    trust_forwarded_for: bool = Field(default=False)  # key clients by X-Forwarded-For (behind a proxy)
+    max_concurrent_queries: int = Field(default=8)  # per worker
+    max_queued_queries: int = Field(default=16)  # per worker; beyond this requests get 503
+    max_queue_wait_seconds: float = Field(default=2.0)
+    degrade_skip_pdfs_at: float = Field(default=0.25)  # queue fill at which PDF lookups are skipped
+    degrade_retrieval_only_at: float = Field(default=0.75)  # queue fill at which the LLM is skipped
+
+    # POST /query/batch
+    batch_max_questions: int = Field(default=50)
+    batch_generation_concurrency: int = Field(default=4)  # chat completions in flight per batch
+
+    # Upstream academic APIs (see src/resilience.py); breakers are per worker
+    upstream_timeout_seconds: float = Field(default=5.0)
+    breaker_failure_threshold: int = Field(default=5)  # consecutive failures/slow calls that open a circuit
+    breaker_slow_call_seconds: float = Field(default=2.0)  # slower successful calls count as failures
+    breaker_reset_seconds: float = Field(default=30.0)  # open time before a probe call is allowed
+    hedge_percentile: float = Field(default=90.0)  # start the fallback once the primary is slower than this
+    hedge_default_delay: float = Field(default=0.5)  # seconds, until enough latency samples exist
+
+    # OpenAI rate limits (see src/openai_scheduler.py); learned from x-ratelimit-* headers
+    openai_requests_per_minute: int = Field(default=0)  # assumed until headers arrive; 0 = unknown
+    openai_tokens_per_minute: int = Field(default=0)
+    openai_interactive_reserve: float = Field(default=0.1)  # share of each window ingestion leaves for queries
+    openai_max_retries: int = Field(default=5)
+    openai_backoff_max_seconds: float = Field(default=60.0)
+    embedding_batch_size: int = Field(default=256)  # texts per embeddings request during ingestion
+    embedding_concurrency: int = Field(default=4)  # embeddings requests in flight during ingestion
+
+    # Incremental ingestion (see src/incremental.py)
+    incremental_max_results: int = Field(default=200)  # new/changed works fetched per topic per run
+    incremental_ingest_hours: float = Field(default=0.0)  # the writer queues a refresh this often; 0 = off
+
+    # Observability
+    otel_exporter_endpoint: str | None = Field(default=None)  # e.g. "http://localhost:4317"
+    metrics_publish_seconds: float = Field(default=5.0)  # workers share /metrics via STATE_DB this often; 0 = per process
+
+    # Request profiling (see src/profiling.py)
+    profile_sample_rate: float = Field(default=0.0)  # fraction of requests profiled, 0 = off
+    profile_token: str | None = Field(default=None)  # X-Grayson-Profile header value that forces a profile
+    profile_dir: str = Field(default="./profiles")
+    profile_interval_ms: float = Field(default=5.0)
+    profile_top_n: int = Field(default=15)
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
@@ -0,0 +1,250 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Compressed, content-addressed store for document texts and bulky metadata,
+# keyed by document ID, kept next to the Chroma index.
+#
+# WHY YOU NEED IT:
+# - Chroma only needs IDs, vectors and the small fields we filter and cite by;
+#   storing every abstract alongside the vectors bloats the index and every
+#   query result
+# - Texts are fetched only for hits that actually go into a prompt
+# - zstd (zlib only if `zstandard` isn't installed) shrinks the text
+#   several times; identical records are stored once
+# - A small LRU keeps hot documents decompressed in memory
+# ================================================================================
+
+"""SQLite document store: zstd/zlib blobs addressed by content hash, plus an LRU."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import get_settings
+from .metrics import record_cache
+
+SETTINGS = get_settings()
+
+FILE_NAME = "grayson_docs.sqlite3"
+
+# Metadata kept in Chroma whatever its size: shown in sources and used for PDF lookups
+INLINE_FIELDS = {"title", "doi", "url", "topic", "year"}
+
+_local = threading.local()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    id TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_hash ON docs (hash);
+"""
+
+
+# ---------------------------------------------------------
+# Compression
+# ---------------------------------------------------------
+def _zstd():
+    """The `zstandard` module, or None if it isn't installed."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compress(data: bytes):
+    """(codec, compressed bytes): zstd when available, zlib otherwise."""
+    zstandard = _zstd()
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("Document store has zstd blobs; install the `zstandard` package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+# ---------------------------------------------------------
+# Hot-document cache
+# ---------------------------------------------------------
+class LRUCache:
+    """Thread-safe least-recently-used cache of decoded records, keyed by content hash.
+
+    Content hashes never change meaning, so entries never go stale when
+    another process rewrites a document: the new text has a new hash.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_cache = LRUCache(SETTINGS.docstore_cache_size)
+
+
+# ---------------------------------------------------------
+# Storage
+# ---------------------------------------------------------
+def store_path() -> Path:
+    """DOCSTORE_PATH, default: inside the Chroma directory, so it moves with the index."""
+    if SETTINGS.docstore_path:
+        return Path(SETTINGS.docstore_path)
+    return Path(SETTINGS.chroma_persist_directory) / FILE_NAME
+
+
+def connect() -> sqlite3.Connection:
+    """This thread's connection to the document store (opened once per thread)."""
+    path = str(store_path())
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != path:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn, _local.path = conn, path
+    return conn
+
+
+def split_metadata(metadata: Optional[Dict[str, Any]]):
+    """(inline, stored): short values and INLINE_FIELDS stay in Chroma, long strings move here."""
+    inline, stored = {}, {}
+    for key, value in (metadata or {}).items():
+        if key in INLINE_FIELDS or not isinstance(value, str) or len(value) <= SETTINGS.docstore_inline_max_chars:
+            inline[key] = value
+        else:
+            stored[key] = value
+    return inline, stored
+
+
+def _encode(text: str, metadata: Dict[str, Any]) -> bytes:
+    return json.dumps({"text": text, "metadata": metadata}, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+
+def put_many(ids: List[str], texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Store (or replace) the text and stored metadata of each document, in one transaction."""
+    metadatas = metadatas or [{}] * len(ids)
+    blobs = {}
+    rows = []
+    for doc_id, text, metadata in zip(ids, texts, metadatas):
+        raw = _encode(text or "", metadata or {})
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest not in blobs:
+            blobs[digest] = compress(raw)
+        rows.append((doc_id, digest))
+
+    conn = connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Identical content is stored once; an existing blob is left as is
+        conn.executemany("INSERT OR IGNORE INTO blobs (hash, codec, data) VALUES (?, ?, ?)",
+                         [(digest, codec, data) for digest, (codec, data) in blobs.items()])
+        conn.executemany("INSERT OR REPLACE INTO docs (id, hash) VALUES (?, ?)", rows)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def get_many(ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """{id: {"text", "metadata"}} for the IDs that are in the store (missing IDs are left out)."""
+    if not ids:
+        return {}
+    conn = connect()
+    hashes: Dict[str, str] = {}
+    unique = list(dict.fromkeys(ids))
+    # SQLite caps bound parameters; 500 per statement is well under every default
+    for start in range(0, len(unique), 500):
+        chunk = unique[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        hashes.update(conn.execute(f"SELECT id, hash FROM docs WHERE id IN ({marks})", chunk).fetchall())
+
+    records: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for digest in set(hashes.values()):
+        record = _cache.get(digest)
+        record_cache("docstore", record is not None)
+        if record is None:
+            missing.append(digest)
+        else:
+            records[digest] = record
+    for start in range(0, len(missing), 500):
+        chunk = missing[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        for digest, codec, data in conn.execute(
+                f"SELECT hash, codec, data FROM blobs WHERE hash IN ({marks})", chunk):
+            record = json.loads(decompress(codec, data))
+            _cache.put(digest, record)
+            records[digest] = record
+    return {doc_id: records[digest] for doc_id, digest in hashes.items() if digest in records}
+
+
+def delete_many(ids: List[str]) -> None:
+    """Forget documents; blobs no other document shares are removed with them."""
+    if not ids:
+        return
+    conn = connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("DELETE FROM docs WHERE id = ?", [(doc_id,) for doc_id in ids])
+        conn.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT hash FROM docs)")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def all_ids() -> set:
+    """Every document ID in the store."""
+    return {row[0] for row in connect().execute("SELECT id FROM docs")}
+
+
+def purge_unreferenced() -> int:
+    """Delete blobs no document points to any more (left behind when a document's text changes)."""
+    cursor = connect().execute("DELETE FROM blobs WHERE hash NOT IN (SELECT hash FROM docs)")
+    return cursor.rowcount
+
+
+def stats() -> Dict[str, int]:
+    """Document and blob counts and the stored (compressed) size in bytes."""
+    conn = connect()
+    docs = conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+    blobs, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()
+    return {"documents": docs, "blobs": blobs, "compressed_bytes": size}
@@ -10,11 +10,16 @@
 
 """Embeddings helper using OpenAI API.
 """
-from typing import List
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 import numpy as np
-from openai import OpenAI
 
+from . import shared_state
+from .openai_scheduler import BULK, INTERACTIVE, estimate_tokens, get_scheduler
 from .config import get_settings
+from .metrics import record_cache, timed
 from .usage_tracker import check_usage_limit, record_usage
 
 SETTINGS = get_settings()
@@ -25,12 +30,21 @@ _CLIENT = None
 def get_client():
     global _CLIENT
     if _CLIENT is None:
-        _CLIENT = OpenAI(api_key=SETTINGS.openai_api_key)
+        # Imported lazily so the SDK loads during startup warm-up, not at import
+        from openai import OpenAI
+
+        # Retries (and 429 backoff) are the scheduler's job, shared across threads
+        _CLIENT = OpenAI(api_key=SETTINGS.openai_api_key, base_url=SETTINGS.openai_base_url, max_retries=0)
     return _CLIENT
 
 
-def embed_texts(texts: List[str]) -> np.ndarray:
-    """Convert texts to embeddings using OpenAI API."""
+@timed("embed")
+def embed_texts(texts: List[str], lane: str = INTERACTIVE) -> np.ndarray:
+    """Convert texts to float32 embeddings using OpenAI API.
+
+    If `embedding_dimensions` is set, the API returns shortened vectors of that size.
+    The call waits its turn in the rate-limit scheduler under `lane`.
+    """
     # Check usage limit before making API call
     is_allowed, remaining, limit_message = check_usage_limit()
     if not is_allowed:
@@ -40,24 +54,107 @@ def embed_texts(texts: List[str]) -> np.ndarray:
 
     # Handle empty texts
     if not texts:
-        return np.array([])
+        return np.array([], dtype=np.float32)
 
     # Filter out empty or whitespace-only texts (OpenAI API rejects them)
     valid_texts = [t.strip() for t in texts if t and t.strip()]
 
     if not valid_texts:
-        return np.array([])
+        return np.array([], dtype=np.float32)
+
+    # Only send `dimensions` when configured; older models reject the parameter
+    extra_args = {}
+    if SETTINGS.embedding_dimensions:
+        extra_args["dimensions"] = SETTINGS.embedding_dimensions
 
     # OpenAI embeddings API
-    response = client.embeddings.create(
-        model=SETTINGS.embedding_model,
-        input=valid_texts
+    response = get_scheduler().call(
+        SETTINGS.embedding_model,
+        estimate_tokens(valid_texts),
+        lambda: client.embeddings.with_raw_response.create(
+            model=SETTINGS.embedding_model,
+            input=valid_texts,
+            encoding_format="base64",
+            **extra_args,
+        ),
+        lane=lane,
     )
 
     # Record token usage
     if response.usage:
-        record_usage("text-embedding-3-small", response.usage.total_tokens)
+        record_usage(SETTINGS.embedding_model, response.usage.total_tokens)
+
+    return _decode_embeddings(response.data)
+
+
+def _decode_embeddings(data) -> np.ndarray:
+    """Contiguous float32 matrix from the API's base64 embeddings, one row per input.
+
+    Each row is copied straight from the decoded bytes, so no Python float is
+    ever created (the SDK's default path decodes to bytes, then to lists).
+    Servers that ignore `encoding_format` and send float lists still work.
+    """
+    if not data:
+        return np.array([], dtype=np.float32)
+    rows = []
+    for item in data:
+        if isinstance(item.embedding, str):
+            rows.append(np.frombuffer(base64.b64decode(item.embedding), dtype="<f4"))
+        else:
+            rows.append(np.asarray(item.embedding, dtype=np.float32))
+    out = np.empty((len(rows), len(rows[0])), dtype=np.float32)
+    for item, row in zip(data, rows):
+        out[item.index] = row
+    return out
+
+
+def embed_documents(texts: List[str]) -> np.ndarray:
+    """Embed a bulk ingest in batches, several at once, in the scheduler's ingestion lane.
+
+    Up to `embedding_concurrency` batches of `embedding_batch_size` texts are in
+    flight; the scheduler holds them back once the RPM/TPM budget runs low, and
+    lets user queries go first. Rows come back in input order.
+    """
+    size = max(1, SETTINGS.embedding_batch_size)
+    batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+    if len(batches) <= 1:
+        return embed_texts(texts, lane=BULK)
+    with ThreadPoolExecutor(max_workers=max(1, SETTINGS.embedding_concurrency)) as pool:
+        parts = list(pool.map(lambda batch: embed_texts(batch, lane=BULK), batches))
+    return np.concatenate(parts)
+
+
+def _cache_key(text: str) -> str:
+    digest = hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+    return f"emb:{SETTINGS.embedding_model}:{SETTINGS.embedding_dimensions or 'native'}:{digest}"
+
+
+def embed_queries(texts: List[str]) -> np.ndarray:
+    """Embed several queries (one row each), with one API call for all cache misses.
+
+    The cache key includes the model and dimensions, so changing either never
+    returns vectors from the old embedding space. Texts must be non-empty.
+    """
+    vectors: List[np.ndarray] = [None] * len(texts)
+    missing: Dict[str, List[int]] = {}  # key -> positions, so duplicates are embedded once
+    for i, text in enumerate(texts):
+        key = _cache_key(text)
+        cached = shared_state.cache_get(key)
+        record_cache("embedding", cached is not None)
+        if cached is not None:
+            vectors[i] = np.frombuffer(cached, dtype=np.float32)
+        else:
+            missing.setdefault(key, []).append(i)
+
+    if missing:
+        embedded = embed_texts([texts[positions[0]] for positions in missing.values()])
+        for (key, positions), vector in zip(missing.items(), embedded):
+            shared_state.cache_set(key, vector.tobytes(), ttl=SETTINGS.embedding_cache_ttl)
+            for i in positions:
+                vectors[i] = vector
+    return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
 
-    # Extract embeddings and convert to numpy array
-    embeddings = [item.embedding for item in response.data]
-    return np.array(embeddings)
+def embed_query(text: str) -> np.ndarray:
+    """Embed one query, reusing the shared cache so repeated questions cost nothing."""
+    return embed_queries([text])[0]
@@ -0,0 +1,166 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Extractive answers without an LLM: the sentences of the retrieved abstracts
+# that best match the question, deduplicated and cited.
+#
+# WHY YOU NEED IT:
+# - Under load, over budget, or with no API key there is no model to answer;
+#   the old fallback pasted the first 300 characters of three abstracts
+# - Sentences are scored against the question with TF-IDF cosine similarity,
+#   one matrix product for all of them, so an answer takes milliseconds
+# - Near-duplicate sentences (the same paper indexed twice, or two abstracts
+#   saying the same thing) are skipped, so each sentence adds something
+# - Citations use the same [S1] markers and Sources section as LLM answers
+# ================================================================================
+
+"""Sentence-level TF-IDF scoring and cited extractive summaries."""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .citations import expand_citations, source_links
+from .config import get_settings
+from .metrics import span
+from .vectorstore import hydrate
+
+SETTINGS = get_settings()
+
+# A sentence ends at . ! or ? (plus closing quotes/brackets) followed by a capital or digit
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"'”’)\]]*\s+(?=[\"'“‘(\[]?[A-Z0-9])")
+# Words after which a period doesn't end the sentence
+_ABBREVIATIONS = frozenset({
+    "e.g", "i.e", "cf", "ca", "st", "vs", "etc", "al", "dr", "fr", "rev", "ch", "vol", "pp", "ed", "eds", "trans",
+    # Bible book abbreviations, as in "Rom. 5:1"
+    "gen", "ex", "exod", "lev", "num", "deut", "josh", "judg", "sam", "kgs", "chr", "neh", "esth", "ps", "pss",
+    "prov", "eccl", "isa", "jer", "lam", "ezek", "dan", "hos", "mic", "hab", "zech", "mal", "matt", "mt", "mk",
+    "lk", "jn", "rom", "cor", "gal", "eph", "phil", "col", "thess", "tim", "tit", "philem", "heb", "jas", "pet",
+})
+_LEADING_LABEL = re.compile(r"^\s*(abstract|summary)\s*[:.]?\s*", re.IGNORECASE)
+_TOKEN = re.compile(r"[a-z][a-z'\-]+|\d+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers herself him himself his how i if in into is it its itself just me more most my myself no
+nor not now of off on once only or other our ours ourselves out over own same she should so some such than
+that the their theirs them themselves then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours yourself yourselves
+one two may might must shall upon within without among whether however thus therefore paper article study
+""".split())
+
+MIN_SENTENCE_WORDS = 5
+DUPLICATE_SIMILARITY = 0.6  # a candidate this close to a chosen sentence adds nothing
+DIVERSITY = 0.3  # weight of novelty against relevance when picking the next sentence
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of an abstract, keeping abbreviations and initials ("St.", "J. Smith") intact."""
+    text = _LEADING_LABEL.sub("", " ".join((text or "").split()))
+    sentences: List[str] = []
+    for piece in _SENTENCE_END.split(text):
+        if sentences:
+            last_word = sentences[-1].rsplit(" ", 1)[-1].rstrip(".").lower()
+            if last_word in _ABBREVIATIONS or (len(last_word) == 1 and last_word.isalpha()):
+                sentences[-1] += " " + piece
+                continue
+        sentences.append(piece)
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased content words with a light plural stem ("covenants" -> "covenant")."""
+    tokens = []
+    for word in _TOKEN.findall(text.lower()):
+        word = word.strip("'-")
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def tfidf_matrix(token_lists: List[List[str]]) -> np.ndarray:
+    """L2-normalized sublinear TF-IDF rows, one per token list (IDF over all of them)."""
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, tokens in enumerate(token_lists):
+        for token in tokens:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+    counts = np.zeros((len(token_lists), max(1, len(vocabulary))), dtype=np.float32)
+    np.add.at(counts, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+
+    present = counts > 0
+    idf = np.log((1 + len(token_lists)) / (1 + present.sum(axis=0))) + 1.0
+    weights = np.where(present, 1.0 + np.log(np.maximum(counts, 1.0)), 0.0) * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    return (weights / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+
+
+def select_sentences(question: str, hits: List[dict], max_sentences: int = 4) -> List[Tuple[int, int, str]]:
+    """The best sentences as (hit index, position in its abstract, sentence), in reading order.
+
+    Relevance is cosine similarity to the question, nudged towards higher-ranked
+    hits and opening sentences. Picking is greedy (maximal marginal relevance):
+    each next sentence trades relevance against similarity to those already
+    chosen, and near-duplicates are skipped outright.
+    """
+    candidates: List[Tuple[int, int, str]] = []
+    for index, hit in enumerate(hits):
+        for position, sentence in enumerate(split_sentences(hit.get("document") or "")):
+            if len(sentence.split()) >= MIN_SENTENCE_WORDS:
+                candidates.append((index, position, sentence))
+    if not candidates:
+        return []
+
+    vectors = tfidf_matrix([tokenize(question)] + [tokenize(c[2]) for c in candidates])
+    similarity = vectors[1:] @ vectors[1:].T
+    relevance = vectors[1:] @ vectors[0]
+    ranks = np.asarray([c[0] for c in candidates], dtype=np.float32)
+    positions = np.asarray([c[1] for c in candidates], dtype=np.float32)
+    score = relevance + 0.05 / (1.0 + ranks) + 0.02 * (positions == 0)
+
+    if not relevance.any():
+        # Nothing shares a word with the question: fall back to the top hit's opening
+        return [candidates[int(np.lexsort((positions, ranks))[0])]]
+
+    chosen: List[int] = []
+    redundancy = np.zeros(len(candidates), dtype=np.float32)
+    available = relevance > 0
+    while len(chosen) < max_sentences and available.any():
+        mmr = np.where(available, (1 - DIVERSITY) * score - DIVERSITY * redundancy, -np.inf)
+        best = int(np.argmax(mmr))
+        chosen.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+        available &= redundancy < DUPLICATE_SIMILARITY
+        available[best] = False
+    return sorted((candidates[i] for i in chosen), key=lambda c: (c[0], c[1]))
+
+
+def summarize(question: str, hits: List[dict], max_sentences: Optional[int] = None) -> str:
+    """A cited extractive answer: chosen sentences grouped by source, then the Sources section."""
+    with span("extractive"):
+        hydrate(hits)  # texts are fetched only for the hits that are summarized
+        picked = select_sentences(question, hits, max_sentences or SETTINGS.extractive_max_sentences)
+        if not picked:
+            return "No sources found." if not hits else expand_citations(
+                "The retrieved sources have no abstracts to quote; see the sources below.", hits)
+
+        paragraphs, current, group = [], None, []
+        for index, _, sentence in picked:
+            if index != current and group:
+                paragraphs.append(" ".join(group) + f" [S{current + 1}]")
+                group = []
+            current = index
+            group.append(sentence)
+        paragraphs.append(" ".join(group) + f" [S{current + 1}]")
+
+        text = "From the retrieved sources:\n\n" + "\n\n".join(paragraphs)
+        uncited = [hit for i, hit in enumerate(hits) if i not in {p[0] for p in picked}]
+        if uncited:
+            suggestion = source_links(uncited[0])
+            text += f"\n\n**Have you considered?** [{suggestion['title']}]({suggestion['omni']}) (OMNI)"
+        return expand_citations(text, hits)
@@ -0,0 +1,123 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Incremental (delta) ingestion: per-topic high-water marks, OpenAlex date
+# filters, and content hashes so only new or changed works are embedded.
+#
+# WHY YOU NEED IT:
+# - A full run re-fetches and re-embeds the same top results for every topic
+# - With a high-water mark, a topic only asks OpenAlex for works since its
+#   last successful run; unchanged records are skipped before embedding
+# - The writer (or `ingest_theology.py --incremental --every HOURS`) runs it
+#   on a schedule, so nightly refreshes cost seconds and cents
+#
+# Run with: python ingest_theology.py --incremental
+# ================================================================================
+
+"""High-water marks per topic and hash-based change detection for ingestion."""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from . import shared_state
+from .config import get_settings
+from .ingest import THEOLOGY_QUERIES, ingest_openalex_query, openalex_record, search_openalex_since
+from .vectorstore import add_documents, document_id, stored_hashes
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = get_settings()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_watermarks (
+    topic TEXT PRIMARY KEY,
+    since TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+# ---------------------------------------------------------
+# High-water marks
+# ---------------------------------------------------------
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _connect():
+    conn = shared_state.connect()
+    conn.execute(_SCHEMA)
+    return conn
+
+
+def get_watermark(topic: str) -> Optional[str]:
+    """ISO date of the topic's last successful run (None if it never ran incrementally)."""
+    row = _connect().execute("SELECT since FROM ingest_watermarks WHERE topic = ?", (topic,)).fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(topic: str, since: str) -> None:
+    _connect().execute("INSERT OR REPLACE INTO ingest_watermarks (topic, since, updated_at) VALUES (?, ?, ?)",
+                       (topic, since, time.time()))
+
+
+def list_watermarks() -> Dict[str, str]:
+    return dict(_connect().execute("SELECT topic, since FROM ingest_watermarks ORDER BY topic"))
+
+
+# ---------------------------------------------------------
+# Change detection
+# ---------------------------------------------------------
+def changed_records(records: List[Dict[str, Any]], topic: Optional[str] = None) -> List[Dict[str, Any]]:
+    """The records that are new or whose content hash differs from the indexed copy."""
+    ids = [document_id(r.get("id")) for r in records]
+    known = stored_hashes(ids, topic)
+    changed = []
+    for doc_id, record in zip(ids, records):
+        digest = (record.get("metadata") or {}).get("content_hash")
+        if digest is None or known.get(doc_id) != digest:
+            changed.append(record)
+    return changed
+
+
+def ingest_topic(topic: str, max_results: int = 20, incremental: bool = True) -> Dict[str, Any]:
+    """Fetch a topic and index what changed.
+
+    With `incremental` and a high-water mark, only works new or updated since
+    the mark are fetched (up to `incremental_max_results`); otherwise the top
+    `max_results` by relevance. Either way unchanged records are not
+    re-embedded. The mark moves to today's date (UTC) once the topic is
+    indexed; the next run re-reads that day, and the hashes make the overlap free.
+    """
+    started = _today()
+    since = get_watermark(topic) if incremental else None
+    if since:
+        records = [openalex_record(r) for r in search_openalex_since(topic, since, SETTINGS.incremental_max_results)]
+    else:
+        records = ingest_openalex_query(topic, max_results=max_results)
+    changed = changed_records(records, topic)
+    if changed:
+        add_documents(changed, topic=topic, upsert=True)
+    set_watermark(topic, started)
+    return {"topic": topic, "since": since, "fetched": len(records), "changed": len(changed)}
+
+
+def run(topics: Optional[List[str]] = None, incremental: bool = True, max_results: int = 20,
+        pause: float = 1.0) -> Dict[str, Any]:
+    """Ingest every topic (default: THEOLOGY_QUERIES); a failing topic keeps its mark and is retried next run."""
+    results, failed = [], []
+    for topic in topics or THEOLOGY_QUERIES:
+        try:
+            result = ingest_topic(topic, max_results=max_results, incremental=incremental)
+        except Exception as e:
+            logger.error(f"INGEST: '{topic}' failed: {e}")
+            failed.append(topic)
+            continue
+        logger.info(f"INGEST: '{topic}' since {result['since'] or '-'}: "
+                    f"{result['fetched']} fetched, {result['changed']} new or changed")
+        results.append(result)
+        if pause:
+            time.sleep(pause)  # Be nice to the API
+    return {"topics": results, "failed": failed,
+            "fetched": sum(r["fetched"] for r in results), "changed": sum(r["changed"] for r in results)}
@@ -13,15 +13,49 @@
 
 This module focuses exclusively on academic sources in theology.
 """
+import hashlib
+import json
 import os
 import requests
-from typing import List, Dict
+from typing import List, Dict, Optional
 from urllib.parse import urlencode, quote
 
 from .config import get_settings
 
 SETTINGS = get_settings()
 
+# Theology topics used for bulk ingestion (and as shard names in topic sharding)
+THEOLOGY_QUERIES = [
+    "systematic theology",
+    "biblical theology",
+    "theological anthropology",
+    "doctrine of God",
+    "Christology",
+    "pneumatology",
+    "soteriology",
+    "ecclesiology",
+    "eschatology",
+    "theological hermeneutics",
+    "doctrine of sin",
+    "doctrine of salvation",
+    "doctrine of Trinity",
+    "covenant theology",
+    "theological ethics",
+]
+
+def normalize_doi(value: str) -> str:
+    """Bare, lower-case DOI (or OpenAlex ID) so the same paper compares equal.
+
+    Accepts "10.1/x", "https://doi.org/10.1/X", "doi:10.1/x" or an OpenAlex URL.
+    """
+    value = (value or "").strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/",
+                   "http://dx.doi.org/", "doi:", "https://openalex.org/"):
+        if value.startswith(prefix):
+            return value[len(prefix):]
+    return value
+
+
 def _inverted_index_to_text(inverted_index: dict) -> str:
     """Convert OpenAlex inverted index abstract format to plain text."""
     if not inverted_index or not isinstance(inverted_index, dict):
@@ -34,42 +68,77 @@ def _inverted_index_to_text(inverted_index: dict) -> str:
     return " ".join(word for _, word in word_positions)
 
 
-def search_openalex(query: str, per_page: int = 10) -> List[Dict]:
+def search_openalex(query: str, per_page: int = 10, filters: Optional[Dict[str, str]] = None) -> List[Dict]:
     """Search OpenAlex for theology papers.
 
     Relies on theology-specific search queries to filter results.
+    `filters` become OpenAlex's `filter=key:value,...` parameter.
     """
-    base = "https://api.openalex.org/works"
+    data = _openalex_page(query, per_page, filters)
+    return [parse_openalex_work(item) for item in data.get("results", [])]
+
+
+def _openalex_page(query: str, per_page: int, filters: Optional[Dict[str, str]] = None,
+                   cursor: Optional[str] = None) -> Dict:
+    """One page of OpenAlex /works results (raw JSON)."""
+    base = f"{SETTINGS.openalex_base_url}/works"
 
     params = {
         "search": query,
         "per-page": per_page,
     }
+    if filters:
+        params["filter"] = ",".join(f"{key}:{value}" for key, value in filters.items())
+    if cursor:
+        params["cursor"] = cursor
+    if SETTINGS.openalex_api_key:
+        params["api_key"] = SETTINGS.openalex_api_key
     url = f"{base}?{urlencode(params)}"
 
     r = requests.get(url, timeout=15)
     r.raise_for_status()
-    data = r.json()
+    return r.json()
 
-    results = []
-    for item in data.get("results", []):
-        # Handle OpenAlex inverted index abstract format
-        abstract = ""
-        if item.get("abstract_inverted_index"):
-            abstract = _inverted_index_to_text(item.get("abstract_inverted_index"))
-        elif item.get("abstract"):
-            abstract = item.get("abstract")
 
-        results.append({
-            "id": item.get("id"),
-            "title": item.get("title"),
-            "doi": item.get("doi"),
-            "abstract": abstract,
-            "year": item.get("publication_year"),
-        })
+def search_openalex_since(query: str, since: str, max_results: int = 200) -> List[Dict]:
+    """Works matching `query` that are new or changed since `since` (an ISO date).
+
+    OpenAlex only allows `from_updated_date` with a premium API key
+    (OPENALEX_API_KEY); without one this falls back to `from_publication_date`,
+    which finds new works but not edits to older ones. Pages with a cursor up
+    to `max_results` works.
+    """
+    date_filter = "from_updated_date" if SETTINGS.openalex_api_key else "from_publication_date"
+    results: List[Dict] = []
+    cursor = "*"
+    while cursor and len(results) < max_results:
+        data = _openalex_page(query, min(200, max_results - len(results)), {date_filter: since}, cursor)
+        page = data.get("results", [])
+        results.extend(parse_openalex_work(item) for item in page)
+        cursor = (data.get("meta") or {}).get("next_cursor") if page else None
     return results
 
 
+def parse_openalex_work(item: Dict) -> Dict:
+    """Flatten one OpenAlex work into {id, title, doi, abstract, year}."""
+    # Handle OpenAlex inverted index abstract format
+    abstract = ""
+    if item.get("abstract_inverted_index"):
+        abstract = _inverted_index_to_text(item.get("abstract_inverted_index"))
+    elif item.get("abstract"):
+        abstract = item.get("abstract")
+
+    return {
+        "id": item.get("id"),
+        "title": item.get("title"),
+        "doi": item.get("doi"),
+        "abstract": abstract,
+        "year": item.get("publication_year"),
+        "publication_date": item.get("publication_date"),
+        "updated_date": item.get("updated_date"),
+    }
+
+
 def search_semanticscholar(query: str, limit: int = 10) -> List[Dict]:
     """Search Semantic Scholar for theology papers."""
     api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY") or SETTINGS.semantic_scholar_api_key
@@ -109,20 +178,28 @@ def ingest_openalex_query(query: str, max_results: int = 10) -> List[Dict]:
     Returns list of records with `id`, `title`, `text`, `metadata`.
     """
     results = search_openalex(query, per_page=max_results)
-    records = []
-
-    for r in results:
-        text = r.get("abstract") or ""
-        metadata = {
-            "title": r.get("title") or "",
-            "doi": r.get("doi") or "",
-            "year": r.get("year") or 0,
-            "url": r.get("doi") or r.get("id") or "",
-        }
-        records.append({
-            "id": r.get("id"),
-            "title": r.get("title"),
-            "text": text,
-            "metadata": metadata
-        })
-    return records
+    return [openalex_record(r) for r in results]
+
+
+def content_hash(text: str, metadata: Dict) -> str:
+    """Short fingerprint of what gets embedded and stored; unchanged records aren't re-embedded."""
+    raw = json.dumps({"text": text, "metadata": metadata}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def openalex_record(r: Dict) -> Dict:
+    """Turn a parsed OpenAlex result into a vector store record."""
+    text = r.get("abstract") or ""
+    metadata = {
+        "title": r.get("title") or "",
+        "doi": r.get("doi") or "",
+        "year": r.get("year") or 0,
+        "url": r.get("doi") or r.get("id") or "",
+    }
+    metadata["content_hash"] = content_hash(text, metadata)
+    return {
+        "id": r.get("id"),
+        "title": r.get("title"),
+        "text": text,
+        "metadata": metadata
+    }
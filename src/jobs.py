@@ -0,0 +1,254 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# A small ingestion job queue and the single writer process that drains it.
+#
+# WHY YOU NEED IT:
+# - Chroma's local store must only be written by one process at a time
+# - In multi-worker mode the serving workers are read-only and queue /ingest
+#   requests here; exactly one writer (guarded by a file lock) applies them
+# - Jobs live in the shared state database, so any worker can report status
+#
+# Run the writer with: python -m src.jobs
+# ================================================================================
+
+"""SQLite-backed ingestion queue and writer loop."""
+
+import json
+import logging
+import os
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from . import shared_state
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = get_settings()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+def _connect():
+    conn = shared_state.connect()
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def enqueue(kind: str, payload: Dict[str, Any]) -> int:
+    """Queue a job and return its ID."""
+    _connect()
+    with shared_state.transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO jobs (kind, payload, created_at) VALUES (?, ?, ?)",
+            (kind, json.dumps(payload), time.time()),
+        )
+        return cursor.lastrowid
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    row = _connect().execute(
+        "SELECT id, kind, payload, status, result, error, created_at, started_at, finished_at "
+        "FROM jobs WHERE id = ?",
+        (job_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    keys = ("id", "kind", "payload", "status", "result", "error", "created_at", "started_at", "finished_at")
+    job = dict(zip(keys, row))
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def claim_next() -> Optional[Dict[str, Any]]:
+    """Mark the oldest queued job as running and return it (None if the queue is empty)."""
+    _connect()
+    with shared_state.transaction() as conn:
+        row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row[0]))
+    return get_job(row[0])
+
+
+def finish(job_id: int, result: Any = None, error: Optional[str] = None) -> None:
+    _connect()
+    with shared_state.transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            ("failed" if error else "done", json.dumps(result), error, time.time(), job_id),
+        )
+
+
+def requeue_running() -> int:
+    """Put jobs left 'running' by a writer that died back in the queue."""
+    _connect()
+    with shared_state.transaction() as conn:
+        return conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL "
+                            "WHERE status = 'running'").rowcount
+
+
+# ---------------------------------------------------------
+# Writer
+# ---------------------------------------------------------
+@contextmanager
+def writer_lock():
+    """Exclusive lock held by the one process allowed to write the index.
+
+    Raises:
+        RuntimeError: if another writer already holds it
+    """
+    import fcntl
+
+    path = shared_state.state_path().with_suffix(".writer.lock")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError(f"Another writer holds {path}")
+        handle.write(str(os.getpid()))
+        handle.flush()
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def run_or_enqueue(kind: str, payload: Dict[str, Any]) -> Tuple[Any, Optional[int]]:
+    """Run a job in this process if no writer is running, else queue it for the writer.
+
+    For scripts that write the index. Returns (result, None) when it ran
+    here, (None, job ID) when it was queued.
+    """
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(writer_lock())
+        except RuntimeError:
+            pass
+        else:
+            return run_job({"kind": kind, "payload": payload}), None
+    return None, enqueue(kind, payload)
+
+
+def wait_for(job_id: int, poll_interval: float = 2.0) -> Dict[str, Any]:
+    """Block until a job is done or failed; returns the job."""
+    while True:
+        job = get_job(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(poll_interval)
+
+
+def run_job(job: Dict[str, Any]) -> Any:
+    """Apply one job to the index."""
+    from .ingest import ingest_openalex_query
+    from .vectorstore import add_documents
+
+    payload = job["payload"]
+    if job["kind"] == "ingest_openalex":
+        records = ingest_openalex_query(payload["query"], max_results=payload.get("max_results", 5))
+        add_documents(records, topic=payload["query"])
+        return {"ingested": len(records)}
+    if job["kind"] == "ingest_incremental":
+        from . import incremental
+
+        return incremental.run(**payload)
+    if job["kind"] == "maintenance_clean":
+        from . import maintenance
+
+        return maintenance.clean(dry_run=False)
+    if job["kind"] == "maintenance_compact":
+        from . import maintenance
+
+        return maintenance.compact(dry_run=False, **payload)
+    if job["kind"] == "warm_cache":
+        from . import warming
+
+        return warming.warm(**payload)
+    if job["kind"] == "reindex":
+        from . import reindex
+
+        return reindex.reindex(**payload)
+    if job["kind"] == "reindex_prune":
+        from . import reindex
+
+        return {"deleted": reindex.prune(**payload)}
+    if job["kind"] == "snapshot_import":
+        from . import snapshot
+
+        return snapshot.import_snapshot(**payload)
+    raise ValueError(f"Unknown job kind '{job['kind']}'")
+
+
+def _due(kind: str, now: float, interval: float) -> bool:
+    """No `kind` job is queued or running, and the last one was created `interval` seconds ago or more."""
+    last, pending = _connect().execute(
+        "SELECT MAX(created_at), SUM(status IN ('queued', 'running')) FROM jobs WHERE kind = ?", (kind,)
+    ).fetchone()
+    return not pending and (last is None or now - last >= interval)
+
+
+def schedule_due_jobs(now: Optional[float] = None) -> Optional[int]:
+    """Queue periodic jobs that are due; returns the ID of a job queued by this call, if any.
+
+    Incremental ingestion runs every INCREMENTAL_INGEST_HOURS; cache warming
+    once a day during WARM_CACHE_HOUR (UTC), after any ingestion queued with it.
+    """
+    now = time.time() if now is None else now
+    job_id = None
+    if SETTINGS.incremental_ingest_hours > 0 and _due("ingest_incremental", now,
+                                                       SETTINGS.incremental_ingest_hours * 3600):
+        job_id = enqueue("ingest_incremental", {})
+        logger.info(f"WRITER: queued scheduled incremental ingestion (job {job_id})")
+    hour = datetime.fromtimestamp(now, timezone.utc).hour
+    if SETTINGS.warm_cache_hour == hour and _due("warm_cache", now, 20 * 3600):
+        job_id = enqueue("warm_cache", {})
+        logger.info(f"WRITER: queued scheduled cache warming (job {job_id})")
+    return job_id
+
+
+def run_writer(poll_interval: float = 1.0, once: bool = False) -> None:
+    """Drain the job queue forever (or until empty with `once=True`)."""
+    if SETTINGS.read_only:
+        raise RuntimeError("The writer can't run with READ_ONLY=true")
+    with writer_lock():
+        requeued = requeue_running()
+        if requeued:
+            logger.info(f"WRITER: re-queued {requeued} interrupted job(s)")
+        logger.info(f"WRITER: started (pid {os.getpid()})")
+        while True:
+            schedule_due_jobs()
+            job = claim_next()
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            logger.info(f"WRITER: job {job['id']} {job['kind']} {job['payload']}")
+            try:
+                finish(job["id"], result=run_job(job))
+            except Exception as e:
+                logger.exception(f"WRITER: job {job['id']} failed")
+                finish(job["id"], error=str(e))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(message)s", datefmt="%H:%M:%S")
+    run_writer()
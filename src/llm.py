@@ -6,17 +6,23 @@
 # - Interfaces with OpenAI API for response generation
 # - Builds context-aware prompts from retrieved documents
 # - Generates library search links (OMNI, JSTOR)
-# - Provides fallback for local testing without API key
+# - Falls back to an extractive answer (src/extractive.py) without an API key
 # ================================================================================
 
-"""LLM wrapper with an API-based implementation and a placeholder for local models.
+"""LLM wrapper with an API-based implementation and an extractive fallback for local models.
 """
 import os
-from typing import List
+import time
+from typing import Any, Dict, Iterator, List, Optional
 from urllib.parse import quote_plus
 
+from .citations import CitationExpander, expand_citations
 from .config import get_settings
+from . import extractive, router
+from .metrics import TIER_COST, TIER_QUERIES, TIER_SECONDS, span, timed
+from .openai_scheduler import estimate_tokens, get_scheduler
 from .usage_tracker import check_usage_limit, record_usage
+from .vectorstore import hydrate
 
 SETTINGS = get_settings()
 
@@ -30,71 +36,158 @@ def generate_library_links(query: str) -> dict:
     }
 
 
+class StreamFailed(str):
+    """Last piece of a stream whose generation failed: shown to the user, but the answer must not be cached."""
+
+
 class LLMClient:
     def __init__(self):
         self.mode = SETTINGS.llm_mode
         self.model = SETTINGS.model_name
+        self._client = None
+
+    def get_client(self):
+        """Return the OpenAI client, creating it (and its connection pool) once."""
+        if self._client is None:
+            from openai import OpenAI
+
+            # Retries (and 429 backoff) are the scheduler's job, shared across threads
+            self._client = OpenAI(api_key=SETTINGS.openai_api_key, base_url=SETTINGS.openai_base_url, max_retries=0)
+        return self._client
 
-    def generate(self, question: str, context_docs: List[dict]) -> str:
+    @timed("llm_generate")
+    def generate(self, question: str, context_docs: List[dict], route: Optional[Dict[str, Any]] = None) -> str:
         """Generate an answer from question + retrieved context.
 
         Uses OpenAI if `mode` is `api` and `OPENAI_API_KEY` is set. For local models, implement
-        the `LocalLLM` class and swap this implementation.
+        the `LocalLLM` class and swap this implementation. `route` (default: the
+        router's pick for the question) sets the model and completion budget.
         """
-        if self.mode == "api":
-            return self._generate_with_openai(question, context_docs)
-        else:
-            return self._generate_placeholder(question, context_docs)
-
-    def _generate_with_openai(self, question: str, context_docs: List[dict]) -> str:
+        route = route or router.route(question)
+        TIER_QUERIES.inc(tier=route["tier"])
+        start = time.perf_counter()
+        try:
+            if self.mode == "api":
+                return self._generate_with_openai(question, context_docs, route)
+            else:
+                return extractive.summarize(question, context_docs)
+        finally:
+            TIER_SECONDS.observe(time.perf_counter() - start, tier=route["tier"])
+
+    def retrieval_only(self, question: str, context_docs: List[dict]) -> str:
+        """Answer from the retrieved sources alone, without an LLM call (used under load)."""
+        return extractive.summarize(question, context_docs)
+
+    def _record_usage(self, route: Dict[str, Any], usage) -> None:
+        """Charge a completion to its model's prices and to the route's tier."""
+        cost = (record_usage(f"{route['model']}-input", usage.prompt_tokens)
+                + record_usage(f"{route['model']}-output", usage.completion_tokens))
+        TIER_COST.inc(cost, tier=route["tier"])
+
+    def _generate_with_openai(self, question: str, context_docs: List[dict], route: Dict[str, Any]) -> str:
         try:
             # Check usage limit before making API call
             is_allowed, remaining, limit_message = check_usage_limit()
             if not is_allowed:
-                return limit_message
-
-            from openai import OpenAI
+                return f"{limit_message}\n\n{extractive.summarize(question, context_docs)}"
 
             api_key = SETTINGS.openai_api_key
-            print(f"DEBUG: API key loaded: {bool(api_key)}")  # DEBUG LINE
             if not api_key:
-                print("DEBUG: No API key, using placeholder")  # DEBUG LINE
-                return self._generate_placeholder(question, context_docs)
-
-            client = OpenAI(api_key=api_key)
-            prompt = self._build_prompt(question, context_docs)
-            resp = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=512,
-                temperature=0.2,
+                return extractive.summarize(question, context_docs)
+
+            client = self.get_client()
+            prompt = self._build_prompt(question, context_docs, route)
+            # max_tokens counts against the TPM limit as soon as the request is sent
+            resp = get_scheduler().call(
+                route["model"],
+                estimate_tokens([prompt]) + route["max_tokens"],
+                lambda: client.chat.completions.with_raw_response.create(
+                    model=route["model"],
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=route["max_tokens"],
+                    temperature=0.2,
+                ),
             )
 
             # Record token usage
             if resp.usage:
-                record_usage("gpt-3.5-turbo-input", resp.usage.prompt_tokens)
-                record_usage("gpt-3.5-turbo-output", resp.usage.completion_tokens)
+                self._record_usage(route, resp.usage)
 
-            return resp.choices[0].message.content.strip()
+            return expand_citations(resp.choices[0].message.content.strip(), context_docs)
         except Exception as e:
             return f"Error calling OpenAI: {e}"
 
-    def _build_prompt(self, question: str, context_docs: List[dict]) -> str:
+    def generate_stream(self, question: str, context_docs: List[dict],
+                        route: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Like `generate`, but yields the answer in pieces as the model produces them.
+
+        Citation markers are expanded on the fly; the Sources section comes last.
+        If the call fails, possibly after some text was sent, the error message
+        comes as a final `StreamFailed` piece.
+        """
+        route = route or router.route(question)
+        TIER_QUERIES.inc(tier=route["tier"])
+        if self.mode != "api" or not SETTINGS.openai_api_key:
+            yield extractive.summarize(question, context_docs)
+            return
+        is_allowed, remaining, limit_message = check_usage_limit()
+        if not is_allowed:
+            yield f"{limit_message}\n\n{extractive.summarize(question, context_docs)}"
+            return
+
+        expander = CitationExpander(context_docs)
+        start = time.perf_counter()
+        try:
+            with span("llm_generate"):
+                client = self.get_client()
+                prompt = self._build_prompt(question, context_docs, route)
+                stream = get_scheduler().call(
+                    route["model"],
+                    estimate_tokens([prompt]) + route["max_tokens"],
+                    lambda: client.chat.completions.with_raw_response.create(
+                        model=route["model"],
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=route["max_tokens"],
+                        temperature=0.2,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    ),
+                )
+                for chunk in stream:
+                    if chunk.usage:
+                        self._record_usage(route, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        text = expander.feed(chunk.choices[0].delta.content)
+                        if text:
+                            yield text
+            yield expander.close()
+        except Exception as e:
+            yield StreamFailed(f"Error calling OpenAI: {e}")
+        finally:
+            TIER_SECONDS.observe(time.perf_counter() - start, tier=route["tier"])
+
+    def _build_prompt(self, question: str, context_docs: List[dict], route: Optional[Dict[str, Any]] = None) -> str:
+        # Sources are numbered instead of listing their URLs: the model cites [S1] and
+        # citations.py substitutes the links, so no completion tokens go to copying them
         ctx_parts = []
-        for d in context_docs:
-            title = d.get('metadata', {}).get('title', d.get('id'))
-            doi = d.get('metadata', {}).get('doi', d.get('metadata', {}).get('url', 'N/A'))
-            free_pdf = d.get('metadata', {}).get('free_pdf')
-            lib_links = generate_library_links(title) if title else {"omni": "", "jstor": ""}
+        hydrate(context_docs)  # texts are fetched only for the hits that go into the prompt
+        for number, d in enumerate(context_docs, start=1):
+            meta = d.get('metadata') or {}
+            title = meta.get('title', d.get('id'))
             ctx_parts.append(
-                f"Source: {title}\n"
-                f"Original URL: {doi}\n"
-                f"OMNI Link: {lib_links['omni']}\n"
-                f"JSTOR Link: {lib_links['jstor']}\n"
-                f"Free PDF: {free_pdf if free_pdf else 'Not available'}\n"
-                f"{d.get('document')[:1500]}"
+                f"[S{number}] {title}\n"
+                f"Free PDF: {'available' if meta.get('free_pdf') else 'not available'}\n"
+                f"{(d.get('document') or '')[:1500]}"
             )
         ctx = "\n\n".join(ctx_parts)
+        if route and route["tier"] == router.SIMPLE:
+            # A short lookup: a long survey of scholars would be cut off by its small max_tokens
+            answer_rule = ("ALWAYS ANSWER THE ACTUAL QUESTION BEING ASKED. This is a short factual question: "
+                           "answer it directly in two to four sentences.")
+        else:
+            answer_rule = ("ALWAYS ANSWER THE ACTUAL QUESTION BEING ASKED. Provide a concise, helpful answer based on "
+                           "the context above and offer detailed explanations concerning multiple scholars "
+                           "perspectives on the topic.")
         prompt = f""" "You are GRAYSON, a scholarly research assistant who analyzes theological concepts and their relationships to biblical texts. In every output, answer the question the user asks before making a reccomendation of source material.
 
 CONTEXT FROM RETRIEVED SOURCES:
@@ -104,55 +197,14 @@ USER QUESTION: {question}
 
 INSTRUCTIONS:
 1. When the user asks how a concept relates to specific verses, explain the theological/scholarly connection between them, not just summarize each verse.
-2. ALWAYS ANSWER THE ACTUAL QUESTION BEING ASKED. Provide a concise, helpful answer based on the context above and offer detailed explanations concerning multiple scholars perspectives on the topic.
-3. Always cite your sources using the OMNI and JSTOR links provided in the context (not the original URL). Use the FULL URL starting with https://.
-4. Format source links as clickable markdown links with the ACTUAL URLs.
-5. Provide multiple sources when possible to give a well-rounded answer.
+2. {answer_rule}
+3. Cite sources inline with their markers exactly as given, e.g. [S1] or [S1, S3]. Cite multiple sources when possible to give a well-rounded answer.
+4. Do NOT write any URLs and do NOT write a Sources list. Links and the Sources section are added automatically from your markers.
+5. When a cited source has a free PDF available, you may say so; the link is added automatically.
 6. End your response with a "Have you considered?" section that suggests ONE highly related topic, resource, or research direction the user might find valuable. This should be genuinely useful and directly related to their query.
-7. When a Free PDF link is available for a source (not "Not available"), ALWAYS include it in your Sources section. Free PDFs are valuable for researchers who may not have institutional access.
 
 FORMAT YOUR RESPONSE AS:
-[Your answer with inline citations]
-
-**Sources:**
-- [Source Title](https://omni.scholarsportal.info/search?q=...) | [JSTOR](https://www.jstor.org/action/doBasicSearch?Query=...) | [Free PDF](actual_free_pdf_url_if_available)
+[Your answer with inline [S1]-style citations]
 
-**Have you considered?** [Your suggestion for a related topic or resource to explore]
-
-IMPORTANT: Replace the "..." with the actual encoded query from the OMNI Link and JSTOR Link URLs provided in each source's context above. If a Free PDF URL is available, include it. If Free PDF says "Not available", omit the Free PDF link for that source. Do NOT use placeholder text."""
+**Have you considered?** [Your suggestion for a related topic or resource to explore]"""
         return prompt
-
-    def _generate_placeholder(self, question: str, context_docs: List[dict]) -> str:
-        # Lightweight fallback for local testing: concatenate top context snippets.
-        snippets = []
-        for d in context_docs[:3]:
-            title = d.get('metadata', {}).get('title', '')
-            url = d.get('metadata', {}).get('doi', d.get('metadata', {}).get('url', ''))
-            snippets.append(f"- [{title}]({url})\n  {d.get('document')[:300]}...")
-
-        sources_text = "\n".join(snippets) if snippets else "No sources found."
-
-        # Set defaults in case no docs found
-        first_title = ""
-        links_1 = {"omni": "", "jstor": ""}
-        second_title = ""
-        links_2 = {"omni": "", "jstor": ""}
-
-        # searching context docs (#1 and 2 most relevant resources to what the user just asked about)
-        # providing their titles to include in the "Have you considered?" section.
-        if context_docs:
-            first_title = context_docs[0].get('metadata', {}).get('title', '')
-            links_1 = generate_library_links(first_title)
-            if len(context_docs) > 1: # >1 prevents crash if only one doc was retreived 
-                second_title = context_docs[1].get('metadata', {}).get('title', '')
-                links_2 = generate_library_links(second_title)
-
-        return f"""Based on the available research, here are relevant sources for your query:
-
-{sources_text}
-
-**Have you considered?**
-- [{first_title}]({links_1['omni']}) (OMNI)
-- [{first_title}]({links_1['jstor']}) (JSTOR)
-- [{second_title}]({links_2['omni']}) (OMNI)
-- [{second_title}]({links_2['jstor']}) (JSTOR)"""
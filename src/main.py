@@ -100,13 +100,24 @@ Choose and implement one of the patterns below based on your architecture.
 # ---------------------------------------------------------
 # Placeholder - Remove when implementing
 # ---------------------------------------------------------
+import asyncio
+import json
 import logging
+import re
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
+import time
+import uuid
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.routing import Match
 
 from .config import get_settings
 
@@ -120,12 +131,70 @@ logger = logging.getLogger(__name__)
 
 # Path to frontend
 FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
-from .ingest import ingest_openalex_query
-from .vectorstore import add_documents, query as vector_query
-from .llm import LLMClient, generate_library_links
-from .pdf_lookup import enrich_sources_with_pdfs
-
-app = FastAPI(title="GRAYSON - AI Research Assistant")
+from .vectorstore import query as vector_query, query_texts, warm_up
+from .llm import LLMClient, StreamFailed, generate_library_links
+from .pdf_lookup import close_http_client, enrich_sources_with_pdfs, get_http_client
+from . import admission, embeddings, jobs, metrics, profiling, router, usage_tracker, warming
+from .static_assets import StaticAsset
+
+
+async def _warm_up(app: FastAPI) -> None:
+    """Load everything the first query needs, then mark the app ready.
+
+    Failures (the writer still creating the index, a locked store) are
+    retried with exponential backoff; /ready reports the last error meanwhile.
+    """
+    delay = min(1.0, settings.warmup_retry_max_seconds)
+    while True:
+        try:
+            # Blocking work (chromadb import, HNSW load) runs off the event loop
+            # so /health keeps answering while we warm up
+            count = await run_in_threadpool(warm_up, None, settings.warmup_queries)
+            if settings.llm_mode == "api" and settings.openai_api_key:
+                await run_in_threadpool(embeddings.get_client)
+                await run_in_threadpool(llm.get_client)
+            get_http_client()
+        except Exception as e:
+            app.state.warmup_error = str(e)
+            logger.exception(f"WARMUP: failed, retrying in {delay:g}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.warmup_retry_max_seconds)
+            continue
+        app.state.warmup_error = None
+        app.state.ready = True
+        logger.info(f"READY: {count} documents indexed")
+        return
+
+
+async def _publish_metrics() -> None:
+    """Share this worker's metrics with the others so any of them can answer /metrics."""
+    while True:
+        await asyncio.sleep(settings.metrics_publish_seconds)
+        try:
+            await run_in_threadpool(metrics.publish)
+        except Exception as e:
+            logger.warning(f"METRICS: publish failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.warmup_error = None
+    metrics.setup_tracing()
+    unpriced = usage_tracker.unpriced_models(router.models())
+    if unpriced:
+        logger.warning(f"PRICING: no prices for {', '.join(unpriced)}; their usage is charged at the "
+                       f"highest known chat prices until they are added to usage_tracker.PRICING")
+    warmup_task = asyncio.create_task(_warm_up(app))
+    publish_task = asyncio.create_task(_publish_metrics()) if settings.metrics_publish_seconds > 0 else None
+    yield
+    warmup_task.cancel()
+    if publish_task:
+        publish_task.cancel()
+    await close_http_client()
+
+
+app = FastAPI(title="GRAYSON - AI Research Assistant", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -141,6 +210,93 @@ settings = get_settings()
 llm = LLMClient()
 
 
+class SelectiveGZipMiddleware:
+    """GZipMiddleware, except for paths whose responses must pass through untouched.
+
+    The frontend is already compressed (older Starlette releases gzip it a
+    second time), and gzip would hold back NDJSON stream lines until a
+    compressed block fills up.
+    """
+
+    def __init__(self, app, exclude_paths=(), **options):
+        self.app = app
+        self.gzip = GZipMiddleware(app, **options)
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
+
+# Compress JSON answers (long markdown + source lists)
+app.add_middleware(SelectiveGZipMiddleware, exclude_paths=("/", "/query/stream"),
+                   minimum_size=settings.gzip_minimum_size)
+
+
+def _route_path(request: Request) -> str:
+    """Route template for metric labels, so unknown URLs don't create new series."""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Track in-flight requests and latency per route."""
+    path = _route_path(request)
+    metrics.IN_FLIGHT.inc(path=path)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.IN_FLIGHT.dec(path=path)
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, path=path, status=str(status))
+
+
+_REQUEST_ID = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """Assign a request ID and, when asked or sampled, profile the request."""
+    # Reuse the caller's ID only if it's safe to put in a file name
+    request_id = request.headers.get("X-Request-ID", "")
+    if not _REQUEST_ID.fullmatch(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    request.state.request_id = request_id
+
+    profiler = None
+    if profiling.should_profile(request.headers.get(profiling.PROFILE_HEADER)):
+        profiler = profiling.start_profile()
+    try:
+        response = await call_next(request)
+    finally:
+        if profiler is not None:
+            await run_in_threadpool(profiling.finish_profile, profiler, request_id,
+                                    f"{request.method} {request.url.path}")
+    response.headers["X-Request-ID"] = request_id
+    if profiler is not None:
+        response.headers[profiling.PROFILE_HEADER] = request_id
+    return response
+
+
+@app.exception_handler(admission.Rejected)
+async def admission_rejected(request: Request, exc: admission.Rejected):
+    """Fast 429/503 with a Retry-After hint, instead of a slow timeout."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 class IngestRequest(BaseModel):
     query: str
     max_results: int = 5
@@ -148,18 +304,30 @@ class IngestRequest(BaseModel):
 
 class QueryRequest(BaseModel):
     question: str
-    top_k: int = 5
+    top_k: Optional[int] = None  # None = the router's choice for the question
+
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    top_k: Optional[int] = None
+    stream: bool = False  # NDJSON, one line per answer as it completes
 
 
 class FeedbackRequest(BaseModel):
     message: str
 
 
+_frontend: Optional[StaticAsset] = None
+
+
 @app.get("/", response_class=HTMLResponse)
-async def serve_frontend():
-    """Serve the frontend HTML at root URL."""
-    html_file = FRONTEND_DIR / "index.html"
-    return html_file.read_text()
+async def serve_frontend(request: Request):
+    """Serve the frontend HTML at root URL (loaded and compressed once per process)."""
+    global _frontend
+    if _frontend is None:
+        _frontend = StaticAsset(FRONTEND_DIR / "index.html", "text/html; charset=utf-8",
+                                max_age=settings.frontend_cache_seconds)
+    return _frontend.response(request)
 
 
 @app.get("/health")
@@ -167,46 +335,128 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (every worker's metrics combined)."""
+    return PlainTextResponse(await run_in_threadpool(metrics.render_all), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: passes only once the index is loaded and warmed up."""
+    if getattr(app.state, "ready", False):
+        return {"status": "ready"}
+    body = {"status": "starting"}
+    if getattr(app.state, "warmup_error", None):
+        body = {"status": "error", "detail": app.state.warmup_error}
+    return JSONResponse(status_code=503, content=body)
+
+
+# One index write per worker at a time; a second /ingest waits here instead of queueing behind itself
+_ingest_lock = asyncio.Lock()
+
+
 @app.post("/ingest")
 async def ingest(req: IngestRequest):
+    if settings.read_only:
+        # Serving workers never write the index; the writer process picks this up
+        job_id = jobs.enqueue("ingest_openalex", {"query": req.query, "max_results": req.max_results})
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
     try:
-        records = ingest_openalex_query(req.query, max_results=req.max_results)
-        add_documents(records)
-        return {"ingested": len(records)}
+        # Scripts and the writer process write the index too: run here only while holding the writer lock
+        async with _ingest_lock:
+            result, job_id = await run_in_threadpool(
+                jobs.run_or_enqueue, "ingest_openalex", {"query": req.query, "max_results": req.max_results})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if job_id is not None:
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+    return result
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: int):
+    """Status of a queued ingestion job (multi-worker mode)."""
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 @app.post("/query")
-async def query(req: QueryRequest):
+async def query(req: QueryRequest, request: Request):
+    async with admission.admit(request) as mode:
+        return await _answer(req, mode)
+
+
+async def _answer(req: QueryRequest, mode: str) -> dict:
+    """Retrieve, enrich and generate; `mode` drops the expensive steps under load."""
     logger.info(f"USER: {req.question}")
-    hits = vector_query(req.question, top_k=req.top_k)
+    # Blocking calls run in the threadpool so one slow request can't stall the event loop
+    cached = await run_in_threadpool(warming.lookup, req.question, req.top_k)
+    if cached is not None:
+        logger.info("GRAYSON: answered from the answer cache")
+        return cached
+    top_k = router.route(req.question, req.top_k)["top_k"]
+    hits = await run_in_threadpool(vector_query, req.question, top_k=top_k)
+    (sources_with_pdfs,) = await _enrich_hits([hits], mode)
+    response = await _respond(req.question, hits, sources_with_pdfs, mode)
+    if mode == admission.FULL:
+        await run_in_threadpool(warming.store_answer, req.question, req.top_k, response)
+    return response
+
+
+async def _enrich_hits(hit_lists: List[List[dict]], mode: str) -> List[List[Optional[dict]]]:
+    """Source metadata per hit list, with free PDF links when `mode` allows.
+
+    Each distinct source is looked up once, however many lists it appears in.
+    Found links are also written into the hits so the LLM can cite them.
+    """
+    source_lists = [[h.get("metadata") for h in hits] for hits in hit_lists]
+    if mode != admission.FULL:
+        return source_lists
 
     # Get source metadata and enrich with free PDF links BEFORE LLM generation
-    sources = [h.get("metadata") for h in hits]
-    sources_with_pdfs = await enrich_sources_with_pdfs(sources)
+    unique = {}
+    for sources in source_lists:
+        for source in sources:
+            if source:
+                unique.setdefault(json.dumps(source, sort_keys=True), source)
+    enriched = dict(zip(unique, await enrich_sources_with_pdfs(list(unique.values()))))
+    source_lists = [
+        [enriched[json.dumps(source, sort_keys=True)] if source else source for source in sources]
+        for sources in source_lists
+    ]
 
     # Count how many free PDFs were found
-    pdf_count = sum(1 for s in sources_with_pdfs if s and s.get("free_pdf"))
+    pdf_count = sum(1 for s in enriched.values() if s and s.get("free_pdf"))
     if pdf_count > 0:
         logger.info(f"PDF: Found {pdf_count} free PDF(s)")
 
     # Inject free PDF URLs back into hits so LLM can see them
-    for i, hit in enumerate(hits):
-        if i < len(sources_with_pdfs) and sources_with_pdfs[i]:
-            if hit.get("metadata") is None:
-                hit["metadata"] = {}
-            hit["metadata"]["free_pdf"] = sources_with_pdfs[i].get("free_pdf")
+    for hits, sources_with_pdfs in zip(hit_lists, source_lists):
+        for i, hit in enumerate(hits):
+            if i < len(sources_with_pdfs) and sources_with_pdfs[i]:
+                if hit.get("metadata") is None:
+                    hit["metadata"] = {}
+                hit["metadata"]["free_pdf"] = sources_with_pdfs[i].get("free_pdf")
+    return source_lists
+
 
+async def _respond(question: str, hits: List[dict], sources_with_pdfs: List[Optional[dict]], mode: str) -> dict:
+    """Generate the answer for one question and shape the response."""
     # Generate LLM response (now has access to free PDF URLs)
-    answer = llm.generate(req.question, hits)
-    library_links = generate_library_links(req.question)
+    if mode == admission.RETRIEVAL_ONLY:
+        answer = llm.retrieval_only(question, hits)
+    else:
+        answer = await run_in_threadpool(llm.generate, question, hits)
+    library_links = generate_library_links(question)
 
     # Log truncated response (first 200 chars)
     preview = answer[:200].replace('\n', ' ') + ('...' if len(answer) > 200 else '')
     logger.info(f"GRAYSON: {preview}")
 
-    return {
+    response = {
         "answer": answer,
         "sources": sources_with_pdfs,
         "library_links": {
@@ -214,6 +464,127 @@ async def query(req: QueryRequest):
             "jstor": library_links["jstor"],
         },
     }
+    if mode != admission.FULL:
+        logger.info(f"DEGRADED: answered in {mode} mode")
+        metrics.DEGRADED.inc(mode=mode)
+        response["degraded"] = mode
+    return response
+
+
+@app.post("/query/stream")
+async def query_stream(req: QueryRequest, request: Request):
+    """Like /query, but streams NDJSON: sources first, then answer text as it is generated.
+
+    Lines: {"sources", "library_links"[, "degraded"][, "preview"]}, then {"delta": "..."} pieces
+    (citation markers already expanded), then {"done": true}.
+    """
+    # The stream holds its admission slot until the last line is sent
+    stack = AsyncExitStack()
+    mode = await stack.enter_async_context(admission.admit(request))
+    try:
+        logger.info(f"USER (stream): {req.question}")
+        cached = await run_in_threadpool(warming.lookup, req.question, req.top_k)
+        if cached is None:
+            top_k = router.route(req.question, req.top_k)["top_k"]
+            hits = await run_in_threadpool(vector_query, req.question, top_k=top_k)
+            (sources_with_pdfs,) = await _enrich_hits([hits], mode)
+    except BaseException:
+        await stack.aclose()
+        raise
+
+    if cached is not None:
+        async def replay():
+            try:
+                yield json.dumps({"sources": cached["sources"], "library_links": cached["library_links"]}) + "\n"
+                yield json.dumps({"delta": cached["answer"]}) + "\n"
+                yield json.dumps({"done": True}) + "\n"
+            finally:
+                await stack.aclose()
+
+        return StreamingResponse(replay(), media_type="application/x-ndjson", background=BackgroundTask(stack.aclose))
+
+    head = {"sources": sources_with_pdfs, "library_links": generate_library_links(req.question)}
+    if mode != admission.FULL:
+        metrics.DEGRADED.inc(mode=mode)
+        head["degraded"] = mode
+    if settings.extractive_preview and mode != admission.RETRIEVAL_ONLY:
+        # Shown until the first delta arrives; takes milliseconds, the LLM takes seconds
+        head["preview"] = await run_in_threadpool(llm.retrieval_only, req.question, hits)
+
+    async def ndjson():
+        try:
+            yield json.dumps(head) + "\n"
+            if mode == admission.RETRIEVAL_ONLY:
+                yield json.dumps({"delta": llm.retrieval_only(req.question, hits)}) + "\n"
+            else:
+                parts, failed = [], False
+                async for text in iterate_in_threadpool(llm.generate_stream(req.question, hits)):
+                    parts.append(text)
+                    failed = failed or isinstance(text, StreamFailed)
+                    yield json.dumps({"delta": text}) + "\n"
+                # A stream that failed partway would otherwise cache its partial text plus the error
+                if mode == admission.FULL and not failed:
+                    await run_in_threadpool(warming.store_answer, req.question, req.top_k,
+                                            {"answer": "".join(parts), **head})
+            yield json.dumps({"done": True}) + "\n"
+        finally:
+            await stack.aclose()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", background=BackgroundTask(stack.aclose))
+
+
+@app.post("/query/batch")
+async def query_batch(req: BatchQueryRequest, request: Request):
+    """Answer several questions with one embedding call and one vector search.
+
+    Returns {"results": [...]} in question order, or with `"stream": true`
+    NDJSON lines (each with its "index") as answers complete.
+    """
+    questions = [q.strip() for q in req.questions]
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="questions must be a non-empty list of non-empty strings")
+    if len(questions) > settings.batch_max_questions:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_max_questions} questions per batch")
+
+    # The batch pays one rate-limit token per question and holds one admission
+    # slot until the last answer is sent
+    stack = AsyncExitStack()
+    mode = await stack.enter_async_context(admission.admit(request, cost=len(questions)))
+    try:
+        logger.info(f"BATCH: {len(questions)} questions")
+        # One search at the largest tier's top_k; each question keeps its own share
+        top_ks = [router.route(q, req.top_k)["top_k"] for q in questions]
+        hit_lists = await run_in_threadpool(query_texts, questions, top_k=max(top_ks))
+        hit_lists = [hits[:top_k] for hits, top_k in zip(hit_lists, top_ks)]
+        source_lists = await _enrich_hits(hit_lists, mode)
+    except BaseException:
+        await stack.aclose()
+        raise
+
+    semaphore = asyncio.Semaphore(max(1, settings.batch_generation_concurrency))
+
+    async def answer(index: int) -> dict:
+        async with semaphore:
+            result = await _respond(questions[index], hit_lists[index], source_lists[index], mode)
+        return {"index": index, "question": questions[index], **result}
+
+    if not req.stream:
+        async with stack:
+            results = await asyncio.gather(*(answer(i) for i in range(len(questions))))
+        return {"results": results}
+
+    async def ndjson():
+        tasks = [asyncio.create_task(answer(i)) for i in range(len(questions))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            await stack.aclose()
+
+    # The background close also runs if the client leaves before the stream starts
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", background=BackgroundTask(stack.aclose))
 
 
 @app.post("/feedback")
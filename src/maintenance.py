@@ -0,0 +1,355 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Housekeeping for the on-disk vector store: size and fragmentation stats,
+# orphan and duplicate cleanup, compaction and VACUUM.
+#
+# WHY YOU NEED IT:
+# - Re-ingestion leaves tombstones in the HNSW index, write-ahead log rows in
+#   chroma.sqlite3, segment directories of deleted collections and texts no
+#   collection uses any more; nothing ever removed them
+# - The same paper can be indexed twice under different IDs (e.g. an OpenAlex
+#   ID and a DOI-derived ID), which wastes a result slot per query
+# - Compaction rebuilds each shard as a fresh version (see src/reindex.py), so
+#   readers swap to it without downtime; smaller files load faster and use less RAM
+#
+# Run with: python scripts/maintenance.py stats | clean | compact
+# ================================================================================
+
+"""Inspect and shrink the Chroma store and the document store."""
+
+import logging
+import shutil
+import sqlite3
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import docstore, reindex, sharding
+from .config import get_settings
+from .ingest import normalize_doi
+from .vectorstore import (
+    delete_documents,
+    drop_collection,
+    get_client,
+    list_aliases,
+    list_collection_names,
+    resolve_alias,
+)
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = get_settings()
+
+CHROMA_FILE = "chroma.sqlite3"
+
+# Chroma write-ahead log operation code for deletes
+_LOG_DELETE = 3
+
+
+# ---------------------------------------------------------
+# Reading Chroma's files (read-only, safe next to a live server)
+# ---------------------------------------------------------
+def chroma_path() -> Path:
+    return Path(SETTINGS.chroma_persist_directory) / CHROMA_FILE
+
+
+def _connect_chroma(read_only: bool = True) -> sqlite3.Connection:
+    if read_only:
+        return sqlite3.connect(f"file:{chroma_path()}?mode=ro", uri=True, timeout=30.0)
+    return sqlite3.connect(str(chroma_path()), timeout=30.0, isolation_level=None)
+
+
+def _segments(db: sqlite3.Connection) -> Dict[str, Dict[str, str]]:
+    """{collection name: {"id", "segment"}}; "segment" is the HNSW segment directory name."""
+    rows = db.execute(
+        "SELECT c.name, c.id, s.id FROM collections c "
+        "LEFT JOIN segments s ON s.collection = c.id AND s.type LIKE '%hnsw%'"
+    ).fetchall()
+    return {name: {"id": collection_id, "segment": segment} for name, collection_id, segment in rows}
+
+
+def read_hnsw_header(segment_dir: Path) -> Optional[Dict[str, int]]:
+    """Elements, capacity and tombstones of a persisted HNSW index (None if never saved).
+
+    Chroma saves hnswlib's layout: a header, then one fixed-size record per
+    element whose first link-count word carries the "deleted" flag.
+    """
+    header, data = segment_dir / "header.bin", segment_dir / "data_level0.bin"
+    if not header.exists() or not data.exists():
+        return None
+    raw = header.read_bytes()
+    if len(raw) < 36:
+        return None
+    _, offset, capacity, elements, record_size = struct.unpack_from("<IQQQQ", raw, 0)
+    deleted = 0
+    if elements:
+        level0 = data.read_bytes()
+        deleted = sum(level0[offset + i * record_size + 2] & 1 for i in range(elements)
+                      if offset + i * record_size + 2 < len(level0))
+    return {"elements": elements, "capacity": capacity, "deleted": deleted, "record_size": record_size}
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def collection_stats(name: str, db: sqlite3.Connection, segments: Dict[str, Dict[str, str]],
+                     aliases: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Counts, sizes and fragmentation of one collection."""
+    collection = get_client().get_collection(name)
+    count = collection.count()
+    sample = collection.get(include=["embeddings"], limit=1)["embeddings"]
+    dimensions = len(sample[0]) if len(sample) else 0
+    info = segments.get(name, {})
+    log_entries, log_deletes, log_bytes = db.execute(
+        "SELECT COUNT(*), COALESCE(SUM(operation = ?), 0), COALESCE(SUM(LENGTH(vector)) + SUM(LENGTH(metadata)), 0) "
+        "FROM embeddings_queue WHERE topic LIKE ?", (_LOG_DELETE, f"%/{info.get('id')}")
+    ).fetchone()
+
+    segment_dir = Path(SETTINGS.chroma_persist_directory) / str(info.get("segment"))
+    hnsw = read_hnsw_header(segment_dir) if info.get("segment") else None
+    m = (collection.metadata or {}).get("hnsw:M", 16)
+    record_size = hnsw["record_size"] if hnsw else 4 + 2 * m * 4 + dimensions * 4 + 8
+    tombstones = (hnsw["deleted"] if hnsw else 0) + log_deletes
+    return {
+        "name": name,
+        "aliases": aliases.get(name, []),
+        "count": count,
+        "dimensions": dimensions,
+        "hnsw_saved_elements": hnsw["elements"] if hnsw else 0,
+        "hnsw_capacity": hnsw["capacity"] if hnsw else 0,
+        "tombstones": tombstones,
+        "fragmentation": round(tombstones / (count + tombstones), 4) if count + tombstones else 0.0,
+        "log_entries": log_entries,  # replayed into memory on every cold start until the index is saved
+        "log_bytes": log_bytes,
+        "disk_bytes": _dir_size(segment_dir) if segment_dir.is_dir() else 0,
+        "memory_bytes": (count + tombstones) * record_size,  # estimate of the loaded HNSW index
+    }
+
+
+def stats() -> Dict[str, Any]:
+    """Per-collection and whole-store size report. Only reads; safe against a live server."""
+    get_client()
+    db = _connect_chroma()
+    try:
+        segments = _segments(db)
+        aliases: Dict[str, List[str]] = {}
+        for alias, row in list_aliases().items():
+            aliases.setdefault(row["target"], []).append(alias)
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        pages, free = db.execute("PRAGMA page_count").fetchone()[0], db.execute("PRAGMA freelist_count").fetchone()[0]
+        collections = [collection_stats(name, db, segments, aliases) for name in sorted(list_collection_names())]
+        orphans = _orphan_storage(db, segments)
+    finally:
+        db.close()
+    report = {
+        "sqlite_bytes": pages * page_size,
+        "sqlite_free_bytes": free * page_size,  # reclaimed by VACUUM
+        "orphan_segment_dirs": len(orphans["segment_dirs"]),
+        "orphan_segment_bytes": sum(_dir_size(d) for d in orphans["segment_dirs"]),
+        "orphan_log_entries": orphans["log_entries"],
+        "collections": collections,
+    }
+    if SETTINGS.docstore_enabled:
+        path = docstore.store_path()
+        report["docstore"] = {**docstore.stats(), "file_bytes": path.stat().st_size if path.exists() else 0}
+    return report
+
+
+# ---------------------------------------------------------
+# Orphans and duplicates
+# ---------------------------------------------------------
+def _orphan_storage(db: sqlite3.Connection, segments: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+    """Segment directories and log rows of collections that no longer exist."""
+    known_segments = {str(s["segment"]) for s in segments.values()}
+    known_segments.update(row[0] for row in db.execute("SELECT id FROM segments"))
+    root = Path(SETTINGS.chroma_persist_directory)
+    dirs = [d for d in root.iterdir() if d.is_dir() and d.name not in known_segments and (d / "header.bin").exists()]
+    collection_ids = {s["id"] for s in segments.values()}
+    topics = [topic for (topic,) in db.execute("SELECT DISTINCT topic FROM embeddings_queue")
+              if topic.rsplit("/", 1)[-1] not in collection_ids]
+    log_entries = sum(db.execute("SELECT COUNT(*) FROM embeddings_queue WHERE topic = ?", (t,)).fetchone()[0]
+                      for t in topics)
+    return {"segment_dirs": dirs, "log_topics": topics, "log_entries": log_entries}
+
+
+def _served_collections() -> List[str]:
+    """Collections the shards currently resolve to (the ones searches read)."""
+    names = set(list_collection_names())
+    return [target for target in dict.fromkeys(resolve_alias(shard) for shard in sharding.all_shards())
+            if target in names]
+
+
+def _all_ids(name: str, batch_size: int = 1000) -> List[str]:
+    collection = get_client().get_collection(name)
+    ids, offset = [], 0
+    while True:
+        page = collection.get(include=[], limit=batch_size, offset=offset)["ids"]
+        if not page:
+            return ids
+        ids.extend(page)
+        offset += len(page)
+
+
+def find_missing_text(name: str, batch_size: int = 1000) -> List[str]:
+    """IDs in a collection whose text is in neither the document store nor Chroma (never citable)."""
+    collection = get_client().get_collection(name)
+    stored = docstore.all_ids() if SETTINGS.docstore_enabled else set()
+    missing, offset = [], 0
+    while True:
+        page = collection.get(include=["documents"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            return missing
+        offset += len(page["ids"])
+        missing.extend(doc_id for doc_id, text in zip(page["ids"], page["documents"])
+                       if not (text or "").strip() and doc_id not in stored)
+
+
+def find_duplicates(batch_size: int = 1000) -> Dict[str, List[str]]:
+    """{collection: IDs to delete} for papers indexed more than once under different IDs.
+
+    Papers are matched by normalized DOI across the served collections (within
+    each collection in topic sharding, where one paper may belong to several
+    topics). The copy kept is the OpenAlex-ID one, then the longest text, then
+    the smallest ID.
+    """
+    groups: Dict[tuple, List[tuple]] = {}
+    for name in _served_collections():
+        collection = get_client().get_collection(name)
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas", "documents"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            for doc_id, metadata, text in zip(page["ids"], page["metadatas"], page["documents"]):
+                doi = normalize_doi((metadata or {}).get("doi") or "")
+                if doi:
+                    scope = name if SETTINGS.shard_mode == "topic" else ""
+                    groups.setdefault((scope, doi), []).append((name, doc_id, text))
+
+    duplicates: Dict[str, List[str]] = {}
+    for copies in groups.values():
+        if len(copies) < 2:
+            continue
+        texts = docstore.get_many([doc_id for _, doc_id, _ in copies]) if SETTINGS.docstore_enabled else {}
+
+        def rank(copy):
+            name, doc_id, text = copy
+            length = len((texts.get(doc_id) or {}).get("text") or text or "")
+            return ("openalex.org_W" not in doc_id, -length, doc_id)
+
+        for name, doc_id, _ in sorted(copies, key=rank)[1:]:
+            duplicates.setdefault(name, []).append(doc_id)
+    return duplicates
+
+
+def clean(dry_run: bool = True) -> Dict[str, Any]:
+    """Remove duplicates, text-less entries, unused document store rows and Chroma leftovers.
+
+    With `dry_run` (the default) only reports what would be removed.
+    """
+    get_client()
+    duplicates = find_duplicates()
+    missing = {name: ids for name in _served_collections() if (ids := find_missing_text(name))}
+    summary = {
+        "duplicates": sum(len(ids) for ids in duplicates.values()),
+        "missing_text": sum(len(ids) for ids in missing.values()),
+        "dry_run": dry_run,
+    }
+    if not dry_run:
+        for source in (duplicates, missing):
+            for name, ids in source.items():
+                delete_documents(name, ids)
+                logger.info(f"MAINTENANCE: removed {len(ids)} entries from '{name}'")
+    summary.update(remove_orphans(dry_run))
+    return summary
+
+
+def remove_orphans(dry_run: bool = True) -> Dict[str, Any]:
+    """Delete what deleted collections left behind: segment directories, log rows and document store texts."""
+    get_client()
+    db = _connect_chroma()
+    try:
+        orphans = _orphan_storage(db, _segments(db))
+    finally:
+        db.close()
+    summary = {"orphan_segment_dirs": [d.name for d in orphans["segment_dirs"]],
+               "orphan_log_entries": orphans["log_entries"], "orphan_docstore_ids": 0, "orphan_blobs": 0}
+    if not dry_run:
+        if orphans["log_topics"]:
+            db = _connect_chroma(read_only=False)
+            try:
+                db.executemany("DELETE FROM embeddings_queue WHERE topic = ?", [(t,) for t in orphans["log_topics"]])
+            finally:
+                db.close()
+        for directory in orphans["segment_dirs"]:
+            shutil.rmtree(directory, ignore_errors=True)
+    if SETTINGS.docstore_enabled:
+        used = set()
+        for name in list_collection_names():
+            used.update(_all_ids(name))
+        unused = sorted(docstore.all_ids() - used)
+        summary["orphan_docstore_ids"] = len(unused)
+        if not dry_run:
+            docstore.delete_many(unused)
+            summary["orphan_blobs"] = docstore.purge_unreferenced()
+    return summary
+
+
+# ---------------------------------------------------------
+# Compaction
+# ---------------------------------------------------------
+def vacuum() -> Dict[str, int]:
+    """VACUUM chroma.sqlite3 and the document store; returns bytes saved per file.
+
+    Readers only wait for the exclusive lock while the file is rewritten.
+    """
+    saved = {}
+    before = chroma_path().stat().st_size
+    db = _connect_chroma(read_only=False)
+    try:
+        db.execute("VACUUM")
+    finally:
+        db.close()
+    saved["chroma"] = before - chroma_path().stat().st_size
+    if SETTINGS.docstore_enabled and docstore.store_path().exists():
+        path = docstore.store_path()
+        before = path.stat().st_size
+        conn = docstore.connect()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        saved["docstore"] = before - path.stat().st_size
+    return saved
+
+
+def compact(names: Optional[List[str]] = None, drop_previous: bool = False, grace_seconds: float = 30.0,
+            dry_run: bool = True, **checks) -> Dict[str, Any]:
+    """Rebuild each shard into a fresh version without tombstones or log backlog, then clean up and VACUUM.
+
+    The rebuild is a validated blue/green reindex that reuses stored vectors.
+    The replaced version is kept for rollback unless `drop_previous`, in which
+    case it is dropped after `grace_seconds` (long enough for every reader to
+    notice the swap and finish warming the new version).
+    """
+    names = names or sharding.all_shards()
+    if dry_run:
+        return {"dry_run": True, "would_rebuild": {alias: resolve_alias(alias) for alias in names}, **stats()}
+
+    # Clean first, so the rebuilt versions don't inherit the deletes as tombstones
+    cleaned = clean(dry_run=False)
+    result = reindex.reindex(names, reembed=False, **checks)
+    if not result["swapped"]:
+        return {"dry_run": False, "swapped": False, "cleaned": cleaned, "validation": result["validation"]}
+    dropped = reindex.prune(names)
+    if drop_previous:
+        time.sleep(grace_seconds)
+        aliases = list_aliases()
+        for alias in names:
+            previous = (aliases.get(alias) or {}).get("previous")
+            if previous and previous in list_collection_names():
+                drop_collection(previous, notify=False, resolve=False)
+                dropped.append(previous)
+    return {"dry_run": False, "swapped": True, "cleaned": cleaned, "dropped": dropped,
+            "orphans": remove_orphans(dry_run=False), "vacuum_saved_bytes": vacuum()}
@@ -0,0 +1,359 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Latency, token, cache and in-flight metrics exposed in Prometheus text format.
+#
+# WHY YOU NEED IT:
+# - Shows where /query time goes (embedding, vector search, PDF lookups, LLM)
+# - Tracks token spend as it happens instead of only in usage_data.json
+# - Scraped by Prometheus from GET /metrics; no extra dependency needed
+# - Workers publish their values to the shared state file, so /metrics
+#   reports every worker, not just the one that answered the scrape
+# - Optionally exports the same spans as OpenTelemetry traces
+# ================================================================================
+
+"""Minimal Prometheus metrics registry and timing spans."""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = get_settings()
+
+# Seconds; covers a 5 ms cache hit up to a slow 30 s completion
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_REGISTRY: List["_Metric"] = []
+_tracer = None
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], Any]] = None) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+    def dump(self) -> List[list]:
+        """This process's values as JSON-friendly [labels, value] pairs."""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values().items()]
+
+    def _values(self) -> Dict[Tuple[str, ...], Any]:
+        raise NotImplementedError
+
+    def combine(self, dumps: List[List[list]]) -> Dict[Tuple[str, ...], Any]:
+        """Merge several processes' `dump()`s into one set of values."""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._counts: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._counts.get(self._key(labels), 0.0)
+
+    def _values(self) -> Dict[Tuple[str, ...], float]:
+        return self._counts
+
+    def combine(self, dumps: List[List[list]]) -> Dict[Tuple[str, ...], float]:
+        merged: Dict[Tuple[str, ...], float] = {}
+        for dump in dumps:
+            for key, value in dump:
+                merged[tuple(key)] = merged.get(tuple(key), 0.0) + value
+        return merged
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted((self._counts if values is None else values).items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down (e.g. requests in flight).
+
+    `aggregate` says how workers' values combine: "sum" (requests in
+    flight), "max" (is any circuit open) or "min" (budget left).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), aggregate: str = "sum"):
+        super().__init__(name, description, labelnames)
+        self.aggregate = aggregate
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._counts[self._key(labels)] = value
+
+    def combine(self, dumps: List[List[list]]) -> Dict[Tuple[str, ...], float]:
+        if self.aggregate == "sum":
+            return super().combine(dumps)
+        pick = max if self.aggregate == "max" else min
+        merged: Dict[Tuple[str, ...], float] = {}
+        for dump in dumps:
+            for key, value in dump:
+                merged[tuple(key)] = pick(merged[tuple(key)], value) if tuple(key) in merged else value
+        return merged
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts plus sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., sum, count
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self, **labels) -> Tuple[float, float]:
+        """(sum, count) for one label set."""
+        series = self._series.get(self._key(labels))
+        return (series[-2], series[-1]) if series else (0.0, 0.0)
+
+    def _values(self) -> Dict[Tuple[str, ...], List[float]]:
+        return self._series
+
+    def combine(self, dumps: List[List[list]]) -> Dict[Tuple[str, ...], List[float]]:
+        merged: Dict[Tuple[str, ...], List[float]] = {}
+        for dump in dumps:
+            for key, series in dump:
+                total = merged.setdefault(tuple(key), [0.0] * len(series))
+                for i, value in enumerate(series):
+                    total[i] += value
+        return merged
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], List[float]]] = None) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, series in sorted((self._series if values is None else values).items()):
+                for bound, count in zip(self.buckets, series):
+                    le = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {count}")
+                inf = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf} {series[-1]}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+# ---------------------------------------------------------
+# Application metrics
+# ---------------------------------------------------------
+STAGE_SECONDS = Histogram(
+    "grayson_stage_duration_seconds", "Time spent in each pipeline stage", ["stage"]
+)
+REQUEST_SECONDS = Histogram(
+    "grayson_http_request_duration_seconds", "HTTP request latency", ["path", "status"]
+)
+IN_FLIGHT = Gauge("grayson_http_requests_in_flight", "HTTP requests being served", ["path"])
+TOKENS = Counter("grayson_openai_tokens_total", "OpenAI tokens used", ["model_type"])
+COST = Counter("grayson_openai_cost_dollars_total", "Estimated OpenAI spend", ["model_type"])
+TIER_QUERIES = Counter("grayson_router_queries_total", "Questions routed to each complexity tier", ["tier"])
+TIER_SECONDS = Histogram("grayson_router_generation_seconds", "Answer generation time per tier", ["tier"])
+TIER_COST = Counter("grayson_router_cost_dollars_total", "Estimated OpenAI spend per tier", ["tier"])
+CACHE_REQUESTS = Counter("grayson_cache_requests_total", "Cache lookups", ["cache", "result"])
+ADMISSIONS = Counter("grayson_admission_total", "Query admission decisions", ["result"])
+DEGRADED = Counter("grayson_degraded_responses_total", "Queries answered in a degraded mode", ["mode"])
+QUEUE_DEPTH = Gauge("grayson_query_queue_depth", "Queries waiting for a slot")
+QUEUE_WAIT_SECONDS = Histogram("grayson_query_queue_wait_seconds", "Time queries waited for a slot")
+UPSTREAM_CALLS = Counter("grayson_upstream_calls_total", "Upstream API calls by outcome", ["upstream", "result"])
+CIRCUIT_OPEN = Gauge("grayson_circuit_open", "1 while an upstream's circuit breaker is open", ["upstream"],
+                     aggregate="max")
+HEDGES = Counter("grayson_hedged_requests_total", "Hedged fallback requests (fired, won)", ["result"])
+OPENAI_WAIT_SECONDS = Histogram(
+    "grayson_openai_scheduler_wait_seconds", "Time OpenAI calls waited for rate-limit budget", ["lane"]
+)
+OPENAI_RATE_LIMITED = Counter(
+    "grayson_openai_rate_limited_total", "429 responses from OpenAI (retried, gave_up)", ["model", "result"]
+)
+OPENAI_REMAINING = Gauge(
+    "grayson_openai_ratelimit_remaining", "Requests/tokens left in the current OpenAI window", ["model", "kind"],
+    aggregate="min",
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup; hit rate = hit / (hit + miss)."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def render() -> str:
+    """This process's metrics in Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------
+# Cross-worker aggregation
+# ---------------------------------------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics_workers (
+    pid INTEGER PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+)
+"""
+
+
+def _stale_after() -> float:
+    """Seconds without a publish after which a worker counts as gone."""
+    return max(60.0, 10 * SETTINGS.metrics_publish_seconds)
+
+
+def publish() -> None:
+    """Write this worker's values to the shared state file for `render_all`."""
+    from . import shared_state
+
+    data = json.dumps({metric.name: metric.dump() for metric in _REGISTRY})
+    shared_state.connect().execute(_SCHEMA)
+    with shared_state.transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO metrics_workers (pid, updated_at, data) VALUES (?, ?, ?)",
+                     (os.getpid(), time.time(), data))
+
+
+def render_all() -> str:
+    """Every live worker's metrics, combined, in Prometheus text exposition format.
+
+    Counters and histograms are summed, gauges combined per their
+    `aggregate`. Workers that stopped publishing are dropped, so a
+    restarted worker shows up as a counter reset, which `rate()` handles.
+    """
+    from . import shared_state
+
+    if SETTINGS.metrics_publish_seconds <= 0:
+        return render()
+    publish()
+    with shared_state.transaction() as conn:
+        conn.execute("DELETE FROM metrics_workers WHERE updated_at < ?", (time.time() - _stale_after(),))
+        dumps = [json.loads(data) for (data,) in conn.execute("SELECT data FROM metrics_workers")]
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render(metric.combine([d.get(metric.name, []) for d in dumps])))
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------
+# Timing spans
+# ---------------------------------------------------------
+@contextmanager
+def span(stage: str):
+    """Time a block into the stage histogram (and an OpenTelemetry span if enabled)."""
+    start = time.perf_counter()
+    if _tracer is None:
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        return
+    with _tracer.start_as_current_span(stage):
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def timed(stage: str):
+    """Decorator form of `span` for sync and async functions."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def setup_tracing(endpoint: Optional[str] = None) -> bool:
+    """Export spans to an OTLP collector (e.g. http://localhost:4317) if OpenTelemetry is installed.
+
+    Returns:
+        True if tracing was enabled
+    """
+    global _tracer
+    endpoint = endpoint or SETTINGS.otel_exporter_endpoint
+    if not endpoint:
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OTEL_EXPORTER_ENDPOINT is set but opentelemetry-sdk/exporter are not installed")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": "grayson"}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint, insecure=True)))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("grayson")
+    logger.info(f"TRACING: exporting spans to {endpoint}")
+    return True
@@ -0,0 +1,242 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# One scheduler in front of every OpenAI call (embeddings and chat), aware of
+# the account's requests-per-minute and tokens-per-minute limits.
+#
+# WHY YOU NEED IT:
+# - OpenAI reports the remaining RPM/TPM budget in x-ratelimit-* response
+#   headers; calls wait for budget instead of spending it and getting 429s
+# - A 429 pauses every thread for the Retry-After time (or an exponential
+#   backoff), not just the call that hit it, so a burst doesn't keep hammering
+# - Priority lanes: user queries go ahead of ingestion, and ingestion leaves
+#   part of each window unused so a query arriving mid-ingest finds headroom
+# - Bulk ingestion can run several embedding batches at once, as far as the
+#   remaining budget allows
+# ================================================================================
+
+"""RPM/TPM-aware scheduling, 429 backoff and priority lanes for OpenAI calls.
+
+The scheduler is per process, but the budgets come from OpenAI's headers,
+which count the whole organization's usage: a serving worker sees the quota
+the writer's ingestion is using, and vice versa.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from . import metrics
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = get_settings()
+
+# Lanes, in priority order
+INTERACTIVE = "interactive"  # user queries
+BULK = "bulk"  # ingestion
+
+KINDS = ("requests", "tokens")
+WINDOW_SECONDS = 60.0  # assumed window until OpenAI reports reset times
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from an x-ratelimit-reset-* value such as "1s", "6m0s" or "20ms"."""
+    if not value:
+        return None
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    """Rough token count (about four characters per token), for reserving TPM budget."""
+    return sum(len(text) // 4 + 1 for text in texts)
+
+
+class Budget:
+    """Requests and tokens left in the current window for one model.
+
+    Starts from the configured limits (or unlimited if those are 0) and is
+    corrected by every response's x-ratelimit-* headers.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.limit: Dict[str, Optional[float]] = {
+            "requests": requests_per_minute or None,
+            "tokens": tokens_per_minute or None,
+        }
+        self.remaining: Dict[str, Optional[float]] = dict(self.limit)
+        self.reset_at: Dict[str, float] = {kind: 0.0 for kind in KINDS}
+
+    def _refill(self, now: float) -> None:
+        for kind in KINDS:
+            if self.limit[kind] is not None and now >= self.reset_at[kind]:
+                self.remaining[kind] = self.limit[kind]
+
+    def wait_time(self, needed: Dict[str, int], keep_fraction: float, now: float) -> float:
+        """Seconds until `needed` fits while leaving `keep_fraction` of each limit unused (0 = now)."""
+        self._refill(now)
+        wait = 0.0
+        for kind, amount in needed.items():
+            limit, remaining = self.limit[kind], self.remaining[kind]
+            if limit is None:
+                continue
+            floor = keep_fraction * limit
+            # A call bigger than the whole reserve-adjusted window still goes once the window is full
+            if remaining - amount >= floor or remaining >= limit:
+                continue
+            wait = max(wait, self.reset_at[kind] - now)
+        return wait
+
+    def reserve(self, needed: Dict[str, int], now: float) -> None:
+        for kind, amount in needed.items():
+            if self.limit[kind] is None:
+                continue
+            if self.reset_at[kind] <= now:
+                self.reset_at[kind] = now + WINDOW_SECONDS
+            self.remaining[kind] -= amount
+
+    def update(self, headers, now: float) -> None:
+        """Take the limits, remaining budget and reset times OpenAI reported."""
+        for kind in KINDS:
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            try:
+                if limit is not None:
+                    self.limit[kind] = float(limit)
+                if remaining is not None:
+                    self.remaining[kind] = float(remaining)
+            except ValueError:
+                continue
+            if reset is not None:
+                self.reset_at[kind] = now + reset
+
+
+class Scheduler:
+    """Admits OpenAI calls by lane and budget, and retries rate-limited ones."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._budgets: Dict[str, Budget] = {}
+        self._waiting = {INTERACTIVE: 0, BULK: 0}
+        self._paused_until = 0.0
+        self._rate_limited = 0  # consecutive 429s, for the exponential backoff
+
+    def budget(self, model: str) -> Budget:
+        if model not in self._budgets:
+            self._budgets[model] = Budget(SETTINGS.openai_requests_per_minute, SETTINGS.openai_tokens_per_minute)
+        return self._budgets[model]
+
+    def _delay(self, model: str, needed: Dict[str, int], lane: str, now: float) -> float:
+        if now < self._paused_until:
+            return self._paused_until - now
+        if lane == BULK:
+            if self._waiting[INTERACTIVE]:
+                return 0.05  # woken sooner by notify_all once the query is through
+            return self.budget(model).wait_time(needed, SETTINGS.openai_interactive_reserve, now)
+        return self.budget(model).wait_time(needed, 0.0, now)
+
+    def acquire(self, model: str, tokens: int, lane: str = INTERACTIVE) -> float:
+        """Block until `lane` may send a call of ~`tokens` tokens; returns seconds waited."""
+        needed = {"requests": 1, "tokens": tokens}
+        start = self._clock()
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = self._clock()
+                    delay = self._delay(model, needed, lane, now)
+                    if delay <= 0:
+                        self.budget(model).reserve(needed, now)
+                        break
+                    self._cond.wait(timeout=min(delay, 1.0))
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+        waited = self._clock() - start
+        metrics.OPENAI_WAIT_SECONDS.observe(waited, lane=lane)
+        return waited
+
+    def observe(self, model: str, headers) -> None:
+        """Update `model`'s budget from a successful response."""
+        with self._cond:
+            self.budget(model).update(headers, self._clock())
+            self._rate_limited = 0
+            self._cond.notify_all()
+
+    def backoff(self, headers) -> float:
+        """Pause every lane after a 429; Retry-After if OpenAI sent one, else exponential with jitter."""
+        delay = None
+        if headers.get("retry-after-ms"):
+            delay = float(headers["retry-after-ms"]) / 1000
+        elif headers.get("retry-after"):
+            try:
+                delay = float(headers["retry-after"])
+            except ValueError:
+                delay = None  # an HTTP date; fall back to the exponential delay
+        with self._cond:
+            self._rate_limited += 1
+            if delay is None:
+                delay = min(SETTINGS.openai_backoff_max_seconds, 2 ** (self._rate_limited - 1))
+                delay *= random.uniform(0.5, 1.0)
+            self._paused_until = max(self._paused_until, self._clock() + delay)
+            self._cond.notify_all()
+        return delay
+
+    def call(self, model: str, tokens: int, request: Callable, lane: str = INTERACTIVE):
+        """Run `request` (an OpenAI `with_raw_response` call) when budget allows; returns the parsed result.
+
+        429s pause all lanes and are retried up to `openai_max_retries` times;
+        connection errors and 5xx are retried with a backoff for this call only.
+        A 429 for an exhausted billing quota is raised at once.
+        """
+        from openai import APIConnectionError, InternalServerError, RateLimitError
+
+        attempt = 0
+        while True:
+            self.acquire(model, tokens, lane)
+            try:
+                raw = request()
+            except RateLimitError as e:
+                if attempt >= SETTINGS.openai_max_retries or getattr(e, "code", None) == "insufficient_quota":
+                    metrics.OPENAI_RATE_LIMITED.inc(model=model, result="gave_up")
+                    raise
+                delay = self.backoff(e.response.headers)
+                metrics.OPENAI_RATE_LIMITED.inc(model=model, result="retried")
+                logger.warning(f"OPENAI: rate limited ({lane}, {model}); pausing {delay:.2f}s")
+            except (APIConnectionError, InternalServerError) as e:
+                if attempt >= SETTINGS.openai_max_retries:
+                    raise
+                delay = min(SETTINGS.openai_backoff_max_seconds, 0.5 * 2 ** attempt)
+                logger.warning(f"OPENAI: {type(e).__name__} ({model}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+            else:
+                self.observe(model, raw.headers)
+                budget = self.budget(model)
+                for kind in KINDS:
+                    if budget.remaining[kind] is not None:
+                        metrics.OPENAI_REMAINING.set(budget.remaining[kind], model=model, kind=kind)
+                return raw.parse()
+            attempt += 1
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
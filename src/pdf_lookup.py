@@ -6,21 +6,83 @@
 # - Helps users access papers without paywalls
 # - Uses Unpaywall (primary) and Semantic Scholar (fallback)
 # - Returns direct PDF links when available
+# - Caches lookups in the shared state database, so every worker benefits
+# - Skips upstreams that are down (circuit breakers) and hedges slow ones
 # ================================================================================
 
 """PDF lookup service using Unpaywall and Semantic Scholar APIs."""
 
+import asyncio
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 from urllib.parse import quote
 
 import httpx
 
+from . import resilience, shared_state
+from .config import get_settings
+from .metrics import record_cache, timed
+
 logger = logging.getLogger(__name__)
 
+SETTINGS = get_settings()
+
 # Email for Unpaywall API (required, but they don't validate)
 UNPAYWALL_EMAIL = "grayson@research.app"
 
+# Shared client so lookups reuse pooled connections instead of a new TLS handshake each call
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=SETTINGS.upstream_timeout_seconds)
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Misses are re-checked sooner than hits: a failed request also looks like "no PDF"
+_NEGATIVE_TTL = 3600
+
+
+def _cached_lookup(key: str) -> Tuple[bool, Optional[str]]:
+    """(found, pdf_url) from the shared cache; pdf_url is None for a cached miss."""
+    value = shared_state.cache_get(key)
+    record_cache("pdf", value is not None)
+    if value is None:
+        return False, None
+    return True, value.decode("utf-8") or None
+
+
+async def _get(upstream: str, url: str) -> httpx.Response:
+    """GET through the upstream's circuit breaker; 429 and 5xx count as failures.
+
+    Raises:
+        resilience.CircuitOpenError: if the upstream is currently being skipped
+        httpx.HTTPError: on network errors, timeouts, 429 and 5xx
+    """
+    async def fetch():
+        response = await get_http_client().get(url)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+        return response
+
+    return await resilience.get_breaker(upstream).call(fetch)
+
+
+def _store_lookup(key: str, pdf_url: Optional[str]) -> None:
+    ttl = SETTINGS.pdf_cache_ttl if pdf_url else min(SETTINGS.pdf_cache_ttl, _NEGATIVE_TTL)
+    shared_state.cache_set(key, (pdf_url or "").encode("utf-8"), ttl=ttl)
+
 
 async def lookup_pdf_by_doi(doi: str) -> Optional[str]:
     """
@@ -39,17 +101,25 @@ async def lookup_pdf_by_doi(doi: str) -> Optional[str]:
     # Clean DOI (remove URL prefix if present)
     doi = doi.replace("https://doi.org/", "").replace("http://doi.org/", "")
 
-    # Try Unpaywall first
-    pdf_url = await _try_unpaywall(doi)
-    if pdf_url:
-        return pdf_url
-
-    # Fall back to Semantic Scholar
-    pdf_url = await _try_semantic_scholar(doi)
-    if pdf_url:
+    # Results are shared by all workers
+    key = f"pdf:doi:{doi.lower()}"
+    found, pdf_url = _cached_lookup(key)
+    if found:
         return pdf_url
 
-    return None
+    # Unpaywall first; Semantic Scholar if it has nothing, fails, or is slower than usual
+    try:
+        pdf_url = await resilience.hedged(
+            lambda: _try_unpaywall(doi),
+            lambda: _try_semantic_scholar(doi),
+            delay=resilience.hedge_delay("unpaywall"),
+        )
+    except Exception as e:
+        # Not cached: an outage shouldn't be remembered as "no free PDF"
+        logger.debug(f"PDF lookup failed for {doi}: {e}")
+        return None
+    _store_lookup(key, pdf_url)
+    return pdf_url
 
 
 async def lookup_pdf_by_title(title: str) -> Optional[str]:
@@ -66,102 +136,104 @@ async def lookup_pdf_by_title(title: str) -> Optional[str]:
     if not title:
         return None
 
-    return await _try_semantic_scholar_search(title)
-
+    key = f"pdf:title:{title.strip().lower()}"
+    found, pdf_url = _cached_lookup(key)
+    if found:
+        return pdf_url
 
-async def _try_unpaywall(doi: str) -> Optional[str]:
-    """Query Unpaywall API for open access PDF."""
     try:
-        url = f"https://api.unpaywall.org/v2/{quote(doi, safe='')}?email={UNPAYWALL_EMAIL}"
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                # Check for best open access location
-                best_oa = data.get("best_oa_location")
-                if best_oa and best_oa.get("url_for_pdf"):
-                    logger.info(f"Unpaywall: Found PDF for DOI {doi}")
-                    return best_oa["url_for_pdf"]
-                # Try other OA locations
-                for location in data.get("oa_locations", []):
-                    if location.get("url_for_pdf"):
-                        logger.info(f"Unpaywall: Found PDF for DOI {doi}")
-                        return location["url_for_pdf"]
+        pdf_url = await _try_semantic_scholar_search(title)
     except Exception as e:
-        logger.debug(f"Unpaywall lookup failed for {doi}: {e}")
+        logger.debug(f"Semantic Scholar search failed for '{title}': {e}")
+        return None
+    _store_lookup(key, pdf_url)
+    return pdf_url
+
+
+async def _try_unpaywall(doi: str) -> Optional[str]:
+    """Query Unpaywall API for open access PDF (errors propagate to the caller)."""
+    url = f"{SETTINGS.unpaywall_base_url}/v2/{quote(doi, safe='')}?email={UNPAYWALL_EMAIL}"
+    response = await _get("unpaywall", url)
+    if response.status_code == 200:
+        data = response.json()
+        # Check for best open access location
+        best_oa = data.get("best_oa_location")
+        if best_oa and best_oa.get("url_for_pdf"):
+            logger.info(f"Unpaywall: Found PDF for DOI {doi}")
+            return best_oa["url_for_pdf"]
+        # Try other OA locations
+        for location in data.get("oa_locations", []):
+            if location.get("url_for_pdf"):
+                logger.info(f"Unpaywall: Found PDF for DOI {doi}")
+                return location["url_for_pdf"]
     return None
 
 
 async def _try_semantic_scholar(doi: str) -> Optional[str]:
-    """Query Semantic Scholar API for open access PDF using DOI."""
-    try:
-        url = f"https://api.semanticscholar.org/graph/v1/paper/DOI:{quote(doi, safe='')}?fields=openAccessPdf"
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                oa_pdf = data.get("openAccessPdf")
-                if oa_pdf and oa_pdf.get("url"):
-                    logger.info(f"Semantic Scholar: Found PDF for DOI {doi}")
-                    return oa_pdf["url"]
-    except Exception as e:
-        logger.debug(f"Semantic Scholar lookup failed for {doi}: {e}")
+    """Query Semantic Scholar API for open access PDF using DOI (errors propagate to the caller)."""
+    url = f"{SETTINGS.semantic_scholar_base_url}/graph/v1/paper/DOI:{quote(doi, safe='')}?fields=openAccessPdf"
+    response = await _get("semantic_scholar", url)
+    if response.status_code == 200:
+        data = response.json()
+        oa_pdf = data.get("openAccessPdf")
+        if oa_pdf and oa_pdf.get("url"):
+            logger.info(f"Semantic Scholar: Found PDF for DOI {doi}")
+            return oa_pdf["url"]
     return None
 
 
 async def _try_semantic_scholar_search(title: str) -> Optional[str]:
-    """Search Semantic Scholar by title for open access PDF."""
-    try:
-        url = f"https://api.semanticscholar.org/graph/v1/paper/search?query={quote(title)}&fields=openAccessPdf&limit=1"
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                papers = data.get("data", [])
-                if papers:
-                    oa_pdf = papers[0].get("openAccessPdf")
-                    if oa_pdf and oa_pdf.get("url"):
-                        logger.info(f"Semantic Scholar: Found PDF for title '{title[:50]}...'")
-                        return oa_pdf["url"]
-    except Exception as e:
-        logger.debug(f"Semantic Scholar search failed for '{title}': {e}")
+    """Search Semantic Scholar by title for open access PDF (errors propagate to the caller)."""
+    url = f"{SETTINGS.semantic_scholar_base_url}/graph/v1/paper/search?query={quote(title)}&fields=openAccessPdf&limit=1"
+    response = await _get("semantic_scholar", url)
+    if response.status_code == 200:
+        data = response.json()
+        papers = data.get("data", [])
+        if papers:
+            oa_pdf = papers[0].get("openAccessPdf")
+            if oa_pdf and oa_pdf.get("url"):
+                logger.info(f"Semantic Scholar: Found PDF for title '{title[:50]}...'")
+                return oa_pdf["url"]
     return None
 
 
+async def _enrich_source(source: Optional[dict]) -> Optional[dict]:
+    """One source with 'free_pdf' added if found (DOI lookup first, then title)."""
+    if source is None:
+        return source
+
+    source_copy = dict(source) if source else {}
+
+    # Try DOI first
+    doi = source_copy.get("doi") or source_copy.get("url", "")
+    if "doi.org" in str(doi) or (isinstance(doi, str) and doi.startswith("10.")):
+        pdf_url = await lookup_pdf_by_doi(doi)
+        if pdf_url:
+            source_copy["free_pdf"] = pdf_url
+            return source_copy
+
+    # Fall back to title search
+    title = source_copy.get("title")
+    if title:
+        pdf_url = await lookup_pdf_by_title(title)
+        if pdf_url:
+            source_copy["free_pdf"] = pdf_url
+
+    return source_copy
+
+
+@timed("pdf_enrichment")
 async def enrich_sources_with_pdfs(sources: list) -> list:
     """
     Add free PDF links to a list of sources.
 
+    All sources are looked up concurrently, so the step takes about as long
+    as the slowest lookup rather than the sum of them.
+
     Args:
         sources: List of source metadata dicts with 'doi' and/or 'title' keys
 
     Returns:
         Same list with 'free_pdf' key added where available
     """
-    enriched = []
-    for source in sources:
-        if source is None:
-            enriched.append(source)
-            continue
-
-        source_copy = dict(source) if source else {}
-
-        # Try DOI first
-        doi = source_copy.get("doi") or source_copy.get("url", "")
-        if "doi.org" in str(doi) or (isinstance(doi, str) and doi.startswith("10.")):
-            pdf_url = await lookup_pdf_by_doi(doi)
-            if pdf_url:
-                source_copy["free_pdf"] = pdf_url
-                enriched.append(source_copy)
-                continue
-
-        # Fall back to title search
-        title = source_copy.get("title")
-        if title:
-            pdf_url = await lookup_pdf_by_title(title)
-            if pdf_url:
-                source_copy["free_pdf"] = pdf_url
-
-        enriched.append(source_copy)
-
-    return enriched
+    return list(await asyncio.gather(*(_enrich_source(source) for source in sources)))
@@ -0,0 +1,200 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# On-demand sampling profiler for individual requests.
+#
+# WHY YOU NEED IT:
+# - Shows why one slow /query was slow, in production, without a redeploy
+# - Triggered per request by a header (with a secret token) or a sampling rate
+# - Writes speedscope JSON and collapsed stacks (for flamegraph.pl) per request ID
+# - Costs one comparison per request when off, so it can stay deployed
+# ================================================================================
+
+"""Wall-clock sampling profiler that records Python stacks of all busy threads."""
+
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = get_settings()
+
+PROFILE_HEADER = "X-Grayson-Profile"
+
+# A thread whose innermost Python frame is in one of these is waiting, not working
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+_active = threading.Lock()  # one profile at a time bounds the overhead
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    """Root-to-leaf stack of a thread's current frame."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _is_idle(stack: Tuple[Frame, ...]) -> bool:
+    return not stack or stack[-1][1].endswith(_IDLE_FILES)
+
+
+class SamplingProfiler:
+    """Samples every thread's stack on a background thread.
+
+    Each sample is weighted by the wall time since the previous one, so
+    time blocked in network reads shows up alongside CPU time. Threads that
+    are only waiting for work (idle pool workers, the event loop selector)
+    are skipped. Work from concurrent requests lands in the same profile.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Dict[Tuple[str, Tuple[Frame, ...]], float] = defaultdict(float)
+        self.sample_count = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="grayson-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = _stack(frame)
+                if _is_idle(stack):
+                    continue
+                self.samples[(names.get(ident, str(ident)), stack)] += weight
+            self.sample_count += 1
+
+    # ---------------------------------------------------------
+    # Output formats
+    # ---------------------------------------------------------
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: "thread;root;...;leaf <microseconds>"."""
+        lines = []
+        for (thread, stack), seconds in sorted(self.samples.items()):
+            frames = ";".join(f"{name} ({Path(file).name}:{line})" for name, file, line in stack)
+            lines.append(f"{thread};{frames} {int(seconds * 1_000_000)}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> dict:
+        """https://www.speedscope.app sampled-profile JSON, one profile per thread."""
+        frame_index: Dict[Frame, int] = {}
+        frames = []
+        by_thread: Dict[str, List[Tuple[List[int], float]]] = defaultdict(list)
+        for (thread, stack), seconds in self.samples.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indices.append(frame_index[frame])
+            by_thread[thread].append((indices, seconds * 1000))
+
+        profiles = []
+        for thread, rows in sorted(by_thread.items()):
+            profiles.append({
+                "type": "sampled",
+                "name": thread,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weight for _, weight in rows),
+                "samples": [indices for indices, _ in rows],
+                "weights": [weight for _, weight in rows],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "grayson",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def top_functions(self, n: int = 10) -> List[Tuple[str, float, float]]:
+        """(function, self seconds, total seconds), hottest self time first."""
+        self_time: Dict[str, float] = defaultdict(float)
+        total_time: Dict[str, float] = defaultdict(float)
+        for (_, stack), seconds in self.samples.items():
+            labels = [f"{name} ({Path(file).name}:{line})" for name, file, line in stack]
+            self_time[labels[-1]] += seconds
+            for label in set(labels):
+                total_time[label] += seconds
+        ranked = sorted(self_time.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(label, seconds, total_time[label]) for label, seconds in ranked]
+
+
+def should_profile(header_value: Optional[str]) -> bool:
+    """Profile this request? A matching header token or a random draw under the sample rate."""
+    token = SETTINGS.profile_token
+    if header_value and token and header_value == token:
+        return True
+    rate = SETTINGS.profile_sample_rate
+    return rate > 0 and random.random() < rate
+
+
+def start_profile() -> Optional[SamplingProfiler]:
+    """Start a profiler, or return None if another request is already being profiled."""
+    if not _active.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler(interval=SETTINGS.profile_interval_ms / 1000)
+    profiler.start()
+    return profiler
+
+
+def finish_profile(profiler: SamplingProfiler, request_id: str, label: str) -> Path:
+    """Stop the profiler, write its files and log the hottest functions.
+
+    Returns:
+        Path of the speedscope JSON file
+    """
+    try:
+        profiler.stop()
+    finally:
+        _active.release()
+
+    out_dir = Path(SETTINGS.profile_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    speedscope_path = out_dir / f"{request_id}.speedscope.json"
+    speedscope_path.write_text(json.dumps(profiler.speedscope(f"{label} {request_id}")))
+    (out_dir / f"{request_id}.collapsed.txt").write_text(profiler.collapsed())
+
+    top = profiler.top_functions(SETTINGS.profile_top_n)
+    summary = "\n".join(
+        f"  {self_s * 1000:8.1f} ms self {total_s * 1000:8.1f} ms total  {function}"
+        for function, self_s, total_s in top
+    )
+    logger.info(
+        f"PROFILE: {label} {request_id} took {profiler.duration * 1000:.0f} ms "
+        f"({profiler.sample_count} samples) -> {speedscope_path}\n{summary}"
+    )
+    return speedscope_path
@@ -0,0 +1,129 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Quantized in-memory index used as a cheap first stage in front of ChromaDB.
+#
+# WHY YOU NEED IT:
+# - int8 codes are 4x smaller than float32 vectors, binary codes are 32x smaller
+# - Scanning the codes is much cheaper than scanning full-precision vectors
+# - Over-fetched candidates are re-scored against the full float32 vectors,
+#   so the final ranking keeps (almost) full-precision quality
+# ================================================================================
+
+"""Scalar (int8) and binary quantization with full-precision re-scoring."""
+
+from typing import List, Tuple
+
+import numpy as np
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# Rows scored per block, keeps the float32 temporaries small
+_BLOCK_SIZE = 8192
+
+# Popcount lookup table for numpy versions without np.bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(codes: np.ndarray) -> np.ndarray:
+    """Count set bits per row of a packed uint8 matrix."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(codes).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[codes].sum(axis=1, dtype=np.int32)
+
+
+def distances(query: np.ndarray, vectors: np.ndarray, space: str = "l2") -> np.ndarray:
+    """Exact distances between one query and many vectors, matching Chroma's spaces.
+
+    Args:
+        query: 1-D float32 query vector
+        vectors: 2-D float32 matrix, one vector per row
+        space: "l2" (squared L2), "cosine" or "ip"
+
+    Returns:
+        1-D array of distances (lower is closer)
+    """
+    query = np.asarray(query, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if space == "l2":
+        diff = vectors - query
+        return np.einsum("ij,ij->i", diff, diff)
+    if space == "cosine":
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        return 1.0 - (vectors @ query) / np.maximum(norms, 1e-12)
+    if space == "ip":
+        return 1.0 - vectors @ query
+    raise ValueError(f"Unknown distance space: {space}")
+
+
+class QuantizedIndex:
+    """Compressed copy of a collection's vectors for approximate candidate search.
+
+    Only the codes are kept in memory; full-precision vectors stay in ChromaDB
+    and are fetched for the candidates when re-scoring.
+    """
+
+    def __init__(self, ids: List[str], vectors: np.ndarray, mode: str = "int8"):
+        if mode not in ("int8", "binary"):
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.mode = mode
+        self.ids = list(ids)
+        self.dim = vectors.shape[1] if vectors.ndim == 2 else 0
+
+        if mode == "int8":
+            # Symmetric per-dimension scale so every dimension uses the full int8 range
+            max_abs = np.abs(vectors).max(axis=0) if len(vectors) else np.ones(self.dim)
+            self.scale = (np.maximum(max_abs, 1e-12) / 127.0).astype(np.float32)
+            self.codes = np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        else:
+            # One sign bit per dimension, packed 8 dimensions per byte
+            self.scale = None
+            self.codes = np.packbits(vectors > 0, axis=1)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the codes (and int8 scale)."""
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+        """Return the `k` best candidate IDs by approximate similarity.
+
+        Scores are higher-is-better (dot product for int8, negative Hamming
+        distance for binary) and only meaningful for ranking.
+        """
+        if not self.ids or k <= 0:
+            return [], np.array([], dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+
+        if self.mode == "int8":
+            # Fold the scale into the query instead of de-quantizing the codes
+            scaled_query = query * self.scale
+            scores = np.empty(len(self.ids), dtype=np.float32)
+            for start in range(0, len(self.ids), _BLOCK_SIZE):
+                block = self.codes[start:start + _BLOCK_SIZE].astype(np.float32)
+                scores[start:start + len(block)] = block @ scaled_query
+        else:
+            query_bits = np.packbits(query > 0)
+            scores = -_popcount(np.bitwise_xor(self.codes, query_bits)).astype(np.float32)
+
+        k = min(k, len(self.ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.ids[i] for i in top], scores[top]
+
+
+def rescore(query: np.ndarray, candidate_ids: List[str], candidate_vectors: np.ndarray,
+            top_k: int, space: str = "l2") -> List[Tuple[str, float]]:
+    """Re-rank candidates with exact full-precision distances.
+
+    Returns:
+        List of (id, distance) pairs, closest first
+    """
+    if not candidate_ids:
+        return []
+    dists = distances(query, candidate_vectors, space)
+    order = np.argsort(dists, kind="stable")[:top_k]
+    return [(candidate_ids[i], float(dists[i])) for i in order]
@@ -0,0 +1,261 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Blue/green rebuilds of the vector index: build a new versioned collection,
+# validate it, then atomically point the alias ("grayson", a shard) at it.
+#
+# WHY YOU NEED IT:
+# - Changing the embedding model or HNSW settings used to mean rebuilding the
+#   collection /query was reading from, or taking the service down
+# - The new version is built from the stored texts (and stored vectors, when
+#   the embedding model hasn't changed) while the old one keeps serving
+# - Readers warm the new collection before switching to it, and the old
+#   version stays on disk so a rollback is one alias update
+# - A new embedding model still needs the workers restarted with it: they
+#   embed queries with their own settings and won't serve a mismatched version
+#
+# Run with: python scripts/reindex.py build | status | rollback | prune
+# ================================================================================
+
+"""Versioned collections behind aliases: build, validate, swap, roll back, prune."""
+
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from . import sharding
+from .config import get_settings
+from .embeddings import embed_documents, embed_queries
+from .vectorstore import (
+    add_embedded_documents,
+    drop_collection,
+    embedding_signature,
+    get_client,
+    get_collection,
+    hnsw_metadata,
+    hydrate,
+    list_aliases,
+    list_collection_names,
+    recorded_signature,
+    resolve_alias,
+    set_aliases,
+    warm_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = get_settings()
+
+
+def version_name(alias: str, now: Optional[float] = None) -> str:
+    """A new versioned collection name for `alias`, e.g. "grayson-v20260101120000"."""
+    return f"{alias}-v{time.strftime('%Y%m%d%H%M%S', time.gmtime(now))}"
+
+
+def versions(alias: str) -> List[str]:
+    """Every collection belonging to `alias`, oldest first (the unversioned original first)."""
+    pattern = re.compile(rf"^{re.escape(alias)}-v\d{{14}}$")
+    names = list_collection_names()
+    found = sorted(name for name in names if pattern.match(name))
+    return ([alias] if alias in names else []) + found
+
+
+def needs_reembed(collection) -> bool:
+    """True if `collection`'s vectors came from a different embedding model or size than the settings."""
+    recorded = recorded_signature(collection)
+    if recorded is not None:
+        return recorded != embedding_signature()
+    # Collections from before versioning don't record their model; the vector size is all we can check
+    if SETTINGS.embedding_dimensions:
+        sample = collection.get(include=["embeddings"], limit=1)
+        if len(sample["embeddings"]):
+            return len(sample["embeddings"][0]) != SETTINGS.embedding_dimensions
+    return False
+
+
+def build(alias: str, reembed: Optional[bool] = None, batch_size: int = 500, pause: float = 0.1) -> Dict[str, Any]:
+    """Copy what `alias` serves into a new version created with the current settings.
+
+    Texts come from the document store (or Chroma, for older collections);
+    vectors are reused unless the embedding model or size changed, in which
+    case texts are re-embedded in the scheduler's ingestion lane. Readers are
+    not told about the writes: nobody searches the new version until the swap.
+    `pause` seconds between batches keep the build from crowding out queries.
+    """
+    source = get_collection(alias)
+    existing, now = set(list_collection_names()), time.time()
+    target = version_name(alias, now)
+    while target in existing:  # two builds within a second
+        now += 1
+        target = version_name(alias, now)
+    reembed = needs_reembed(source) if reembed is None else reembed
+    get_collection(target, metadata={**hnsw_metadata(), **embedding_signature()})
+    logger.info(f"REINDEX: building '{target}' from '{source.name}' ({'re-embedding' if reembed else 'reusing vectors'})")
+
+    copied = skipped = 0
+    offset = 0
+    while True:
+        page = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            break
+        offset += len(page["ids"])
+        hits = hydrate([{"id": i, "document": d, "metadata": m}
+                        for i, d, m in zip(page["ids"], page["documents"], page["metadatas"])])
+        if reembed:
+            kept = [h for h in hits if (h["document"] or "").strip()]
+            skipped += len(hits) - len(kept)
+            hits = kept
+            vectors = embed_documents([h["document"] for h in hits]) if hits else None
+        else:
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        if hits:
+            add_embedded_documents(
+                target,
+                ids=[h["id"] for h in hits],
+                embeddings=vectors,
+                documents=[h["document"] or "" for h in hits],
+                metadatas=[h["metadata"] or None for h in hits],
+                notify=False,
+            )
+            copied += len(hits)
+        if pause:
+            time.sleep(pause)
+    if skipped:
+        logger.warning(f"REINDEX: skipped {skipped} document(s) without text in '{source.name}'")
+    return {"alias": alias, "source": source.name, "target": target, "copied": copied,
+            "skipped": skipped, "reembedded": reembed}
+
+
+def validate(alias: str, target: str, queries: Optional[List[str]] = None, sample_size: int = 50,
+             top_k: int = 5, min_self_recall: float = 0.95, min_overlap: float = 0.8,
+             same_space: bool = True, expected_count: Optional[int] = None) -> Dict[str, Any]:
+    """Check a built version before it serves traffic.
+
+    - every copied document is in the new version (`expected_count`, default: the source's count)
+    - sampled documents find themselves in their own top_k (the index is intact)
+    - when vectors were reused, sampled vectors and `queries` get mostly the same
+      top_k from the old and the new version (HNSW changes didn't hurt recall)
+    - `queries` return results from the new version
+    """
+    old, new = get_collection(alias), get_client().get_collection(target)
+    count = new.count()
+    report: Dict[str, Any] = {"target": target, "source_count": old.count(), "target_count": count,
+                              "self_recall": None, "overlap": None, "empty_queries": 0}
+    expected = report["source_count"] if expected_count is None else expected_count
+    checks = [count == expected]
+
+    n = min(sample_size, count)
+    vectors, ids = [], []
+    for k in range(n):
+        page = new.get(include=["embeddings"], limit=1, offset=k * count // n)
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+    if vectors:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        found = new.query(query_embeddings=list(vectors), n_results=min(top_k, count), include=[])["ids"]
+        report["self_recall"] = sum(doc_id in hits for doc_id, hits in zip(ids, found)) / len(ids)
+        checks.append(report["self_recall"] >= min_self_recall)
+
+    probes = [vectors] if len(vectors) else []
+    if queries:
+        query_vectors = embed_queries(queries)
+        results = new.query(query_embeddings=list(query_vectors), n_results=top_k, include=[])["ids"]
+        report["empty_queries"] = sum(1 for hits in results if not hits)
+        checks.append(report["empty_queries"] == 0)
+        probes.append(query_vectors)
+    if same_space and probes and old.count():
+        probe = np.concatenate(probes)
+        k = min(top_k, count, old.count())
+        before = old.query(query_embeddings=list(probe), n_results=k, include=[])["ids"]
+        after = new.query(query_embeddings=list(probe), n_results=k, include=[])["ids"]
+        report["overlap"] = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(before, after)]))
+        checks.append(report["overlap"] >= min_overlap)
+
+    report["ok"] = all(checks)
+    return report
+
+
+def reindex(names: Optional[List[str]] = None, reembed: Optional[bool] = None,
+            queries: Optional[List[str]] = None, force: bool = False, batch_size: int = 500,
+            pause: float = 0.1, **checks) -> Dict[str, Any]:
+    """Build and validate a new version of every alias (default: every shard), then swap them together.
+
+    Nothing is swapped unless every version passes validation (or `force`).
+    The new versions are warmed here first, and readers warm them again
+    before switching, so no search runs against a cold index.
+    """
+    names = names or sharding.all_shards()
+    builds, reports = {}, {}
+    for alias in names:
+        built = build(alias, reembed=reembed, batch_size=batch_size, pause=pause)
+        builds[alias] = built
+        reports[alias] = validate(alias, built["target"], queries=queries, same_space=not built["reembedded"],
+                                  expected_count=built["copied"], **checks)
+        logger.info(f"REINDEX: validation of '{built['target']}': {reports[alias]}")
+
+    swapped = force or all(report["ok"] for report in reports.values())
+    if swapped:
+        for built in builds.values():
+            warm_collection(get_collection(built["target"]), max(SETTINGS.warmup_queries, 1))
+        set_aliases({alias: built["target"] for alias, built in builds.items()})
+        swaps = ", ".join(f"{alias} -> {built['target']}" for alias, built in builds.items())
+        logger.info(f"REINDEX: swapped {swaps}")
+    else:
+        logger.warning("REINDEX: validation failed; aliases unchanged (the new versions are kept for inspection)")
+    return {"swapped": swapped, "builds": builds, "validation": reports}
+
+
+def rollback(names: Optional[List[str]] = None) -> Dict[str, str]:
+    """Point each alias back at the version it served before the last swap."""
+    names = names or sharding.all_shards()
+    aliases = list_aliases()
+    targets = {}
+    for alias in names:
+        previous = (aliases.get(alias) or {}).get("previous")
+        if not previous:
+            raise RuntimeError(f"'{alias}' has no previous version to roll back to")
+        if previous not in list_collection_names():
+            raise RuntimeError(f"Previous version '{previous}' of '{alias}' no longer exists")
+        targets[alias] = previous
+    set_aliases(targets)
+    swaps = ", ".join(f"{alias} -> {target}" for alias, target in targets.items())
+    logger.info(f"REINDEX: rolled back {swaps}")
+    return targets
+
+
+def prune(names: Optional[List[str]] = None, dry_run: bool = False) -> List[str]:
+    """Delete versions that are neither current nor the rollback target; returns their names."""
+    names = names or sharding.all_shards()
+    aliases = list_aliases()
+    removed = []
+    for alias in names:
+        keep = {resolve_alias(alias), (aliases.get(alias) or {}).get("previous")}
+        for name in versions(alias):
+            if name in keep:
+                continue
+            removed.append(name)
+            if not dry_run:
+                drop_collection(name, notify=False, resolve=False)
+                logger.info(f"REINDEX: deleted old version '{name}'")
+    return removed
+
+
+def status(names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Per alias: current and previous target, and every version with its size and settings."""
+    names = names or sharding.all_shards()
+    aliases = list_aliases()
+    out = {}
+    for alias in names:
+        entries = []
+        for name in versions(alias):
+            collection = get_client().get_collection(name)
+            meta = collection.metadata or {}
+            entries.append({"name": name, "count": collection.count(),
+                            "embedding_model": meta.get("embedding_model"),
+                            "hnsw_m": meta.get("hnsw:M"), "hnsw_space": meta.get("hnsw:space")})
+        out[alias] = {"target": resolve_alias(alias),
+                      "previous": (aliases.get(alias) or {}).get("previous"),
+                      "versions": entries}
+    return out
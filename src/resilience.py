@@ -0,0 +1,211 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Circuit breakers, rolling latency percentiles and hedged requests for the
+# upstream academic APIs (Unpaywall, Semantic Scholar).
+#
+# WHY YOU NEED IT:
+# - Without it every query waits out the full timeout while an upstream is down
+# - A breaker opens after consecutive failures or slow calls and skips the
+#   upstream until a single probe call shows it has recovered
+# - Hedging starts the fallback once the primary is slower than usual, instead
+#   of waiting for it to fail
+# ================================================================================
+
+"""Per-upstream circuit breakers, latency tracking and request hedging."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import numpy as np
+
+from . import metrics
+from .config import get_settings
+
+SETTINGS = get_settings()
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class LatencyTracker:
+    """Durations of the most recent calls, for percentile estimates."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """The p-th percentile in seconds, or None until there are enough samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            return float(np.percentile(list(self._samples), p))
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures or slow calls.
+
+    While open, calls fail fast with CircuitOpenError. After `reset_seconds`
+    one probe call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, slow_call_seconds: float,
+                 reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.latency = LatencyTracker()
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                self._state = HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """May a call go through now? In half-open state, only one probe at a time."""
+        state = self.state
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, seconds: Optional[float], ok: bool) -> None:
+        """Outcome of a call; a successful call slower than `slow_call_seconds` counts as a failure."""
+        if ok and seconds is not None:
+            self.latency.record(seconds)
+        slow = ok and seconds is not None and seconds > self.slow_call_seconds
+        metrics.UPSTREAM_CALLS.inc(upstream=self.name, result="slow" if slow else ("ok" if ok else "error"))
+        with self._lock:
+            self._probing = False
+            if ok and not slow:
+                self._failures = 0
+                self._state = CLOSED
+            else:
+                self._failures += 1
+                if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                    self._state = OPEN
+                    self._opened_at = self._clock()
+            metrics.CIRCUIT_OPEN.set(1 if self._state == OPEN else 0, upstream=self.name)
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Await `func()` through the breaker.
+
+        Raises:
+            CircuitOpenError: if the circuit is open
+        """
+        if not self.allow():
+            metrics.UPSTREAM_CALLS.inc(upstream=self.name, result="rejected")
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        start = time.perf_counter()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # Cancelled (e.g. a hedge won): no verdict on the upstream
+            with self._lock:
+                self._probing = False
+            raise
+        except Exception:
+            self.record(None, ok=False)
+            raise
+        self.record(time.perf_counter() - start, ok=True)
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """This process's breaker for an upstream, created on first use."""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(
+            name,
+            failure_threshold=SETTINGS.breaker_failure_threshold,
+            slow_call_seconds=SETTINGS.breaker_slow_call_seconds,
+            reset_seconds=SETTINGS.breaker_reset_seconds,
+        )
+    return _breakers[name]
+
+
+def hedge_delay(name: str) -> float:
+    """How long to give an upstream before hedging: its HEDGE_PERCENTILE latency, once known."""
+    delay = get_breaker(name).latency.percentile(SETTINGS.hedge_percentile)
+    return SETTINGS.hedge_default_delay if delay is None else delay
+
+
+async def hedged(primary: Callable[[], Awaitable[Optional[T]]],
+                 fallback: Callable[[], Awaitable[Optional[T]]],
+                 delay: float) -> Optional[T]:
+    """First non-None result of `primary`, or of `fallback` started after `delay` seconds.
+
+    The fallback also starts as soon as the primary fails or returns None. A
+    primary result is used if both are available together.
+
+    Raises:
+        The first error seen, if neither returned a result and one of them failed
+        (so callers can tell "not found" from "couldn't ask")
+    """
+    errors: List[Exception] = []
+
+    async def attempt(factory):
+        try:
+            return await factory()
+        except Exception as e:
+            errors.append(e)
+            return None
+
+    first = asyncio.ensure_future(attempt(primary))
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            result = first.result()
+            if result is None:
+                result = await attempt(fallback)
+        else:
+            metrics.HEDGES.inc(result="fired")
+            second = asyncio.ensure_future(attempt(fallback))
+            tasks.append(second)
+            pending = {first, second}
+            result = None
+            while pending and result is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in tasks:
+                    if task in done and result is None:
+                        result = task.result()
+                        if result is not None and task is second:
+                            metrics.HEDGES.inc(result="won")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if result is None and errors:
+        raise errors[0]
+    return result
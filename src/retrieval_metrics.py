@@ -0,0 +1,73 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Small, dependency-free helpers for measuring retrieval quality.
+#
+# WHY YOU NEED IT:
+# - Every retrieval speedup (quantization, index tuning) trades off recall
+# - Brute-force neighbours give the ground truth to compare against
+# - Ranking metrics (MRR, nDCG) score results against labelled relevant papers
+# - Shared by the benchmark tools so they all measure the same way
+# ================================================================================
+
+"""Ground-truth neighbours, recall and ranking metrics."""
+
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+from .quantization import distances
+
+
+def exact_top_k(query: np.ndarray, ids: Sequence[str], vectors: np.ndarray,
+                k: int, space: str = "l2") -> List[str]:
+    """Brute-force nearest neighbours of `query` (the ground truth for recall)."""
+    if len(ids) == 0:
+        return []
+    dists = distances(query, vectors, space)
+    k = min(k, len(ids))
+    top = np.argpartition(dists, k - 1)[:k]
+    top = top[np.argsort(dists[top], kind="stable")]
+    return [ids[i] for i in top]
+
+
+def recall_at_k(expected: Sequence[str], retrieved: Sequence[str], k: int) -> float:
+    """Fraction of the true top-k that appears in the retrieved top-k."""
+    truth = set(list(expected)[:k])
+    if not truth:
+        return 1.0
+    return len(truth & set(list(retrieved)[:k])) / len(truth)
+
+
+Relevance = Union[Sequence[str], Dict[str, float]]
+
+
+def _gains(relevant: Relevance) -> Dict[str, float]:
+    """Graded relevance per ID; a plain list means every ID has gain 1."""
+    if isinstance(relevant, dict):
+        return {k: float(v) for k, v in relevant.items() if v > 0}
+    return {k: 1.0 for k in relevant}
+
+
+def reciprocal_rank(relevant: Relevance, retrieved: Sequence[str], k: int) -> float:
+    """1 / rank of the first relevant result in the top k (0 if none)."""
+    gains = _gains(relevant)
+    for rank, doc_id in enumerate(list(retrieved)[:k], start=1):
+        if doc_id in gains:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(relevant: Relevance, retrieved: Sequence[str], k: int) -> float:
+    """Normalized discounted cumulative gain of the top k (1.0 = ideal ordering)."""
+    gains = _gains(relevant)
+    if not gains:
+        return 1.0
+    seen = set()
+    dcg = 0.0
+    for rank, doc_id in enumerate(list(retrieved)[:k], start=1):
+        if doc_id in gains and doc_id not in seen:
+            seen.add(doc_id)
+            dcg += gains[doc_id] / np.log2(rank + 1)
+    ideal = sorted(gains.values(), reverse=True)[:k]
+    idcg = sum(g / np.log2(rank + 1) for rank, g in enumerate(ideal, start=1))
+    return float(dcg / idcg)
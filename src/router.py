@@ -0,0 +1,100 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Complexity-based routing: sorts each question into a tier (simple, standard,
+# complex) with its own model, completion budget and number of sources.
+#
+# WHY YOU NEED IT:
+# - Every question used to get the same model, 512 completion tokens and 5 sources
+# - "Who wrote the Didache?" needs a short answer from a few sources; "compare
+#   Barth's and Rahner's Christologies" needs a longer one from more
+# - The classifier is a handful of local heuristics: no API call, no latency
+# - Latency and spend are recorded per tier, so the split can be tuned
+# ================================================================================
+
+"""Cheap question classifier and per-tier generation settings."""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from .config import get_settings
+
+SETTINGS = get_settings()
+
+SIMPLE = "simple"
+STANDARD = "standard"
+COMPLEX = "complex"
+TIERS = (SIMPLE, STANDARD, COMPLEX)
+
+# Openings of short factual lookups: one name, date, definition or title
+_LOOKUP = re.compile(
+    r"^(who (is|was|wrote)|when (did|was|were)|where (is|was|did)|what (is|was|are|does .{1,40} mean)"
+    r"|define|definition of|meaning of|what year|which (book|author|council|century))\b",
+    re.IGNORECASE,
+)
+
+# Words that ask for analysis across ideas, authors or texts
+_ANALYSIS = re.compile(
+    r"\b(compare|comparison|contrast|differ|differences?|versus|vs\.?|relationship|relate[sd]?|"
+    r"influence[sd]?|implications?|evaluate|assess|critique|analy[sz]e|synthesi[sz]e|"
+    r"trace|develop(ed|ment)|tension|reconcile|interpret(ation)?s?)\b",
+    re.IGNORECASE,
+)
+
+# Words that ask for an explanation rather than a fact
+_EXPLAIN = re.compile(r"\b(why|how|explain|significance|role|purpose|impact|importance)\b", re.IGNORECASE)
+
+# Verse references such as "Romans 8:28" or "1 Cor 13:4-7"
+_VERSE = re.compile(r"\b\d?\s?[A-Z][a-z]+\.? \d+:\d+")
+
+
+def classify(question: str) -> str:
+    """The tier for `question`, from its length, wording and verse references."""
+    text = question.strip()
+    words = len(text.split())
+    analysis = len(_ANALYSIS.findall(text))
+    verses = len(_VERSE.findall(text))
+    questions = max(1, text.count("?"))
+
+    if analysis >= 2 or verses >= 2 or questions >= 2 or words > 40:
+        return COMPLEX
+    if analysis or verses:
+        return COMPLEX if words > 20 else STANDARD
+    if _EXPLAIN.search(text):
+        return STANDARD
+    if words <= 12 and _LOOKUP.search(text):
+        return SIMPLE
+    if words <= 4:
+        return SIMPLE  # a bare term: "kenosis", "the filioque clause"
+    return STANDARD
+
+
+def tier_settings(tier: str) -> Dict[str, Any]:
+    """Model, max_tokens and top_k for a tier (the model falls back to `model_name`)."""
+    return {
+        "tier": tier,
+        "model": getattr(SETTINGS, f"router_{tier}_model") or SETTINGS.model_name,
+        "max_tokens": getattr(SETTINGS, f"router_{tier}_max_tokens"),
+        "top_k": getattr(SETTINGS, f"router_{tier}_top_k"),
+    }
+
+
+def models() -> List[str]:
+    """Every chat model a question can be routed to."""
+    if not SETTINGS.router_enabled:
+        return [SETTINGS.model_name]
+    return sorted({tier_settings(tier)["model"] for tier in TIERS})
+
+
+def route(question: str, top_k: Optional[int] = None) -> Dict[str, Any]:
+    """Tier settings for a question; an explicit `top_k` from the client wins.
+
+    With the router off every question gets the standard tier's budget and the
+    default model, as before.
+    """
+    tier = classify(question) if SETTINGS.router_enabled else STANDARD
+    settings = tier_settings(tier)
+    if not SETTINGS.router_enabled:
+        settings.update(model=SETTINGS.model_name, max_tokens=512, top_k=5)
+    if top_k is not None:
+        settings["top_k"] = top_k
+    return settings
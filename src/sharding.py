@@ -0,0 +1,80 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Shard naming and routing for splitting the corpus across several collections.
+#
+# WHY YOU NEED IT:
+# - One giant HNSW index gets slow to rebuild and costs memory per process
+# - Topic shards follow how ingestion is already organized (THEOLOGY_QUERIES)
+# - Hash shards spread documents evenly when topics are unbalanced
+# - The topic router lets a query skip shards that can't be relevant
+# ================================================================================
+
+"""Shard naming, document placement and query routing."""
+
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .config import get_settings
+from .ingest import THEOLOGY_QUERIES
+
+SETTINGS = get_settings()
+
+BASE_COLLECTION = "grayson"
+GENERAL_SHARD = f"{BASE_COLLECTION}-general"  # topic mode: documents with no known topic
+
+SHARD_MODES = ("none", "topic", "hash")
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def topic_shard(topic: Optional[str]) -> str:
+    """Collection name for a topic; unknown topics go to the general shard."""
+    known = {t.lower(): t for t in THEOLOGY_QUERIES}
+    if topic and topic.strip().lower() in known:
+        return f"{BASE_COLLECTION}-{_slug(topic)}"
+    return GENERAL_SHARD
+
+
+def hash_shard(doc_id: str) -> str:
+    """Collection name for a document in hash mode (stable across runs)."""
+    bucket = int(hashlib.md5(doc_id.encode("utf-8")).hexdigest(), 16) % SETTINGS.shard_count
+    return f"{BASE_COLLECTION}-h{bucket:02d}"
+
+
+def shard_for(doc_id: str, topic: Optional[str] = None) -> str:
+    """Collection a document belongs to under the configured `shard_mode`."""
+    if SETTINGS.shard_mode == "topic":
+        return topic_shard(topic)
+    if SETTINGS.shard_mode == "hash":
+        return hash_shard(doc_id)
+    return BASE_COLLECTION
+
+
+def all_shards() -> List[str]:
+    """Every collection name queries may fan out to under the configured mode."""
+    if SETTINGS.shard_mode == "topic":
+        return [topic_shard(t) for t in THEOLOGY_QUERIES] + [GENERAL_SHARD]
+    if SETTINGS.shard_mode == "hash":
+        return [f"{BASE_COLLECTION}-h{i:02d}" for i in range(SETTINGS.shard_count)]
+    return [BASE_COLLECTION]
+
+
+def rank_shards(query: np.ndarray, centroids: Dict[str, np.ndarray], top_n: int) -> List[str]:
+    """Pick the `top_n` shards whose centroid is most similar to the query.
+
+    Centroids are the mean of each shard's stored vectors, so routing needs
+    no extra API calls.
+    """
+    if not centroids:
+        return []
+    names = list(centroids)
+    matrix = np.stack([centroids[n] for n in names])
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    similarity = (matrix @ query) / np.maximum(norms, 1e-12)
+    order = np.argsort(-similarity, kind="stable")[:top_n]
+    return [names[i] for i in order]
@@ -0,0 +1,122 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# State shared by every worker process, kept in one local SQLite file.
+#
+# WHY YOU NEED IT:
+# - With several workers, module-level dicts are per process and drift apart
+# - Holds the usage budget, a TTL cache (query embeddings, PDF links) and a
+#   store "generation" counter that tells readers the index changed
+# - SQLite in WAL mode gives cross-process locking without another server
+# ================================================================================
+
+"""SQLite-backed shared state: transactions, a TTL cache and change counters."""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from .config import get_settings
+
+SETTINGS = get_settings()
+
+_local = threading.local()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def state_path() -> Path:
+    """Location of the shared SQLite file (STATE_DB, default: next to chroma_db/)."""
+    if SETTINGS.state_db:
+        return Path(SETTINGS.state_db)
+    return Path(SETTINGS.chroma_persist_directory).parent / "grayson_state.sqlite3"
+
+
+def connect() -> sqlite3.Connection:
+    """This thread's connection to the shared state file (opened once per thread)."""
+    path = str(state_path())
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != path:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; writes go through `transaction()` for explicit locking
+        conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn, _local.path = conn, path
+    return conn
+
+
+@contextmanager
+def transaction():
+    """Write transaction that takes the database write lock up front (BEGIN IMMEDIATE).
+
+    Read-modify-write sequences inside it can't interleave with other processes.
+    """
+    conn = connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# ---------------------------------------------------------
+# TTL cache
+# ---------------------------------------------------------
+def cache_get(key: str) -> Optional[bytes]:
+    """Cached bytes for `key`, or None if missing or expired."""
+    row = connect().execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    value, expires_at = row
+    if expires_at is not None and expires_at < time.time():
+        return None
+    return value
+
+
+def cache_set(key: str, value: bytes, ttl: Optional[float] = None) -> None:
+    """Store bytes under `key`; `ttl` in seconds (None = no expiry)."""
+    expires_at = time.time() + ttl if ttl else None
+    connect().execute(
+        "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+        (key, value, expires_at),
+    )
+
+
+def cache_purge_expired() -> int:
+    """Delete expired cache rows; returns how many were removed."""
+    return connect().execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),)).rowcount
+
+
+# ---------------------------------------------------------
+# Change counters
+# ---------------------------------------------------------
+def get_counter(name: str) -> int:
+    row = connect().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def bump_counter(name: str) -> int:
+    """Increment a counter and return its new value."""
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
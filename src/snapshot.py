@@ -0,0 +1,209 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# Compact snapshot export/import for the vector store.
+#
+# WHY YOU NEED IT:
+# - Rebuilding a node otherwise means re-ingesting and re-embedding everything
+# - Snapshots hold the vectors already paid for, so importing costs no API calls
+# - Columnar files (.npy + Parquet) are small and load much faster than replaying ingestion
+# ================================================================================
+
+"""Export collections to `.npy` + Parquet snapshots and bulk-load them back.
+
+Snapshot layout:
+
+    snapshot/
+      manifest.json            # model, dimensions, per-collection counts and HNSW metadata, aliases
+      <collection>/embeddings.npy    # float32 matrix, row i belongs to records row i
+      <collection>/records.parquet   # id, document, metadata (JSON) columns
+"""
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .config import get_settings
+from .vectorstore import (
+    add_embedded_documents,
+    drop_collection,
+    get_collection,
+    hydrate,
+    list_aliases,
+    list_collection_names,
+    resolve_alias,
+    set_aliases,
+)
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = get_settings()
+
+SNAPSHOT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+RECORDS_FILE = "records.parquet"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Snapshots need pyarrow: pip install pyarrow") from e
+    return pyarrow, pyarrow.parquet
+
+
+def export_collection(name: str, out_dir: Path, chunk_size: int = 1000) -> Dict:
+    """Stream one collection to `out_dir/<name>/` in chunks.
+
+    Returns:
+        Manifest entry for the collection (count, dimensions, metadata)
+    """
+    pa, pq = _require_pyarrow()
+    collection = get_collection(name)
+    count = collection.count()
+    target = out_dir / name
+    target.mkdir(parents=True, exist_ok=True)
+
+    schema = pa.schema([("id", pa.string()), ("document", pa.string()), ("metadata", pa.string())])
+    writer = pq.ParquetWriter(target / RECORDS_FILE, schema, compression="zstd")
+    vectors = None
+    written = 0
+    try:
+        while written < count:
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=chunk_size,
+                offset=written,
+            )
+            if not page["ids"]:
+                break
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            if vectors is None:
+                # Written straight to disk so memory stays at one chunk
+                vectors = np.lib.format.open_memmap(
+                    target / EMBEDDINGS_FILE, mode="w+", dtype=np.float32,
+                    shape=(count, embeddings.shape[1]),
+                )
+            rows = len(page["ids"])
+            vectors[written:written + rows] = embeddings
+            # Snapshots are self-contained: texts held in the document store are written out too
+            hits = hydrate([{"id": i, "document": d, "metadata": m}
+                            for i, d, m in zip(page["ids"], page["documents"], page["metadatas"])])
+            writer.write_table(pa.table({
+                "id": page["ids"],
+                "document": [h["document"] or "" for h in hits],
+                "metadata": [json.dumps(h["metadata"] or {}) for h in hits],
+            }, schema=schema))
+            written += rows
+    finally:
+        writer.close()
+        if vectors is not None:
+            vectors.flush()
+
+    if written != count:
+        # The collection changed while we were paging through it
+        raise RuntimeError(f"'{name}' changed during export ({written} of {count} rows); retry on a quiet store")
+
+    return {
+        "count": written,
+        "dimensions": int(vectors.shape[1]) if vectors is not None else 0,
+        "metadata": collection.metadata or {},
+    }
+
+
+def export_snapshot(out_dir: str, names: Optional[List[str]] = None, chunk_size: int = 1000) -> Dict:
+    """Export collections (default: all of them) and write the manifest.
+
+    Aliases in `names` are exported under the collection they point to; the
+    manifest records every alias whose target was exported.
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    names = [resolve_alias(name) for name in names] if names else list_collection_names()
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "embedding_model": SETTINGS.embedding_model,
+        "embedding_dimensions": SETTINGS.embedding_dimensions,
+        "collections": {},
+        "aliases": {alias: info["target"] for alias, info in list_aliases().items() if info["target"] in names},
+    }
+    for name in names:
+        manifest["collections"][name] = export_collection(name, out, chunk_size)
+        logger.info(f"SNAPSHOT: exported '{name}' ({manifest['collections'][name]['count']} rows)")
+    (out / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def import_snapshot(in_dir: str, names: Optional[List[str]] = None, replace: bool = False,
+                    chunk_size: int = 1000, force: bool = False) -> Dict[str, int]:
+    """Bulk-load a snapshot without re-embedding.
+
+    Args:
+        in_dir: Snapshot directory written by `export_snapshot`
+        names: Collections to import (default: all in the manifest)
+        replace: Drop existing collections of the same name first
+        chunk_size: Rows per `collection.add` call
+        force: Import even if the snapshot's embedding model differs from the settings
+
+    Aliases recorded in the manifest are pointed at their imported targets
+    afterwards, so the API reads the same versions it did on the source node.
+
+    Returns:
+        Rows imported per collection
+    """
+    _, pq = _require_pyarrow()
+    src = Path(in_dir)
+    manifest = json.loads((src / MANIFEST_FILE).read_text())
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise RuntimeError(f"Unsupported snapshot version: {manifest.get('version')}")
+
+    # Query embeddings must come from the same model/size as the stored vectors
+    same_model = (manifest.get("embedding_model") == SETTINGS.embedding_model
+                  and manifest.get("embedding_dimensions") == SETTINGS.embedding_dimensions)
+    if not same_model and not force:
+        raise RuntimeError(
+            f"Snapshot was built with {manifest.get('embedding_model')} "
+            f"(dimensions={manifest.get('embedding_dimensions')}); settings use "
+            f"{SETTINGS.embedding_model} (dimensions={SETTINGS.embedding_dimensions})"
+        )
+
+    imported = {}
+    for name, info in manifest["collections"].items():
+        if names and name not in names:
+            continue
+        if replace:
+            # `name` is a concrete collection; an alias of the same name must not redirect the drop
+            drop_collection(name, resolve=False)
+        # Recreate with the snapshot's HNSW settings
+        get_collection(name, metadata=info.get("metadata") or None)
+
+        total = 0
+        if info["count"]:
+            vectors = np.load(src / name / EMBEDDINGS_FILE, mmap_mode="r")
+            records = pq.ParquetFile(src / name / RECORDS_FILE)
+            for batch in records.iter_batches(batch_size=chunk_size):
+                rows = batch.to_pydict()
+                size = len(rows["id"])
+                add_embedded_documents(
+                    name,
+                    ids=rows["id"],
+                    embeddings=np.ascontiguousarray(vectors[total:total + size]),
+                    documents=rows["document"],
+                    # Chroma rejects empty metadata dicts
+                    metadatas=[json.loads(m) or None for m in rows["metadata"]],
+                )
+                total += size
+        imported[name] = total
+        logger.info(f"SNAPSHOT: imported '{name}' ({total} rows)")
+
+    aliases = {alias: target for alias, target in manifest.get("aliases", {}).items() if target in imported}
+    if aliases:
+        set_aliases(aliases)
+        logger.info(f"SNAPSHOT: aliases {aliases}")
+    return imported
@@ -7,57 +7,96 @@
 # - Enforces monthly spending limit ($10/month)
 # - Auto-resets on the 1st of each month
 # - Prevents runaway API costs
+# - Shared by all worker processes (stored in the shared state database)
 # ================================================================================
 
 """Usage tracking and cost limiting for OpenAI API calls."""
 
 import json
-import os
+import logging
 from datetime import datetime
 from pathlib import Path
 from typing import Tuple
 
+from . import shared_state
+from .metrics import COST, TOKENS
+
+logger = logging.getLogger(__name__)
+
 # Pricing per token (as of 2024)
 PRICING = {
     "text-embedding-3-small": 0.02 / 1_000_000,  # $0.02 per 1M tokens
+    "text-embedding-3-large": 0.13 / 1_000_000,  # EMBEDDING_MODEL alternatives
+    "text-embedding-ada-002": 0.10 / 1_000_000,
     "gpt-3.5-turbo-input": 0.50 / 1_000_000,     # $0.50 per 1M tokens
     "gpt-3.5-turbo-output": 1.50 / 1_000_000,    # $1.50 per 1M tokens
+    "gpt-4o-mini-input": 0.15 / 1_000_000,       # router tiers may use these
+    "gpt-4o-mini-output": 0.60 / 1_000_000,
+    "gpt-4o-input": 2.50 / 1_000_000,
+    "gpt-4o-output": 10.00 / 1_000_000,
 }
 
 MONTHLY_LIMIT = 5.00  # $5 per month
 
-# Store usage data in the project root
-USAGE_FILE = Path(__file__).parent.parent / "usage_data.json"
-
+_warned_unpriced = set()
 
-def _get_current_month() -> str:
-    """Get current month as YYYY-MM string."""
-    return datetime.now().strftime("%Y-%m")
+# Usage used to be a JSON file in the project root; it is imported once, then left alone
+LEGACY_USAGE_FILE = Path(__file__).parent.parent / "usage_data.json"
 
+# Spend lives in the shared state database so every worker process sees the same
+# budget; one row per (month, model type), so a new month simply starts at zero
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    month TEXT NOT NULL,
+    model_type TEXT NOT NULL,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, model_type)
+)
+"""
 
-def _load_usage() -> dict:
-    """Load usage data from file."""
-    if USAGE_FILE.exists():
-        try:
-            with open(USAGE_FILE, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            pass
-    return {"month": _get_current_month(), "total_cost": 0.0, "breakdown": {}}
+_ready_path = None
 
 
-def _save_usage(data: dict) -> None:
-    """Save usage data to file."""
-    with open(USAGE_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+def _get_current_month() -> str:
+    """Get current month as YYYY-MM string."""
+    return datetime.now().strftime("%Y-%m")
 
 
-def _maybe_reset_month(data: dict) -> dict:
-    """Reset usage if we're in a new month."""
-    current_month = _get_current_month()
-    if data.get("month") != current_month:
-        return {"month": current_month, "total_cost": 0.0, "breakdown": {}}
-    return data
+def _connect():
+    """Shared state connection with the usage table created (and legacy JSON imported)."""
+    global _ready_path
+    conn = shared_state.connect()
+    path = shared_state.state_path()
+    if _ready_path != path:
+        conn.execute(_SCHEMA)
+        _import_legacy_file()
+        _ready_path = path
+    return conn
+
+
+def _import_legacy_file() -> None:
+    """Carry this month's spend over from usage_data.json the first time the table is used."""
+    if not LEGACY_USAGE_FILE.exists():
+        return
+    try:
+        data = json.loads(LEGACY_USAGE_FILE.read_text())
+    except (json.JSONDecodeError, IOError):
+        return
+    if data.get("month") != _get_current_month():
+        return
+    with shared_state.transaction() as conn:
+        if conn.execute("SELECT 1 FROM usage WHERE month = ?", (data["month"],)).fetchone():
+            return
+        for model_type, cost in (data.get("breakdown") or {}).items():
+            conn.execute("INSERT INTO usage (month, model_type, cost) VALUES (?, ?, ?)",
+                         (data["month"], model_type, cost))
+    logger.info(f"USAGE: imported ${data.get('total_cost', 0.0):.4f} from {LEGACY_USAGE_FILE.name}")
+
+
+def _month_breakdown(month: str) -> dict:
+    rows = _connect().execute("SELECT model_type, cost FROM usage WHERE month = ?", (month,)).fetchall()
+    return {model_type: cost for model_type, cost in rows}
 
 
 def check_usage_limit() -> Tuple[bool, float, str]:
@@ -66,11 +105,7 @@ def check_usage_limit() -> Tuple[bool, float, str]:
     Returns:
         Tuple of (is_allowed, remaining_budget, message)
     """
-    data = _load_usage()
-    data = _maybe_reset_month(data)
-    _save_usage(data)
-
-    total_cost = data.get("total_cost", 0.0)
+    total_cost = sum(_month_breakdown(_get_current_month()).values())
     remaining = MONTHLY_LIMIT - total_cost
 
     if total_cost >= MONTHLY_LIMIT:
@@ -87,43 +122,66 @@ def check_usage_limit() -> Tuple[bool, float, str]:
     return (True, remaining, "")
 
 
+def fallback_price(model_type: str) -> float:
+    """Per-token price for a model missing from PRICING: the highest known price of its kind.
+
+    Charging too much only stops spending early; charging nothing would let
+    an unpriced ROUTER_*_MODEL spend without limit.
+    """
+    for suffix in ("-input", "-output"):
+        if model_type.endswith(suffix):
+            return max(price for key, price in PRICING.items() if key.endswith(suffix))
+    return max(price for key, price in PRICING.items() if not key.endswith(("-input", "-output")))
+
+
+def unpriced_models(models) -> list:
+    """The chat models in `models` that PRICING doesn't know."""
+    return sorted(m for m in set(models) if f"{m}-input" not in PRICING or f"{m}-output" not in PRICING)
+
+
 def record_usage(model_type: str, tokens: int) -> float:
     """Record token usage and return the cost.
 
     Args:
-        model_type: One of 'text-embedding-3-small', 'gpt-3.5-turbo-input', 'gpt-3.5-turbo-output'
+        model_type: A PRICING key: the embedding model, or '<chat model>-input' / '<chat model>-output'
         tokens: Number of tokens used
 
     Returns:
         Cost in dollars for this usage
     """
-    data = _load_usage()
-    data = _maybe_reset_month(data)
-
-    price_per_token = PRICING.get(model_type, 0)
+    price_per_token = PRICING.get(model_type)
+    if price_per_token is None:
+        price_per_token = fallback_price(model_type)
+        if model_type not in _warned_unpriced:
+            _warned_unpriced.add(model_type)
+            logger.warning(f"USAGE: no price for '{model_type}'; charging ${price_per_token * 1_000_000:.2f} "
+                           f"per 1M tokens (add it to PRICING)")
     cost = tokens * price_per_token
 
-    data["total_cost"] = data.get("total_cost", 0.0) + cost
-
-    # Track breakdown by model type
-    if "breakdown" not in data:
-        data["breakdown"] = {}
-    data["breakdown"][model_type] = data["breakdown"].get(model_type, 0.0) + cost
-
-    _save_usage(data)
+    _connect()
+    # Atomic upsert: concurrent workers can't lose each other's increments
+    with shared_state.transaction() as conn:
+        conn.execute(
+            "INSERT INTO usage (month, model_type, tokens, cost) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(month, model_type) DO UPDATE SET "
+            "tokens = tokens + excluded.tokens, cost = cost + excluded.cost",
+            (_get_current_month(), model_type, tokens, cost),
+        )
+    TOKENS.inc(tokens, model_type=model_type)
+    COST.inc(cost, model_type=model_type)
     return cost
 
 
 def get_usage_stats() -> dict:
     """Get current usage statistics."""
-    data = _load_usage()
-    data = _maybe_reset_month(data)
-    _save_usage(data)
+    month = _get_current_month()
+    breakdown = _month_breakdown(month)
+    total_cost = sum(breakdown.values())
 
     return {
-        "month": data.get("month"),
-        "total_cost": data.get("total_cost", 0.0),
+        "month": month,
+        "total_cost": total_cost,
         "limit": MONTHLY_LIMIT,
-        "remaining": max(0, MONTHLY_LIMIT - data.get("total_cost", 0.0)),
-        "breakdown": data.get("breakdown", {}),
+        "remaining": max(0, MONTHLY_LIMIT - total_cost),
+        "breakdown": breakdown,
     }
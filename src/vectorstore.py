@@ -11,52 +11,442 @@
 
 """Simple Chroma-backed vector store wrapper.
 """
-from typing import List, Dict, Any
-import chromadb
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+import numpy as np
 
+from . import docstore, sharding, shared_state
 from .config import get_settings
-from .embeddings import embed_texts
+from .embeddings import embed_documents, embed_queries, embed_query
+from .metrics import record_cache, span, timed
+from .quantization import QuantizedIndex, rescore
+
+logger = logging.getLogger(__name__)
 
 SETTINGS = get_settings()
 
 _client = None
-_collection = None
+_collections = {}  # collection name -> cached collection handle
+_quantized_indexes = {}  # collection name -> QuantizedIndex
+_centroids = {}  # shard name -> mean vector, used by the topic router
+_fanout_pool = None
+
+# Another process (the writer, an ingest script) may change the index on disk.
+# Writers bump a shared counter; readers notice and reopen the client, because
+# an open client keeps serving the HNSW index it loaded.
+GENERATION_COUNTER = "store_generation"
+_seen_generation = None
+# Aliases map a logical name ("grayson", a shard) to a versioned collection
+# (see src/reindex.py); readers switch when this counter moves, without a reopen
+ALIAS_COUNTER = "alias_generation"
+_seen_aliases = None
+_last_generation_check = 0.0
+_store_cond = threading.Condition()
+_active_searches = 0
+_refreshing = False
 
 
 def get_client():
     global _client
     if _client is None:
+        # Imported lazily: chromadb is slow to import, so load it during startup, not at import
+        import chromadb
+
         # Use PersistentClient for local persistence (new ChromaDB API)
         _client = chromadb.PersistentClient(path=SETTINGS.chroma_persist_directory)
     return _client
 
 
-def get_collection(name: str = "grayson"):
-    global _collection
-    client = get_client()
-    # Use get_or_create_collection (new ChromaDB API)
-    _collection = client.get_or_create_collection(name)
-    return _collection
+def hnsw_metadata(space: str = None, m: int = None, construction_ef: int = None,
+                  search_ef: int = None) -> dict:
+    """Chroma collection metadata for the HNSW index, defaulting to `Settings`."""
+    return {
+        "hnsw:space": space or SETTINGS.hnsw_space,
+        "hnsw:M": m or SETTINGS.hnsw_m,
+        "hnsw:construction_ef": construction_ef or SETTINGS.hnsw_construction_ef,
+        "hnsw:search_ef": search_ef or SETTINGS.hnsw_search_ef,
+        "hnsw:sync_threshold": SETTINGS.hnsw_sync_threshold,
+        "hnsw:batch_size": min(100, SETTINGS.hnsw_sync_threshold),  # Chroma requires batch <= sync
+    }
+
+
+def collection_space(collection) -> str:
+    """Distance space a collection was created with (Chroma defaults to l2)."""
+    return (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def embedding_signature() -> Dict[str, Any]:
+    """Embedding model and size, recorded in each version's collection metadata."""
+    return {"embedding_model": SETTINGS.embedding_model,
+            "embedding_dimensions": SETTINGS.embedding_dimensions or 0}
+
+
+def recorded_signature(collection) -> Optional[Dict[str, Any]]:
+    """Embedding model and size a collection was built with, or None if it doesn't record them."""
+    meta = collection.metadata or {}
+    if "embedding_model" not in meta:
+        return None
+    return {"embedding_model": meta["embedding_model"],
+            "embedding_dimensions": meta.get("embedding_dimensions") or 0}
+
+
+def check_signature(collection) -> None:
+    """Refuse to search a collection whose vectors this process can't embed queries for.
+
+    Queries are embedded with this process's EMBEDDING_MODEL/EMBEDDING_DIMENSIONS,
+    so serving a collection built with another model would return nonsense.
+    """
+    recorded = recorded_signature(collection)
+    if recorded is not None and recorded != embedding_signature():
+        raise RuntimeError(
+            f"Collection '{collection.name}' was built with {recorded['embedding_model']} "
+            f"({recorded['embedding_dimensions'] or 'native'} dimensions) but this process embeds queries with "
+            f"{SETTINGS.embedding_model} ({SETTINGS.embedding_dimensions or 'native'} dimensions); "
+            "restart it with the collection's EMBEDDING_MODEL/EMBEDDING_DIMENSIONS")
+
+
+# ---------------------------------------------------------
+# Collection aliases
+# ---------------------------------------------------------
+_ALIAS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS collection_aliases (
+    alias TEXT PRIMARY KEY,
+    target TEXT NOT NULL,
+    previous TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def _alias_rows() -> Dict[str, tuple]:
+    conn = shared_state.connect()
+    conn.execute(_ALIAS_SCHEMA)
+    return {alias: (target, previous)
+            for alias, target, previous in conn.execute("SELECT alias, target, previous FROM collection_aliases")}
+
+
+def resolve_alias(name: str) -> str:
+    """The collection `name` currently points to (`name` itself if it isn't an alias)."""
+    row = _alias_rows().get(name)
+    return row[0] if row else name
+
+
+def list_aliases() -> Dict[str, Dict[str, Optional[str]]]:
+    """{alias: {"target", "previous"}} for every alias."""
+    return {alias: {"target": target, "previous": previous} for alias, (target, previous) in _alias_rows().items()}
+
+
+def set_aliases(targets: Dict[str, str]) -> None:
+    """Point several aliases at new collections in one transaction, remembering the old targets.
+
+    Other processes pick the change up on their next refresh check and warm
+    the new collection before they start searching it; this one switches
+    on its next `get_collection`.
+    """
+    shared_state.connect().execute(_ALIAS_SCHEMA)
+    with shared_state.transaction() as conn:
+        for alias, target in targets.items():
+            row = conn.execute("SELECT target FROM collection_aliases WHERE alias = ?", (alias,)).fetchone()
+            current = row[0] if row else alias
+            if current == target:
+                continue
+            conn.execute("INSERT OR REPLACE INTO collection_aliases (alias, target, previous, updated_at) "
+                         "VALUES (?, ?, ?, ?)", (alias, target, current, time.time()))
+    shared_state.bump_counter(ALIAS_COUNTER)
+    for alias in targets:
+        _collections.pop(alias, None)
+
+
+def get_collection(name: str = "grayson", metadata: Optional[dict] = None):
+    """Return the collection handle, opening it on first use.
+
+    `name` may be an alias; the handle of the collection it points to is cached
+    under `name`, so queries don't pay a metadata round-trip each time.
+    `metadata` overrides the HNSW settings used if the collection has to be created.
+    In read-only mode a missing collection is an error instead of being created,
+    and so is one built with a different embedding model (see `check_signature`).
+    """
+    collection = _collections.get(name)
+    record_cache("collection", collection is not None)
+    if collection is None:
+        client = get_client()
+        target = resolve_alias(name)
+        if SETTINGS.read_only:
+            collection = client.get_collection(target)
+            check_signature(collection)
+        else:
+            # Use get_or_create_collection (new ChromaDB API).
+            # HNSW settings only apply on creation; existing collections keep theirs.
+            collection = client.get_or_create_collection(target, metadata=metadata or hnsw_metadata())
+        _collections[name] = collection
+    return collection
+
+
+def _forget_derived(collection) -> None:
+    """Drop the quantized copy and centroid of a collection whose contents changed."""
+    _quantized_indexes.pop(collection.name, None)
+    _centroids.pop(collection.name, None)
+
+
+def _require_writable() -> None:
+    if SETTINGS.read_only:
+        raise RuntimeError("Vector store is read-only in this process (READ_ONLY=true); "
+                           "queue the write for the writer process instead")
+
+
+def _mark_changed() -> None:
+    """Tell other processes the index changed (this process is already up to date)."""
+    global _seen_generation
+    _seen_generation = shared_state.bump_counter(GENERATION_COUNTER)
+
+
+@contextmanager
+def _searching():
+    """Hold off a client refresh while a search is running."""
+    global _active_searches
+    with _store_cond:
+        while _refreshing:
+            _store_cond.wait()
+        _active_searches += 1
+    try:
+        yield
+    finally:
+        with _store_cond:
+            _active_searches -= 1
+            _store_cond.notify_all()
+
+
+def refresh_if_changed(force: bool = False) -> bool:
+    """Reopen the client if another process changed the index since we loaded it.
+
+    Checks the shared counter at most every `store_refresh_seconds`.
+
+    Returns:
+        True if the client was reopened
+    """
+    global _client, _seen_generation, _last_generation_check, _refreshing
+    now = time.monotonic()
+    if not force and now - _last_generation_check < SETTINGS.store_refresh_seconds:
+        return False
+    _last_generation_check = now
+    _check_aliases()
+    generation = shared_state.get_counter(GENERATION_COUNTER)
+    if _seen_generation is None or _client is None:
+        _seen_generation = generation
+        return False
+    if generation == _seen_generation:
+        return False
+
+    with _store_cond:
+        if _refreshing:
+            return False
+        _refreshing = True
+        while _active_searches:
+            _store_cond.wait()
+    try:
+        if _client is not None and hasattr(_client, "close"):
+            _client.close()
+        _client = None
+        _collections.clear()
+        _quantized_indexes.clear()
+        _centroids.clear()
+        _seen_generation = generation
+        logger.info(f"STORE: index changed on disk (generation {generation}), reopened")
+    finally:
+        with _store_cond:
+            _refreshing = False
+            _store_cond.notify_all()
+    return True
+
+
+def _check_aliases() -> None:
+    """Start switching cached handles whose alias now points elsewhere."""
+    global _seen_aliases
+    aliases = shared_state.get_counter(ALIAS_COUNTER)
+    if _seen_aliases is None or aliases == _seen_aliases:
+        _seen_aliases = aliases
+        return
+    _seen_aliases = aliases
+    for name, collection in list(_collections.items()):
+        target = resolve_alias(name)
+        if collection.name != target:
+            threading.Thread(target=switch_collection, args=(name, target), daemon=True,
+                             name=f"alias-switch-{name}").start()
+
+
+def switch_collection(name: str, target: str) -> bool:
+    """Open and warm `target`, then serve `name` from it.
+
+    Searches keep using the old collection until the new one is warm, so an
+    alias swap causes no cold-index latency spike. Returns False (and keeps
+    the old collection) if the target can't be opened or was built with a
+    different embedding model than this process embeds queries with.
+    """
+    try:
+        collection = get_client().get_collection(target)
+        check_signature(collection)
+        warm_collection(collection, max(SETTINGS.warmup_queries, 1))
+    except Exception as e:
+        logger.error(f"STORE: alias '{name}' -> '{target}' not switched: {e}")
+        return False
+    _collections[name] = collection  # one assignment: a search sees the old or the new handle
+    logger.info(f"STORE: '{name}' now served from '{target}'")
+    return True
+
+
+def list_collection_names() -> List[str]:
+    """Names of every collection in the store."""
+    # Newer chromadb returns Collection objects, older versions return names
+    return [c if isinstance(c, str) else c.name for c in get_client().list_collections()]
+
+
+def drop_collection(name: str, notify: bool = True, resolve: bool = True) -> None:
+    """Delete a collection (e.g. one shard before rebuilding it) and its cached state.
+
+    An alias is resolved: the collection it points to is dropped, unless
+    `resolve=False` (deleting an old version that shares the alias's name).
+    `notify=False` is for collections no reader is using.
+    """
+    _require_writable()
+    target = resolve_alias(name) if resolve else name
+    try:
+        get_client().delete_collection(target)
+    except Exception as e:
+        logger.debug(f"Collection '{target}' not deleted: {e}")
+    for cached, collection in list(_collections.items()):
+        if collection.name == target:
+            _collections.pop(cached, None)
+    _quantized_indexes.pop(target, None)
+    _centroids.pop(target, None)
+    if notify:
+        _mark_changed()
+
+
+def warm_up(name: Optional[str] = None, num_queries: int = 3) -> int:
+    """Open the collection(s) and run a few queries so indexes are loaded before real traffic.
+
+    Uses stored vectors as queries, so warming up costs no API calls.
+    With `name=None`, every shard of the configured `shard_mode` is warmed.
+
+    Returns:
+        Number of documents across the warmed collections
+    """
+    total = 0
+    refresh_if_changed(force=True)
+    for collection_name in ([name] if name else sharding.all_shards()):
+        try:
+            collection = get_collection(collection_name)
+        except Exception as e:
+            # Read-only workers can start before the writer has created a collection
+            logger.warning(f"WARMUP: '{collection_name}' not available yet: {e}")
+            continue
+        count, queries = warm_collection(collection, num_queries)
+        total += count
+        if queries:
+            logger.info(f"WARMUP: '{collection_name}' ready ({count} documents, {queries} queries)")
+    if SETTINGS.docstore_enabled:
+        docstore.connect()
+    return total
+
+
+def warm_collection(collection, num_queries: int):
+    """Load a collection's index with a few queries on its own vectors; (documents, queries run)."""
+    count = collection.count()
+    if count == 0 or num_queries <= 0:
+        return count, 0
+    sample = collection.get(include=["embeddings"], limit=num_queries)
+    for embedding in sample["embeddings"]:
+        collection.query(query_embeddings=[embedding], n_results=min(5, count), include=[])
+    if SETTINGS.quantization != "none":
+        get_quantized_index(collection)
+    if SETTINGS.shard_router:
+        get_centroid(collection)
+    return count, len(sample["ids"])
 
 
-def add_documents(documents: List[Dict[str, Any]]):
+def _add_in_batches(collection, ids: List[str], embeddings: np.ndarray,
+                    documents: List[str], metadatas: List[Dict[str, Any]], upsert: bool = False) -> None:
+    """collection.add in slices no larger than Chroma's max batch size (~5k rows).
+
+    With the document store on, texts and long metadata strings go there and
+    Chroma keeps only IDs, vectors and the short metadata fields.
+    `upsert=True` replaces existing IDs instead of leaving them unchanged.
+    """
+    write = collection.upsert if upsert else collection.add
+    batch_size = get_client().get_max_batch_size()
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        if not SETTINGS.docstore_enabled:
+            write(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+            )
+            continue
+        inline, stored = zip(*(docstore.split_metadata(m) for m in metadatas[start:end]))
+        # Texts first: a hit must never point at a document the store doesn't have yet
+        docstore.put_many(ids[start:end], documents[start:end], list(stored))
+        write(
+            ids=ids[start:end],
+            embeddings=embeddings[start:end],
+            metadatas=[m or None for m in inline],  # Chroma rejects empty metadata dicts
+        )
+
+
+def document_id(raw_id: Any) -> str:
+    """The Chroma ID of a record ("https://openalex.org/W1" -> "https___openalex.org_W1")."""
+    return str(raw_id or "").replace("/", "_").replace(":", "_")
+
+
+def stored_hashes(ids: List[str], topic: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """{document ID: its `content_hash` metadata (None if not recorded)} for the IDs already indexed."""
+    groups: Dict[str, List[str]] = {}
+    for doc_id in ids:
+        groups.setdefault(sharding.shard_for(doc_id, topic), []).append(doc_id)
+    found = {}
+    for name, group in groups.items():
+        try:
+            existing = get_collection(name).get(ids=group, include=["metadatas"])
+        except Exception as e:
+            # A read-only worker may not have the collection yet
+            logger.debug(f"Collection '{name}' not readable: {e}")
+            continue
+        for doc_id, metadata in zip(existing["ids"], existing["metadatas"]):
+            found[doc_id] = (metadata or {}).get("content_hash")
+    return found
+
+
+def add_documents(documents: List[Dict[str, Any]], topic: Optional[str] = None,
+                  embeddings: Optional[np.ndarray] = None, upsert: bool = False):
     """Documents: list of {id, text, metadata}.
 
     This function chunks documents simply and stores embeddings + metadata.
-    Skips documents with empty text.
+    Skips documents with empty text. With sharding enabled, each document goes
+    to the shard chosen by `sharding.shard_for` (using `topic` in topic mode).
+    Pass `embeddings` (one row per document) to skip the embeddings API, e.g.
+    for synthetic benchmark corpora. With `upsert=True`, documents already in
+    the index are replaced (changed records); otherwise Chroma keeps the
+    existing copy.
     """
-    collection = get_collection()
     ids = []
     docs = []
     metadatas = []
-    for d in documents:
-        doc_id = str(d.get("id") or "").replace("/", "_").replace(":", "_")
+    _require_writable()
+    kept = []  # positions in `documents`, to line up precomputed embeddings
+    for position, d in enumerate(documents):
+        doc_id = document_id(d.get("id"))
         text = d.get("text", "") or ""
 
         # Skip documents with empty text
         if not text.strip():
             continue
 
+        kept.append(position)
         ids.append(doc_id)
         docs.append(text)
         # Ensure all metadata values are simple types for ChromaDB
@@ -71,30 +461,294 @@ def add_documents(documents: List[Dict[str, Any]]):
                 clean_meta[k] = ""
             else:
                 clean_meta[k] = str(v)
-        metadatas.append(clean_meta)
+        if topic:
+            clean_meta["topic"] = topic
+        metadatas.append(clean_meta or None)  # Chroma rejects empty metadata dicts
 
     # Only proceed if we have valid documents
     if not docs:
         return
 
-    embeddings = embed_texts(docs).tolist()
-    collection.add(ids=ids, documents=docs, metadatas=metadatas, embeddings=embeddings)
+    if embeddings is None:
+        embeddings = embed_documents(docs)  # float32 matrix, passed to Chroma as-is
+    else:
+        embeddings = np.asarray(embeddings, dtype=np.float32)[kept]
 
+    # Group rows by target collection (a single group when sharding is off)
+    groups: Dict[str, List[int]] = {}
+    for i, doc_id in enumerate(ids):
+        groups.setdefault(sharding.shard_for(doc_id, topic), []).append(i)
 
-def query(query_text: str, top_k: int = 5):
-    collection = get_collection()
-    q_emb = embed_texts([query_text])[0].tolist()
-    results = collection.query(query_embeddings=[q_emb], n_results=top_k)
-    # Normalize results - handle empty results gracefully
+    for name, rows in groups.items():
+        collection = get_collection(name)
+        _add_in_batches(
+            collection,
+            ids=[ids[i] for i in rows],
+            embeddings=embeddings[rows],
+            documents=[docs[i] for i in rows],
+            metadatas=[metadatas[i] for i in rows],
+            upsert=upsert,
+        )
+        # The quantized copy and centroid are stale now; rebuild them on the next query
+        _forget_derived(collection)
+    _mark_changed()
+
+
+def add_embedded_documents(name: str, ids: List[str], embeddings: np.ndarray,
+                           documents: List[str], metadatas: List[Dict[str, Any]],
+                           notify: bool = True) -> None:
+    """Bulk-load documents whose embeddings are already computed (no API calls).
+
+    `notify=False` skips telling readers the index changed, for collections
+    nobody searches yet (a version being built by reindex); otherwise every
+    batch would make them reopen their client.
+    """
+    _require_writable()
+    collection = get_collection(name)
+    _add_in_batches(collection, ids, embeddings, documents, metadatas)
+    _forget_derived(collection)
+    if notify:
+        _mark_changed()
+
+
+def delete_documents(name: str, ids: List[str], notify: bool = True) -> None:
+    """Remove documents from a collection (alias or version), and their texts
+    from the document store unless another collection (e.g. the rollback
+    version of the same alias) still has them.
+    """
+    _require_writable()
+    if not ids:
+        return
+    collection = get_collection(name)
+    batch_size = get_client().get_max_batch_size()
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start:start + batch_size])
+    if SETTINGS.docstore_enabled:
+        shared = set()
+        for other in list_collection_names():
+            if other != collection.name:
+                shared.update(get_client().get_collection(other).get(ids=ids, include=[])["ids"])
+        docstore.delete_many([doc_id for doc_id in ids if doc_id not in shared])
+    _forget_derived(collection)
+    if notify:
+        _mark_changed()
+
+
+def iter_embeddings(collection, batch_size: int = 1000):
+    """Yield (ids, float32 embeddings) pages from a collection."""
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            break
+        yield page["ids"], np.asarray(page["embeddings"], dtype=np.float32)
+        offset += len(page["ids"])
+
+
+def get_quantized_index(collection) -> QuantizedIndex:
+    """Build (once) the quantized first-stage index for a collection."""
+    index = _quantized_indexes.get(collection.name)
+    record_cache("quantized_index", index is not None)
+    if index is None:
+        all_ids = []
+        pages = []
+        for ids, vectors in iter_embeddings(collection):
+            all_ids.extend(ids)
+            pages.append(vectors)
+        vectors = np.concatenate(pages) if pages else np.zeros((0, 0), dtype=np.float32)
+        index = QuantizedIndex(all_ids, vectors, mode=SETTINGS.quantization)
+        _quantized_indexes[collection.name] = index
+    return index
+
+
+def get_centroid(collection) -> Optional[np.ndarray]:
+    """Mean of a collection's stored vectors (None for an empty collection)."""
+    if collection.name not in _centroids:
+        total = None
+        count = 0
+        for _, vectors in iter_embeddings(collection):
+            total = vectors.sum(axis=0) if total is None else total + vectors.sum(axis=0)
+            count += len(vectors)
+        _centroids[collection.name] = total / count if count else None
+    return _centroids[collection.name]
+
+
+def _quantized_query(collection, q_emb: np.ndarray, top_k: int) -> dict:
+    """Over-fetch candidates from the quantized index, then re-score at full precision.
+
+    Returns results in the same shape as `collection.query` for a single query.
+    """
+    index = get_quantized_index(collection)
+    candidate_ids, _ = index.search(q_emb, top_k * max(SETTINGS.rescore_multiplier, 1))
+    if not candidate_ids:
+        return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+    candidates = collection.get(ids=candidate_ids, include=["embeddings"])
+    ranked = rescore(q_emb, candidates["ids"],
+                     np.asarray(candidates["embeddings"], dtype=np.float32), top_k,
+                     space=collection_space(collection))
+    top_ids = [doc_id for doc_id, _ in ranked]
+
+    # Only the final hits need documents and metadata
+    final = collection.get(ids=top_ids, include=_result_fields())
+    by_id = {doc_id: i for i, doc_id in enumerate(final["ids"])}
+    return {
+        "ids": [top_ids],
+        "documents": [[final["documents"][by_id[doc_id]] if final["documents"] else None
+                       for doc_id in top_ids]],
+        "metadatas": [[final["metadatas"][by_id[doc_id]] for doc_id in top_ids]],
+        "distances": [[dist for _, dist in ranked]],
+    }
+
+
+def _result_fields(distances: bool = False) -> List[str]:
+    """What to fetch with search results; texts are left to `hydrate` when the document store is on."""
+    fields = ["metadatas"] if SETTINGS.docstore_enabled else ["documents", "metadatas"]
+    return fields + ["distances"] if distances else fields
+
+
+def _normalize_hits(results: dict, row: int) -> List[Dict[str, Any]]:
+    """Hits for query `row` of a Chroma query result.
+
+    "document" is None when the text wasn't fetched; `hydrate` fills it in.
+    """
     out = []
-    if results["ids"] and results["ids"][0]:
-        for i in range(len(results["ids"][0])):
+    if results["ids"] and results["ids"][row]:
+        for i in range(len(results["ids"][row])):
             out.append(
                 {
-                    "id": results["ids"][0][i],
-                    "document": results["documents"][0][i] if results["documents"] else "",
-                    "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
-                    "distance": results["distances"][0][i] if results.get("distances") else None,
+                    "id": results["ids"][row][i],
+                    "document": results["documents"][row][i] if results.get("documents") else None,
+                    "metadata": results["metadatas"][row][i] if results["metadatas"] else {},
+                    "distance": results["distances"][row][i] if results.get("distances") else None,
                 }
             )
     return out
+
+
+def _search_collection(name: str, q_embs: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+    """Search one collection with one or more query vectors; normalized hits per query."""
+    try:
+        collection = get_collection(name)
+    except Exception as e:
+        if not SETTINGS.read_only:
+            raise
+        if isinstance(e, RuntimeError):
+            logger.error(f"STORE: '{name}' not searched: {e}")
+        else:
+            logger.debug(f"Collection '{name}' not available yet: {e}")
+        return [[] for _ in q_embs]
+    if SETTINGS.quantization != "none":
+        return [_normalize_hits(_quantized_query(collection, q_emb, top_k), 0) for q_emb in q_embs]
+    # One call for all queries: Chroma searches the batch in a single pass
+    results = collection.query(query_embeddings=list(q_embs), n_results=top_k,
+                               include=_result_fields(distances=True))
+    return [_normalize_hits(results, row) for row in range(len(q_embs))]
+
+
+def _shards_to_search(q_emb: np.ndarray) -> List[str]:
+    """All shards, or only the closest ones when the topic router is on."""
+    names = sharding.all_shards()
+    if len(names) == 1 or not SETTINGS.shard_router:
+        return names
+    centroids = {}
+    for name in names:
+        centroid = get_centroid(get_collection(name))
+        if centroid is not None:
+            centroids[name] = centroid
+    return sharding.rank_shards(q_emb, centroids, SETTINGS.shard_router_top_n) or names
+
+
+@timed("vector_search")
+def query_many(q_embs: np.ndarray, top_k: int = 5) -> List[List[Dict[str, Any]]]:
+    """Search with several precomputed query vectors (one row each); hits per query, in order.
+
+    Queries routed to the same shard are searched together in one call. With
+    several shards, each returns its own top_k and the merged lists are cut to
+    the global top_k.
+    """
+    global _fanout_pool
+    q_embs = np.asarray(q_embs, dtype=np.float32)
+    results: List[List[Dict[str, Any]]] = [[] for _ in q_embs]
+    if not len(q_embs):
+        return results
+
+    refresh_if_changed()
+    with _searching():
+        by_shard: Dict[str, List[int]] = {}
+        for i, q_emb in enumerate(q_embs):
+            for name in _shards_to_search(q_emb):
+                by_shard.setdefault(name, []).append(i)
+
+        if len(by_shard) == 1:
+            (name, rows), = by_shard.items()
+            return _search_collection(name, q_embs[rows], top_k)
+
+        if _fanout_pool is None:
+            _fanout_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="shard-search")
+        futures = {name: _fanout_pool.submit(_search_collection, name, q_embs[rows], top_k)
+                   for name, rows in by_shard.items()}
+        for name, future in futures.items():
+            for i, hits in zip(by_shard[name], future.result()):
+                results[i].extend(hits)
+
+    for hits in results:
+        hits.sort(key=lambda h: h["distance"] if h["distance"] is not None else float("inf"))
+        del hits[top_k:]
+    return results
+
+
+def query_by_embedding(q_emb: np.ndarray, top_k: int = 5) -> List[Dict[str, Any]]:
+    """Search with one precomputed query vector, fanning out across shards if enabled."""
+    return query_many(np.asarray(q_emb, dtype=np.float32)[None, :], top_k)[0]
+
+
+def _chroma_documents(ids: List[str]) -> Dict[str, str]:
+    """Texts still kept in Chroma (collections indexed before the document store existed)."""
+    found: Dict[str, str] = {}
+    for name in sharding.all_shards():
+        try:
+            page = get_collection(name).get(ids=[i for i in ids if i not in found], include=["documents"])
+        except Exception as e:
+            logger.debug(f"Collection '{name}' not available: {e}")
+            continue
+        found.update((doc_id, text) for doc_id, text in zip(page["ids"], page["documents"] or []) if text)
+        if len(found) == len(ids):
+            break
+    return found
+
+
+def hydrate(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill in the text (and stored metadata) of hits whose document the search didn't fetch.
+
+    One document store read for all of them; hits from collections indexed
+    before the store existed fall back to the text kept in Chroma. Hits that
+    already have their document are left alone. Returns `hits`.
+    """
+    pending = [hit for hit in hits if "document" in hit and hit["document"] is None]
+    if not pending:
+        return hits
+    with span("hydrate"):
+        records = docstore.get_many([hit["id"] for hit in pending])
+        legacy = [hit["id"] for hit in pending if hit["id"] not in records]
+        texts = _chroma_documents(legacy) if legacy else {}
+        for hit in pending:
+            record = records.get(hit["id"])
+            if record is None:
+                hit["document"] = texts.get(hit["id"], "")
+                continue
+            hit["document"] = record["text"]
+            if record["metadata"]:
+                # A new dict: cached records are shared, and the search's fields win
+                hit["metadata"] = {**record["metadata"], **(hit.get("metadata") or {})}
+    return hits
+
+
+def query(query_text: str, top_k: int = 5):
+    q_emb = embed_query(query_text)
+    return query_by_embedding(q_emb, top_k)
+
+
+def query_texts(texts: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+    """Embed several queries in one call and search them together; hits per query, in order."""
+    return query_many(embed_queries(texts), top_k)
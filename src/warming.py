@@ -0,0 +1,234 @@
+# ================================================================================
+# WHAT THIS FILE IS:
+# A log of normalized questions, a shared answer cache, and an off-peak job
+# that pre-answers the most popular and trending questions.
+#
+# WHY YOU NEED IT:
+# - Traffic repeats: the same topics peak around course deadlines, and many
+#   questions are variations on THEOLOGY_QUERIES
+# - Caches (query embeddings, PDF links) only fill as users arrive, so the
+#   first people each morning pay full latency
+# - Warming runs the whole pipeline for the top questions ahead of time and
+#   stores the answers; it stops at WARM_SPEND_CAP dollars per run
+#
+# Run with: python scripts/warm_cache.py   (or WARM_CACHE_HOUR for the writer)
+# ================================================================================
+
+"""Query log, answer cache and predictive cache warming."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from . import router, shared_state
+from .config import get_settings
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = get_settings()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_log (
+    normalized TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    PRIMARY KEY (normalized, day)
+)
+"""
+
+# Answers that must not be cached: failures and the spent-budget notice
+_UNCACHEABLE = ("Error calling OpenAI", "Monthly usage limit")
+
+
+# ---------------------------------------------------------
+# Query log
+# ---------------------------------------------------------
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _connect():
+    conn = shared_state.connect()
+    conn.execute(_SCHEMA)
+    return conn
+
+
+def normalize_question(question: str) -> str:
+    """Lowercased, single-spaced, without surrounding punctuation: "Who is Barth?" == "who is barth"."""
+    return re.sub(r"\s+", " ", question.lower()).strip().strip("?!.,;: ")
+
+
+def record_query(question: str) -> None:
+    """Count one asking of `question` today (the latest wording is kept for warming)."""
+    if not SETTINGS.query_log_enabled:
+        return
+    normalized = normalize_question(question)
+    if not normalized:
+        return
+    _connect()
+    with shared_state.transaction() as conn:
+        conn.execute(
+            "INSERT INTO query_log (normalized, day, count, question) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(normalized, day) DO UPDATE SET count = count + 1, question = excluded.question",
+            (normalized, _today(), question.strip()),
+        )
+
+
+def popular_questions(limit: int = 50, days: Optional[int] = None,
+                      half_life_days: Optional[float] = None) -> List[Dict[str, Any]]:
+    """The most asked questions of the last `days`, recent days weighted more.
+
+    Each day's count is halved every `half_life_days` of age, so a question
+    trending this week outranks one that was popular a month ago.
+    """
+    days = days or SETTINGS.warm_window_days
+    half_life = half_life_days or SETTINGS.warm_half_life_days
+    today = datetime.fromisoformat(_today()).date()
+    since = (today - timedelta(days=days)).isoformat()
+    scores: Dict[str, Dict[str, Any]] = {}
+    for normalized, day, count, question in _connect().execute(
+            "SELECT normalized, day, count, question FROM query_log WHERE day > ? ORDER BY day", (since,)):
+        age = (today - datetime.fromisoformat(day).date()).days
+        entry = scores.setdefault(normalized, {"question": question, "count": 0, "score": 0.0})
+        entry["question"] = question  # rows come oldest first: the latest wording wins
+        entry["count"] += count
+        entry["score"] += count * 0.5 ** (age / half_life)
+    ranked = sorted(scores.values(), key=lambda e: (-e["score"], e["question"]))
+    return ranked[:limit]
+
+
+def prune_log(days: Optional[int] = None) -> int:
+    """Delete log rows older than the warming window; returns how many were removed."""
+    since = (datetime.fromisoformat(_today()).date() - timedelta(days=days or SETTINGS.warm_window_days)).isoformat()
+    return _connect().execute("DELETE FROM query_log WHERE day <= ?", (since,)).rowcount
+
+
+# ---------------------------------------------------------
+# Answer cache
+# ---------------------------------------------------------
+def _answer_key(question: str, top_k: Optional[int]) -> str:
+    from .vectorstore import GENERATION_COUNTER
+
+    route = router.route(question, top_k)
+    # The store generation moves with every index write, so new documents are never hidden by old answers
+    generation = shared_state.get_counter(GENERATION_COUNTER)
+    digest = hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+    return f"answer:{route['model']}:{route['max_tokens']}:{route['top_k']}:{generation}:{digest}"
+
+
+def lookup(question: str, top_k: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Log a live question and return its cached response, if any (one threadpool hop for /query)."""
+    record_query(question)
+    return cached_answer(question, top_k)
+
+
+def cached_answer(question: str, top_k: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """A stored /query response (answer, sources, library_links) for the question, if any."""
+    if SETTINGS.answer_cache_ttl <= 0:
+        return None
+    value = shared_state.cache_get(_answer_key(question, top_k))
+    record_cache("answer", value is not None)
+    return json.loads(value) if value is not None else None
+
+
+def store_answer(question: str, top_k: Optional[int], response: Dict[str, Any]) -> bool:
+    """Cache a full-mode response; failed and over-budget answers are not stored."""
+    if SETTINGS.answer_cache_ttl <= 0 or response["answer"].startswith(_UNCACHEABLE):
+        return False
+    body = {key: response[key] for key in ("answer", "sources", "library_links")}
+    shared_state.cache_set(_answer_key(question, top_k), json.dumps(body).encode("utf-8"),
+                           ttl=SETTINGS.answer_cache_ttl)
+    return True
+
+
+# ---------------------------------------------------------
+# Warming
+# ---------------------------------------------------------
+def _month_spend() -> float:
+    from .usage_tracker import get_usage_stats
+
+    return get_usage_stats()["total_cost"]
+
+
+def warm_question(question: str, llm=None, top_k: Optional[int] = None) -> bool:
+    """Run the /query pipeline for one question and cache the answer; False if it was already cached.
+
+    The answer is stored under the key a /query request without `top_k` (what
+    the frontend sends) looks up. Embedding and PDF lookups fill their own
+    caches along the way.
+    """
+    from .llm import LLMClient, generate_library_links
+    from .pdf_lookup import close_http_client, enrich_sources_with_pdfs
+    from .vectorstore import query as vector_query
+
+    if cached_answer(question, top_k) is not None:
+        return False
+    hits = vector_query(question, top_k=router.route(question, top_k)["top_k"])
+
+    async def enrich():
+        try:
+            return await enrich_sources_with_pdfs([h.get("metadata") for h in hits])
+        finally:
+            await close_http_client()  # the client belongs to this event loop
+
+    sources = asyncio.run(enrich())
+    for hit, source in zip(hits, sources):
+        if source:
+            hit["metadata"] = {**(hit.get("metadata") or {}), "free_pdf": source.get("free_pdf")}
+    answer = (llm or LLMClient()).generate(question, hits)
+    return store_answer(question, top_k, {"answer": answer, "sources": sources,
+                                          "library_links": generate_library_links(question)})
+
+
+def warm(limit: Optional[int] = None, spend_cap: Optional[float] = None, include_topics: bool = True,
+         dry_run: bool = False) -> Dict[str, Any]:
+    """Pre-answer the most popular questions, most popular first, until `spend_cap` dollars are spent.
+
+    With `include_topics`, THEOLOGY_QUERIES fill the list when the log is
+    thin. Spend is read from the usage tracker before each question, so live
+    traffic during the run counts against the cap too (it errs on the safe
+    side); warming also stops when the monthly budget is exhausted.
+    """
+    from .ingest import THEOLOGY_QUERIES
+    from .llm import LLMClient
+    from .usage_tracker import check_usage_limit
+
+    limit = limit or SETTINGS.warm_max_questions
+    spend_cap = SETTINGS.warm_spend_cap if spend_cap is None else spend_cap
+    questions = [entry["question"] for entry in popular_questions(limit)]
+    if include_topics:
+        seen = {normalize_question(q) for q in questions}
+        questions += [t for t in THEOLOGY_QUERIES if normalize_question(t) not in seen][:limit - len(questions)]
+    if dry_run:
+        return {"questions": questions, "warmed": 0, "already_cached": 0, "spent": 0.0, "stopped": None}
+
+    start, started_at = _month_spend(), time.perf_counter()
+    warmed, cached, stopped = 0, 0, None
+    llm = LLMClient()
+    for question in questions:
+        spent = _month_spend() - start
+        if spent >= spend_cap:
+            stopped = "spend_cap"
+            break
+        if not check_usage_limit()[0]:
+            stopped = "monthly_limit"
+            break
+        try:
+            if warm_question(question, llm):
+                warmed += 1
+            else:
+                cached += 1
+        except Exception as e:
+            logger.warning(f"WARM: '{question}' failed: {e}")
+    spent = _month_spend() - start
+    logger.info(f"WARM: {warmed} answered, {cached} already cached, ${spent:.4f} spent "
+                f"in {time.perf_counter() - started_at:.1f}s" + (f" (stopped: {stopped})" if stopped else ""))
+    prune_log()
+    return {"questions": questions, "warmed": warmed, "already_cached": cached, "spent": spent, "stopped": stopped}
@@ -84,6 +84,59 @@ import pytest
 #     shutil.rmtree(temp_dir)
 
 
+# ---------------------------------------------------------
+# Shared state (usage budget, caches, job queue) per test
+# Keeps tests from writing grayson_state.sqlite3 into the project
+# ---------------------------------------------------------
+@pytest.fixture(autouse=True)
+def shared_state_db(tmp_path, monkeypatch):
+    """Point the shared state database and the document store at fresh files."""
+    from src import docstore, shared_state
+
+    path = tmp_path / "state.sqlite3"
+    monkeypatch.setattr(shared_state.SETTINGS, "state_db", str(path))
+    monkeypatch.setattr(docstore.SETTINGS, "docstore_path", str(tmp_path / "docs.sqlite3"))
+    return path
+
+
+# ---------------------------------------------------------
+# FastAPI test client
+# Warm-up is stubbed so tests never open the real chroma_db/
+# ---------------------------------------------------------
+@pytest.fixture
+def client(monkeypatch):
+    """FastAPI test client with startup warm-up stubbed out."""
+    from fastapi.testclient import TestClient
+
+    from src import main
+
+    monkeypatch.setattr(main, "warm_up", lambda name, num_queries: 0)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+# ---------------------------------------------------------
+# Vector store in a temporary directory
+# Never touches the real chroma_db/
+# ---------------------------------------------------------
+@pytest.fixture
+def temp_store(tmp_path, monkeypatch):
+    """src.vectorstore pointed at an empty Chroma store under tmp_path."""
+    import chromadb
+
+    from src import vectorstore
+
+    monkeypatch.setattr(vectorstore.SETTINGS, "chroma_persist_directory", str(tmp_path))
+    monkeypatch.setattr(vectorstore, "_client", chromadb.PersistentClient(path=str(tmp_path)))
+    monkeypatch.setattr(vectorstore, "_collections", {})
+    monkeypatch.setattr(vectorstore, "_quantized_indexes", {})
+    monkeypatch.setattr(vectorstore, "_centroids", {})
+    monkeypatch.setattr(vectorstore, "_seen_generation", None)
+    monkeypatch.setattr(vectorstore, "_seen_aliases", None)
+    monkeypatch.setattr(vectorstore, "_last_generation_check", 0.0)
+    return vectorstore
+
+
 # ---------------------------------------------------------
 # Placeholder fixture - Remove when implementing
 # ---------------------------------------------------------
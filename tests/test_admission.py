@@ -0,0 +1,158 @@
+"""
+Tests for /query admission control: rate limits, the bounded wait queue and
+degraded modes.
+
+Run with: pytest tests/test_admission.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from src import admission
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    """Set admission settings for one test and reset the controller."""
+    monkeypatch.setattr(admission, "_controller", None)
+    monkeypatch.setattr(admission, "_last_purge", 0.0)
+
+    def apply(**overrides):
+        for field, value in overrides.items():
+            monkeypatch.setattr(admission.SETTINGS, field, value)
+
+    return apply
+
+
+class TestTokenBucket:
+    """Tests for the shared per-client token bucket."""
+
+    def test_burst_then_refill(self, limits):
+        limits(rate_limit_per_minute=60.0, rate_limit_burst=2)
+        assert admission.take_token("a", now=100.0) == 0.0
+        assert admission.take_token("a", now=100.0) == 0.0
+        assert admission.take_token("a", now=100.0) == pytest.approx(1.0)
+        # Other clients have their own bucket
+        assert admission.take_token("b", now=100.0) == 0.0
+        # One token per second comes back
+        assert admission.take_token("a", now=101.0) == 0.0
+
+    def test_refilled_buckets_are_purged(self, limits):
+        limits(rate_limit_per_minute=60.0, rate_limit_burst=2)
+        admission.take_token("old", now=100.0)
+        admission.take_token("recent", now=101.5)
+        assert admission.purge_buckets(now=103.0) == 1  # "old" is full again after 2 s
+        count = admission.shared_state.connect().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+        assert count == 1
+
+    def test_batch_cost_and_debt(self, limits):
+        limits(rate_limit_per_minute=60.0, rate_limit_burst=4)
+        assert admission.take_token("a", now=100.0, cost=3) == 0.0
+        assert admission.take_token("a", now=100.0, cost=3) == pytest.approx(2.0)
+        # Larger than the burst: needs a full bucket, then the debt is paid off first
+        assert admission.take_token("a", now=103.0, cost=10) == 0.0
+        assert admission.take_token("a", now=108.0) == pytest.approx(2.0)
+        assert admission.purge_buckets(now=108.0) == 0  # still in debt, not full
+
+    def test_disabled_when_rate_is_zero(self, limits):
+        limits(rate_limit_per_minute=0.0, rate_limit_burst=1)
+        assert all(admission.take_token("a", now=0.0) == 0.0 for _ in range(5))
+
+
+class TestAdmissionController:
+    """Tests for the concurrency cap and bounded queue."""
+
+    async def test_sheds_when_queue_full(self, limits):
+        limits(degrade_skip_pdfs_at=0.5, degrade_retrieval_only_at=1.0)
+        controller = admission.AdmissionController(max_concurrent=1, max_queue=2, max_wait=1.0)
+        release = asyncio.Event()
+        modes = []
+
+        async def hold():
+            async with controller.slot() as mode:
+                modes.append(mode)
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert controller.active == 1 and controller.waiting == 2
+
+        with pytest.raises(admission.Rejected) as excinfo:
+            async with controller.slot():
+                pass
+        assert excinfo.value.status_code == 503 and excinfo.value.retry_after >= 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        # First request ran normally; the second queued behind nobody waiting; the third saw a half-full queue
+        assert modes == [admission.FULL, admission.FULL, admission.SKIP_PDFS]
+        assert controller.active == 0 and controller.waiting == 0
+
+    async def test_wait_timeout(self):
+        controller = admission.AdmissionController(max_concurrent=1, max_queue=4, max_wait=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot():
+                await release.wait()
+
+        task = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        with pytest.raises(admission.Rejected) as excinfo:
+            async with controller.slot():
+                pass
+        assert excinfo.value.status_code == 503
+        assert controller.waiting == 0
+        release.set()
+        await task
+
+
+class TestQueryEndpoint:
+    """Tests for admission on POST /query."""
+
+    @pytest.fixture
+    def stubbed(self, client, monkeypatch):
+        from src import main
+
+        hits = [{"id": "W1", "document": "Grace in Romans.", "metadata": {"title": "Grace", "doi": "10.1/x"}}]
+        monkeypatch.setattr(main, "vector_query", lambda question, top_k=5: [dict(h) for h in hits])
+        monkeypatch.setattr(main.llm, "generate", lambda question, docs: "LLM answer")
+
+        async def enrich(sources):
+            return [dict(s, free_pdf="https://example.org/a.pdf") for s in sources]
+
+        monkeypatch.setattr(main, "enrich_sources_with_pdfs", enrich)
+        return client
+
+    def test_rate_limited_client_gets_429(self, stubbed, limits):
+        limits(rate_limit_per_minute=1.0, rate_limit_burst=1)
+        assert stubbed.post("/query", json={"question": "grace"}).status_code == 200
+        response = stubbed.post("/query", json={"question": "grace"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+    def test_full_mode_response(self, stubbed, limits):
+        limits(rate_limit_per_minute=0.0)
+        body = stubbed.post("/query", json={"question": "grace"}).json()
+        assert body["answer"] == "LLM answer"
+        assert body["sources"][0]["free_pdf"]
+        assert "degraded" not in body
+
+    def test_retrieval_only_mode_skips_llm_and_pdfs(self, stubbed, limits):
+        limits(rate_limit_per_minute=0.0, degrade_skip_pdfs_at=0.0, degrade_retrieval_only_at=0.0)
+        body = stubbed.post("/query", json={"question": "grace"}).json()
+        assert body["degraded"] == admission.RETRIEVAL_ONLY
+        assert body["answer"] != "LLM answer" and "Grace" in body["answer"]
+        assert not body["sources"][0].get("free_pdf")
+
+    def test_batch_spends_a_token_per_question(self, stubbed, limits, monkeypatch):
+        from src import main
+
+        monkeypatch.setattr(main, "query_texts", lambda questions, top_k=5: [[] for _ in questions])
+        limits(rate_limit_per_minute=1.0, rate_limit_burst=3)
+        batch = {"questions": ["grace", "faith", "hope"]}
+        assert stubbed.post("/query/batch", json=batch).status_code == 200
+        response = stubbed.post("/query", json={"question": "grace"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,97 @@
+"""
+Tests for the benchmark tools in benchmarks/, run against temporary stores
+and stubbed processes.
+
+Run with: pytest tests/test_benchmarks.py -v
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+import hnsw_sweep  # noqa: E402
+import run_benchmark  # noqa: E402
+
+
+class TestHnswSweep:
+    """Tests for the HNSW recall/latency sweep."""
+
+    def test_sweep_reports_recall_and_latency_per_setting(self, temp_store, tmp_path, monkeypatch):
+        embeddings = np.random.default_rng(0).standard_normal((60, 8)).astype(np.float32)
+        records = [{"id": f"W{i}", "text": f"abstract {i}"} for i in range(60)]
+        temp_store.add_documents(records, embeddings=embeddings)
+
+        out = tmp_path / "sweep.json"
+        monkeypatch.setattr(sys, "argv", ["hnsw_sweep.py", "--m", "8,16", "--construction-ef", "100",
+                                          "--search-ef", "10,100", "--queries", "20", "--json", str(out)])
+        hnsw_sweep.main()
+
+        report = json.loads(out.read_text())
+        assert report["vectors"] == 60 and report["queries"] == 20 and report["space"] == "l2"
+        rows = report["results"]
+        assert [(r["m"], r["search_ef"]) for r in rows] == [(8, 10), (8, 100), (16, 10), (16, 100)]
+        assert all(r["p50_ms"] <= r["p99_ms"] for r in rows)
+        # 60 vectors with search_ef 100 is an exhaustive search
+        assert all(r["recall_at_k"] == 1.0 for r in rows if r["search_ef"] == 100)
+
+
+class TestRunBenchmark:
+    """Tests for the end-to-end benchmark's report, with the app and load generator stubbed."""
+
+    @pytest.fixture
+    def stubbed(self, tmp_path, monkeypatch):
+        class Process:
+            def terminate(self):
+                pass
+
+            def wait(self, timeout=None):
+                return 0
+
+        class Response:
+            status_code = 200
+
+            def raise_for_status(self):
+                pass
+
+        async def fake_load(base_url, questions, concurrency, top_k):
+            if len(questions) <= 5:  # warm-up
+                return [1.0], 0, 0.1
+            return [float(ms) for ms in range(1, 101)], 2, 10.0
+
+        scrapes = iter([{"embed": [1.0, 10.0]}, {"embed": [1.5, 20.0], "llm_generate": [2.0, 0.0]}])
+        monkeypatch.setattr(run_benchmark.tempfile, "mkdtemp", lambda prefix: str(tmp_path))
+        monkeypatch.setattr(run_benchmark, "start_processes", lambda args, workdir: (Process(), Process(), "http://x"))
+        monkeypatch.setattr(run_benchmark.httpx, "post", lambda *args, **kwargs: Response())
+        monkeypatch.setattr(run_benchmark, "_wait_until_ready", lambda url: None)
+        monkeypatch.setattr(run_benchmark, "run_load", fake_load)
+        monkeypatch.setattr(run_benchmark, "scrape_stages", lambda base_url, workers=1: next(scrapes))
+
+        def run(*argv):
+            monkeypatch.setattr(sys, "argv", ["run_benchmark.py", "--topics", "2", "--requests", "100", *argv])
+            run_benchmark.main()
+
+        return run
+
+    def test_json_report(self, stubbed, tmp_path):
+        out = tmp_path / "bench.json"
+        stubbed("--output", str(out))
+        result = json.loads(out.read_text())
+        assert result["requests"] == 102 and result["errors"] == 2 and result["rps"] == 10.0
+        latency = result["latency_ms"]
+        assert (latency["p50"], latency["p95"], latency["p99"]) == pytest.approx((50.5, 95.05, 99.01))
+        assert latency["max"] == 100.0
+        # Stage means come from the /metrics delta; stages without new calls are left out
+        assert result["stages"] == {"embed": {"calls": 10, "mean_ms": pytest.approx(50.0)}}
+        assert result["config"]["requests"] == 100
+
+    def test_compare_fails_on_a_p95_regression(self, stubbed, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        baseline.write_text(json.dumps({"latency_ms": {"p50": 50.0, "p95": 80.0, "p99": 99.0}, "rps": 10.0}))
+        with pytest.raises(SystemExit) as exit_info:
+            stubbed("--compare", str(baseline))
+        assert exit_info.value.code == 1
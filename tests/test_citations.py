@@ -0,0 +1,58 @@
+"""
+Tests for source marker expansion and the server-rendered Sources section.
+
+Run with: pytest tests/test_citations.py -v
+"""
+
+from src.citations import CitationExpander, expand_citations, source_links
+
+HITS = [
+    {"id": "W1", "metadata": {"title": "Grace in Romans", "free_pdf": "https://example.org/grace.pdf"}},
+    {"id": "W2", "metadata": {"title": "Covenant Theology"}},
+    {"id": "W3", "metadata": {"title": "Patristic Exegesis"}},
+]
+
+
+class TestExpandCitations:
+    """Tests for complete answers."""
+
+    def test_markers_become_links_and_sources_are_rendered(self):
+        text = expand_citations("Paul stresses grace [S1], as do others [S3, S1].", HITS)
+        omni_1 = source_links(HITS[0])["omni"]
+        omni_3 = source_links(HITS[2])["omni"]
+        assert f"grace [[1]]({omni_1})," in text
+        assert f"others [[3]]({omni_3})[[1]]({omni_1})." in text
+        sources = text.split("**Sources:**")[1]
+        # Cited sources only, by number; free PDF included
+        assert sources.index("Grace in Romans") < sources.index("Patristic Exegesis")
+        assert "Covenant Theology" not in sources
+        assert "[Free PDF](https://example.org/grace.pdf)" in sources
+
+    def test_unknown_markers_are_dropped_and_uncited_answers_list_all_sources(self):
+        text = expand_citations("Nothing relevant [S9].", HITS)
+        assert "[S9]" not in text and "[[9]]" not in text
+        assert all(hit["metadata"]["title"] in text for hit in HITS)
+
+    def test_ordinary_brackets_are_left_alone(self):
+        assert expand_citations("See [Romans 8] and [Sic].", []).startswith("See [Romans 8] and [Sic].")
+
+
+class TestStreaming:
+    """Tests for markers split across streamed chunks."""
+
+    def test_split_marker_is_held_back_until_complete(self):
+        expander = CitationExpander(HITS)
+        assert expander.feed("Grace [") == "Grace "
+        assert expander.feed("S") == ""
+        assert expander.feed("2, S") == ""
+        out = expander.feed("1] matters")
+        assert out.startswith("[[2]](") and out.endswith(" matters")
+        assert expander.cited == [2, 1]
+
+    def test_streamed_output_equals_whole_output(self):
+        answer = "Grace [S1] and covenant [S2; S3] in [Romans 8] [S"
+        chunks = [answer[i:i + 3] for i in range(0, len(answer), 3)]
+        expander = CitationExpander(HITS)
+        streamed = "".join(expander.feed(chunk) for chunk in chunks) + expander.close()
+        assert streamed == expand_citations(answer, HITS)
+        assert streamed.count("**Sources:**") == 1
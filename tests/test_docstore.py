@@ -0,0 +1,94 @@
+"""
+Tests for the compressed document store and lazy hydration of search hits.
+
+Run with: pytest tests/test_docstore.py -v
+"""
+
+import numpy as np
+import pytest
+
+from src import docstore
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(tmp_path, monkeypatch):
+    """Document store in a temporary file with an empty cache."""
+    monkeypatch.setattr(docstore.SETTINGS, "docstore_path", str(tmp_path / "docs.sqlite3"))
+    monkeypatch.setattr(docstore, "_cache", docstore.LRUCache(2))
+
+
+class TestDocStore:
+    """Tests for storage, compression and the LRU."""
+
+    def test_round_trip_and_identical_content_stored_once(self):
+        text = "Grace and covenant in Reformed theology. " * 50
+        docstore.put_many(["a", "b", "c"], [text, text, "short"], [{"abstract": "long"}, {"abstract": "long"}, {}])
+
+        records = docstore.get_many(["a", "c", "missing"])
+        assert records["a"] == {"text": text, "metadata": {"abstract": "long"}}
+        assert records["c"]["text"] == "short"
+        assert "missing" not in records
+        stats = docstore.stats()
+        assert stats["documents"] == 3
+        assert stats["blobs"] == 2
+        assert stats["compressed_bytes"] < len(text)
+
+    def test_zlib_fallback_reads_alongside_zstd(self, monkeypatch):
+        zstd = docstore._zstd
+        docstore.put_many(["a"], ["first"])
+        monkeypatch.setattr(docstore, "_zstd", lambda: None)
+        docstore.put_many(["b"], ["second"])
+        codecs = dict(docstore.connect().execute("SELECT d.id, b.codec FROM docs d JOIN blobs b USING (hash)"))
+        assert codecs["b"] == "zlib"
+        monkeypatch.setattr(docstore, "_zstd", zstd)
+        records = docstore.get_many(["a", "b"])
+        assert (records["a"]["text"], records["b"]["text"]) == ("first", "second")
+
+    def test_replaced_text_and_deletes_leave_no_orphans(self):
+        docstore.put_many(["a", "b"], ["old", "other"])
+        docstore.put_many(["a"], ["new"])
+        assert docstore.get_many(["a"])["a"]["text"] == "new"
+        assert docstore.purge_unreferenced() == 1
+        docstore.delete_many(["a", "b"])
+        assert docstore.stats() == {"documents": 0, "blobs": 0, "compressed_bytes": 0}
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = docstore.LRUCache(2)
+        cache.put("a", {"text": "a"})
+        cache.put("b", {"text": "b"})
+        cache.get("a")
+        cache.put("c", {"text": "c"})
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and len(cache) == 2
+
+
+class TestHydration:
+    """Tests for Chroma holding only vectors and small fields, with texts fetched per prompt."""
+
+    def _add(self, store):
+        records = [{"id": f"W{i}", "text": f"abstract {i}",
+                    "metadata": {"title": f"Paper {i}", "notes": "x" * 500}} for i in range(3)]
+        embeddings = np.eye(3, 8, dtype=np.float32)
+        store.add_documents(records, embeddings=embeddings)
+        return embeddings
+
+    def test_chroma_keeps_no_text_and_hits_are_hydrated(self, temp_store):
+        embeddings = self._add(temp_store)
+        stored = temp_store.get_collection().get(ids=["W1"], include=["documents", "metadatas"])
+        assert stored["documents"] == [None]
+        assert stored["metadatas"] == [{"title": "Paper 1"}]
+
+        hits = temp_store.query_by_embedding(embeddings[1], top_k=1)
+        assert hits[0]["document"] is None
+        temp_store.hydrate(hits)
+        assert hits[0]["document"] == "abstract 1"
+        assert hits[0]["metadata"] == {"title": "Paper 1", "notes": "x" * 500}
+
+    def test_collections_from_before_the_store_fall_back_to_chroma(self, temp_store, monkeypatch):
+        monkeypatch.setattr(temp_store.SETTINGS, "docstore_enabled", False)
+        embeddings = self._add(temp_store)
+        monkeypatch.setattr(temp_store.SETTINGS, "docstore_enabled", True)
+
+        hits = temp_store.hydrate(temp_store.query_by_embedding(embeddings[2], top_k=2))
+        assert hits[0]["document"] == "abstract 2"
+        assert hits[1]["document"].startswith("abstract")
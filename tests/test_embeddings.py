@@ -0,0 +1,63 @@
+"""
+Tests for the embeddings wrapper.
+
+Run with: pytest tests/test_embeddings.py -v
+"""
+
+import base64
+import json
+
+import httpx
+import numpy as np
+import openai
+import pytest
+
+from src import embeddings, openai_scheduler
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Embeddings client backed by a handler; returns the list of request bodies."""
+    bodies = []
+    vectors = {"a": [1.5, -2.0, 0.25], "b": [3.0, 0.0, -1.0]}
+
+    def handler(request):
+        body = json.loads(request.content)
+        bodies.append(body)
+        data = []
+        # Out of order on purpose: rows must be placed by "index"
+        for i, text in reversed(list(enumerate(body["input"]))):
+            vector = np.asarray(vectors[text], dtype="<f4")
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        return httpx.Response(200, json={"object": "list", "data": data, "model": body["model"],
+                                         "usage": {"prompt_tokens": 2, "total_tokens": 2}})
+
+    client = openai.OpenAI(api_key="test", base_url="http://fake.test/v1", max_retries=0,
+                           http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(embeddings, "_CLIENT", client)
+    monkeypatch.setattr(openai_scheduler, "_scheduler", None)
+    return bodies
+
+
+class TestEmbedTexts:
+    """Tests for base64 decoding of API embeddings."""
+
+    def test_requests_base64_and_decodes_to_float32_rows(self, api):
+        result = embeddings.embed_texts(["a", "b"])
+        assert api[0]["encoding_format"] == "base64"
+        assert result.dtype == np.float32
+        assert result.flags["C_CONTIGUOUS"]
+        np.testing.assert_array_equal(result, np.array([[1.5, -2.0, 0.25], [3.0, 0.0, -1.0]], dtype=np.float32))
+
+    def test_float_list_responses_still_decode(self):
+        class Item:
+            def __init__(self, index, embedding):
+                self.index, self.embedding = index, embedding
+
+        result = embeddings._decode_embeddings([Item(1, [0.5, 1.0]), Item(0, [2.0, 3.0])])
+        assert result.dtype == np.float32
+        assert result.tolist() == [[2.0, 3.0], [0.5, 1.0]]
@@ -0,0 +1,76 @@
+"""
+Tests for extractive answers: sentence splitting, TF-IDF scoring, deduplication
+and citations.
+
+Run with: pytest tests/test_extractive.py -v
+"""
+
+import json
+
+from src import extractive
+
+HITS = [
+    {"id": "W1", "metadata": {"title": "Grace in Paul"}, "document": (
+        "Abstract: This article examines the Pauline doctrine of grace in Romans. "
+        "Paul presents grace as the unmerited favour of God toward sinners. "
+        "The study also surveys the manuscript tradition of the letter.")},
+    {"id": "W2", "metadata": {"title": "Grace in Paul (preprint)"}, "document": (
+        "Paul presents grace as the unmerited favour of God toward sinners. "
+        "Earlier scholarship read Romans mainly as a treatise on justification.")},
+    {"id": "W3", "metadata": {"title": "Augustine on Grace"}, "document": (
+        "St. Augustine developed the doctrine of prevenient grace against Pelagius. "
+        "His anti-Pelagian writings shaped Western theology for a millennium.")},
+    {"id": "W4", "metadata": {"title": "Temple Architecture"}, "document": (
+        "The dimensions of the Second Temple are reconstructed from Josephus and the Mishnah.")},
+]
+
+
+class TestSplitSentences:
+    """Tests for the sentence splitter."""
+
+    def test_keeps_abbreviations_and_initials(self):
+        text = "Abstract. St. Augustine cites Rom. 5 often, cf. J. Smith (2001). Grace is central! Is it?"
+        assert extractive.split_sentences(text) == [
+            "St. Augustine cites Rom. 5 often, cf. J. Smith (2001).", "Grace is central!", "Is it?"]
+
+
+class TestSelectSentences:
+    """Tests for scoring and picking sentences."""
+
+    def test_relevant_sentences_without_duplicates(self):
+        picked = extractive.select_sentences("What does Paul mean by grace?", HITS, max_sentences=4)
+        sentences = [sentence for _, _, sentence in picked]
+        assert sentences.count("Paul presents grace as the unmerited favour of God toward sinners.") == 1
+        assert all(index != 3 for index, _, _ in picked)  # the off-topic hit contributes nothing
+        assert picked == sorted(picked)  # reading order: by source, then position
+
+    def test_unrelated_question_falls_back_to_the_top_opening(self):
+        picked = extractive.select_sentences("zzz qqq", HITS)
+        assert picked == [(0, 0, "This article examines the Pauline doctrine of grace in Romans.")]
+
+
+class TestSummarize:
+    """Tests for the cited answer."""
+
+    def test_cites_sources_and_suggests_an_uncited_one(self):
+        hits = [dict(h) for h in HITS]
+        answer = extractive.summarize("How did Augustine understand grace against Pelagius?", hits, max_sentences=2)
+        assert "prevenient grace" in answer
+        assert "[[3]](" in answer and "**Sources:**" in answer
+        assert "**Have you considered?** [Grace in Paul (preprint)]" in answer
+
+    def test_stream_head_carries_a_preview(self, client, monkeypatch):
+        from src import main
+
+        monkeypatch.setattr(main.settings, "rate_limit_per_minute", 0.0)
+        monkeypatch.setattr(main, "vector_query", lambda question, top_k=5: [dict(h) for h in HITS])
+
+        async def no_pdfs(sources):
+            return sources
+
+        monkeypatch.setattr(main, "enrich_sources_with_pdfs", no_pdfs)
+        monkeypatch.setattr(main.llm, "generate_stream", lambda question, docs: iter(["LLM answer"]))
+
+        response = client.post("/query/stream", json={"question": "Paul grace"})
+        head = json.loads(response.text.splitlines()[0])
+        assert "unmerited favour" in head["preview"]
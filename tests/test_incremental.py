@@ -0,0 +1,127 @@
+"""
+Tests for incremental ingestion: OpenAlex date filters, high-water marks and
+skipping unchanged records.
+
+Run with: pytest tests/test_incremental.py -v
+"""
+
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pytest
+
+from src import incremental, ingest, jobs
+
+
+def work(n, abstract=None):
+    return {"id": f"https://openalex.org/W{n}", "title": f"Paper {n}", "doi": f"https://doi.org/10.1/{n}",
+            "publication_year": 2020, "abstract": abstract or f"abstract {n}"}
+
+
+class FakeOpenAlex:
+    """requests.get stand-in serving pages of works; records every query string."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def __call__(self, url, timeout=None):
+        params = {k: v[0] for k, v in parse_qs(urlparse(url).query).items()}
+        self.calls.append(params)
+        page = self.pages[min(len(self.calls), len(self.pages)) - 1]
+        pages = self.pages
+
+        class Response:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                last = page is pages[-1]
+                return {"meta": {"next_cursor": None if last else f"c{len(pages)}"}, "results": page}
+
+        return Response()
+
+
+@pytest.fixture
+def embedded(temp_store, monkeypatch):
+    """Fake embeddings; returns the list of texts sent to embed_documents."""
+    monkeypatch.setattr(temp_store.SETTINGS, "shard_mode", "none")
+    texts = []
+
+    def fake_embed(batch):
+        texts.extend(batch)
+        return np.asarray([[float(len(t)), 1.0, 0.0] for t in batch], dtype=np.float32)
+
+    monkeypatch.setattr(temp_store, "embed_documents", fake_embed)
+    monkeypatch.setattr(incremental, "_today", lambda: "2026-10-01")
+    return texts
+
+
+class TestSearchSince:
+    """Tests for the OpenAlex delta query."""
+
+    def test_publication_filter_without_a_key_and_cursor_paging(self, monkeypatch):
+        fake = FakeOpenAlex([[work(1), work(2)], [work(3)]])
+        monkeypatch.setattr(ingest.requests, "get", fake)
+        results = ingest.search_openalex_since("Christology", "2026-09-01")
+        assert [r["id"] for r in results] == [f"https://openalex.org/W{i}" for i in (1, 2, 3)]
+        assert fake.calls[0]["filter"] == "from_publication_date:2026-09-01"
+        assert fake.calls[0]["cursor"] == "*" and fake.calls[1]["cursor"] == "c2"
+
+    def test_updated_filter_with_a_premium_key(self, monkeypatch):
+        fake = FakeOpenAlex([[work(1)]])
+        monkeypatch.setattr(ingest.requests, "get", fake)
+        monkeypatch.setattr(ingest.SETTINGS, "openalex_api_key", "premium")
+        ingest.search_openalex_since("Christology", "2026-09-01")
+        assert fake.calls[0]["filter"] == "from_updated_date:2026-09-01"
+        assert fake.calls[0]["api_key"] == "premium"
+
+
+class TestIngestTopic:
+    """Tests for high-water marks and hash-based skipping."""
+
+    def test_only_new_and_changed_works_are_embedded(self, embedded, temp_store, monkeypatch):
+        first = FakeOpenAlex([[work(1), work(2)]])
+        monkeypatch.setattr(ingest.requests, "get", first)
+        result = incremental.ingest_topic("Christology")
+        assert result == {"topic": "Christology", "since": None, "fetched": 2, "changed": 2}
+        assert "filter" not in first.calls[0]
+        assert incremental.get_watermark("Christology") == "2026-10-01"
+
+        embedded.clear()
+        delta = FakeOpenAlex([[work(1), work(2, "revised abstract"), work(3)]])
+        monkeypatch.setattr(ingest.requests, "get", delta)
+        result = incremental.ingest_topic("Christology")
+        assert delta.calls[0]["filter"] == "from_publication_date:2026-10-01"
+        assert result["changed"] == 2
+        assert sorted(embedded) == ["abstract 3", "revised abstract"]
+
+        hits = temp_store.hydrate([{"id": "https___openalex.org_W2", "document": None, "metadata": {}}])
+        assert hits[0]["document"] == "revised abstract"
+        assert temp_store.get_collection().count() == 3
+
+    def test_failed_topic_keeps_its_mark(self, embedded, monkeypatch):
+        incremental.set_watermark("Christology", "2026-09-01")
+
+        def fail(url, timeout=None):
+            raise ConnectionError("OpenAlex down")
+
+        monkeypatch.setattr(ingest.requests, "get", fail)
+        summary = incremental.run(["Christology"], pause=0)
+        assert summary["failed"] == ["Christology"]
+        assert incremental.get_watermark("Christology") == "2026-09-01"
+
+
+class TestSchedule:
+    """Tests for the writer queueing periodic refreshes."""
+
+    def test_queues_once_per_interval(self, monkeypatch):
+        assert jobs.schedule_due_jobs(now=0) is None  # off by default
+        monkeypatch.setattr(jobs.SETTINGS, "incremental_ingest_hours", 24)
+        first = jobs.schedule_due_jobs(now=1000)
+        assert first is not None
+        assert jobs.schedule_due_jobs(now=1000 + 25 * 3600) is None  # still queued
+        jobs.finish(jobs.claim_next()["id"], result={})
+        created = jobs.get_job(first)["created_at"]
+        assert jobs.schedule_due_jobs(now=created + 3600) is None
+        assert jobs.schedule_due_jobs(now=created + 24 * 3600 + 1) is not None
@@ -19,6 +19,9 @@ Tests for the main application module.
 Run with: pytest tests/test_main.py -v
 """
 
+import json
+import time
+
 import pytest
 
 
@@ -38,6 +41,130 @@ class TestHealthCheck:
         """Placeholder test - replace with real tests."""
         assert True
 
+    def test_health_check_returns_healthy(self, client):
+        """Health check should return healthy status."""
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json() == {"status": "healthy"}
+
+    def test_ready_after_warm_up(self, client):
+        """Readiness should pass once the startup warm-up has finished."""
+        for _ in range(50):
+            response = client.get("/ready")
+            if response.status_code == 200:
+                break
+            time.sleep(0.05)
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+
+    def test_ready_reports_warm_up_failure(self, monkeypatch):
+        """A failed warm-up keeps the app out of rotation with the error."""
+        from fastapi.testclient import TestClient
+
+        from src import main
+
+        def broken_warm_up(name, num_queries):
+            raise RuntimeError("index missing")
+
+        monkeypatch.setattr(main, "warm_up", broken_warm_up)
+        with TestClient(main.app) as client:
+            for _ in range(50):
+                response = client.get("/ready")
+                if response.json()["status"] == "error":
+                    break
+                time.sleep(0.05)
+        assert response.status_code == 503
+        assert response.json()["detail"] == "index missing"
+
+    def test_warm_up_is_retried_until_it_succeeds(self, monkeypatch):
+        """A transient warm-up failure clears once a retry succeeds."""
+        from fastapi.testclient import TestClient
+
+        from src import main
+
+        attempts = []
+
+        def flaky_warm_up(name, num_queries):
+            attempts.append(name)
+            if len(attempts) == 1:
+                raise RuntimeError("database is locked")
+            return 7
+
+        monkeypatch.setattr(main, "warm_up", flaky_warm_up)
+        monkeypatch.setattr(main.settings, "warmup_retry_max_seconds", 0.01)
+        with TestClient(main.app) as client:
+            for _ in range(100):
+                response = client.get("/ready")
+                if response.status_code == 200:
+                    break
+                time.sleep(0.05)
+            assert response.json() == {"status": "ready"}
+            assert main.app.state.warmup_error is None
+        assert len(attempts) == 2
+
+
+class TestFrontend:
+    """Tests for the cached, precompressed frontend."""
+
+    def test_etag_revalidation_returns_304(self, client):
+        first = client.get("/", headers={"Accept-Encoding": "identity"})
+        assert first.status_code == 200
+        assert "GRAYSON" in first.text
+        assert first.headers["Cache-Control"] == "no-cache"
+        etag = first.headers["ETag"]
+
+        second = client.get("/", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["ETag"] == etag
+
+    def test_serves_best_accepted_encoding(self, client):
+        import gzip
+
+        from src import main
+
+        main._frontend = None
+        plain = client.get("/", headers={"Accept-Encoding": "identity"}).content
+        # httpx decodes gzip for us; check the header and the decoded body
+        response = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.content == plain
+        assert main._frontend.variants["gzip"] == gzip.compress(plain, compresslevel=9, mtime=0)
+        if "br" in main._frontend.variants:
+            response = client.get("/", headers={"Accept-Encoding": "gzip, br"})
+            assert response.headers["Content-Encoding"] == "br"
+
+    def test_accept_encoding_q_values(self, tmp_path):
+        from src.static_assets import StaticAsset, accepted_encodings
+
+        path = tmp_path / "page.html"
+        path.write_text("<html>" + "x" * 1000 + "</html>")
+        asset = StaticAsset(path, "text/html")
+        assert accepted_encodings("gzip;q=0.5, br;q=0") == {"gzip": 0.5, "br": 0.0}
+        assert asset.choose_encoding("gzip;q=0.5, br;q=0") == "gzip"
+        assert asset.choose_encoding("*;q=0") == "identity"
+        assert asset.choose_encoding("") == "identity"
+
+    def test_large_json_is_gzipped(self, client, monkeypatch):
+        from src import main
+
+        monkeypatch.setattr(main.settings, "rate_limit_per_minute", 0.0)
+        monkeypatch.setattr(main, "vector_query", lambda question, top_k=5: [])
+        monkeypatch.setattr(main.llm, "generate", lambda question, hits: "grace " * 1000)
+        response = client.post("/query", json={"question": "grace"}, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.json()["answer"].startswith("grace")
+
+    def test_stream_is_not_gzipped(self, client, monkeypatch):
+        from src import main
+
+        monkeypatch.setattr(main.settings, "rate_limit_per_minute", 0.0)
+        monkeypatch.setattr(main, "vector_query", lambda question, top_k=5: [])
+        monkeypatch.setattr(main.llm, "generate_stream", lambda question, hits: iter(["grace " * 1000]))
+        response = client.post("/query/stream", json={"question": "grace"}, headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+        assert "grace grace" in response.text
+
 
 class TestResearchQuery:
     """Tests for the research query functionality."""
@@ -64,6 +191,94 @@ class TestResearchQuery:
         assert 1 + 1 == 2
 
 
+class TestBatchQuery:
+    """Tests for POST /query/batch."""
+
+    @pytest.fixture
+    def stubbed(self, client, monkeypatch):
+        from src import main
+
+        calls = {"search": 0, "pdf_sources": []}
+
+        def fake_query_texts(questions, top_k=5):
+            calls["search"] += 1
+            # Every question retrieves the same paper, plus one of its own
+            return [
+                [{"id": "W0", "document": "Shared.", "metadata": {"title": "Shared", "doi": "10.1/shared"}},
+                 {"id": f"W{i + 1}", "document": q, "metadata": {"title": q, "doi": f"10.1/{i}"}}]
+                for i, q in enumerate(questions)
+            ]
+
+        async def fake_enrich(sources):
+            calls["pdf_sources"].append(len(sources))
+            return [dict(s, free_pdf=f"https://example.org/{s['doi']}.pdf") for s in sources]
+
+        def fake_generate(question, hits):
+            time.sleep(0.05 if question == "slow" else 0)
+            return f"answer to {question}"
+
+        monkeypatch.setattr(main, "query_texts", fake_query_texts)
+        monkeypatch.setattr(main, "enrich_sources_with_pdfs", fake_enrich)
+        monkeypatch.setattr(main.llm, "generate", fake_generate)
+        monkeypatch.setattr(main.settings, "rate_limit_per_minute", 0.0)
+        return client, calls
+
+    def test_results_in_order_with_one_search_and_deduped_pdfs(self, stubbed):
+        client, calls = stubbed
+        response = client.post("/query/batch", json={"questions": ["slow", "grace", "faith"]})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["answer"] for r in results] == ["answer to slow", "answer to grace", "answer to faith"]
+        assert [r["index"] for r in results] == [0, 1, 2]
+        assert results[1]["sources"][0]["free_pdf"] == "https://example.org/10.1/shared.pdf"
+        assert calls["search"] == 1
+        assert calls["pdf_sources"] == [4]  # the shared paper is looked up once
+
+    def test_ndjson_stream_as_completed(self, stubbed):
+        client, _ = stubbed
+        response = client.post("/query/batch", json={"questions": ["slow", "grace"], "stream": True})
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["index"] for line in lines] == [1, 0]
+
+        from src import admission
+
+        assert admission.get_controller().active == 0  # the slot is released after streaming
+
+    def test_rejects_empty_and_oversized_batches(self, stubbed, monkeypatch):
+        from src import main
+
+        client, _ = stubbed
+        assert client.post("/query/batch", json={"questions": []}).status_code == 400
+        assert client.post("/query/batch", json={"questions": ["ok", " "]}).status_code == 400
+        monkeypatch.setattr(main.settings, "batch_max_questions", 2)
+        assert client.post("/query/batch", json={"questions": ["a", "b", "c"]}).status_code == 400
+
+
+class TestQueryStream:
+    """Tests for POST /query/stream."""
+
+    def test_streams_sources_then_deltas(self, client, monkeypatch):
+        from src import admission, main
+
+        hits = [{"id": "W1", "document": "Grace.", "metadata": {"title": "Grace", "doi": "10.1/x"}}]
+        monkeypatch.setattr(main.settings, "rate_limit_per_minute", 0.0)
+        monkeypatch.setattr(main, "vector_query", lambda question, top_k=5: hits)
+
+        async def no_pdfs(sources):
+            return sources
+
+        monkeypatch.setattr(main, "enrich_sources_with_pdfs", no_pdfs)
+        monkeypatch.setattr(main.llm, "generate_stream", lambda question, docs: iter(["Grace ", "[[1]](x)"]))
+
+        response = client.post("/query/stream", json={"question": "grace"})
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines[0]["sources"][0]["title"] == "Grace"
+        assert [line["delta"] for line in lines[1:-1]] == ["Grace ", "[[1]](x)"]
+        assert lines[-1] == {"done": True}
+        assert admission.get_controller().active == 0
+
+
 # ---------------------------------------------------------
 # Example: Parametrized tests
 # Run the same test with different inputs
@@ -0,0 +1,93 @@
+"""
+Tests for vector store maintenance: stats, orphan and duplicate cleanup, compaction.
+
+Run with: pytest tests/test_maintenance.py -v
+"""
+
+import numpy as np
+import pytest
+
+from src import docstore, maintenance
+
+
+def _records(count):
+    return [{"id": f"https://openalex.org/W{i}", "text": f"abstract {i}",
+             "metadata": {"title": f"Paper {i}", "doi": f"https://doi.org/10.1/{i}"}}
+            for i in range(count)]
+
+
+@pytest.fixture
+def store(temp_store, monkeypatch):
+    """Temporary store whose HNSW index is saved every 50 writes, loaded with 120 documents."""
+    monkeypatch.setattr(temp_store.SETTINGS, "shard_mode", "none")
+    monkeypatch.setattr(temp_store.SETTINGS, "hnsw_sync_threshold", 50)
+    embeddings = np.random.default_rng(0).standard_normal((120, 8)).astype(np.float32)
+    temp_store.add_documents(_records(120), embeddings=embeddings)
+    return temp_store
+
+
+class TestStats:
+    """Tests for the size and fragmentation report."""
+
+    def test_reports_tombstones_after_deletes(self, store):
+        store.delete_documents("grayson", [f"https___openalex.org_W{i}" for i in range(30)])
+        report = maintenance.stats()
+        (collection,) = report["collections"]
+        assert collection["count"] == 90 and collection["dimensions"] == 8
+        assert collection["aliases"] == []
+        assert collection["hnsw_saved_elements"] >= 100
+        assert collection["tombstones"] == 30
+        assert collection["fragmentation"] == pytest.approx(30 / 120)
+        assert collection["disk_bytes"] > 0 and collection["memory_bytes"] > 0
+        assert report["docstore"]["documents"] == 90
+
+
+class TestClean:
+    """Tests for duplicate and orphan removal (dry run by default)."""
+
+    def test_duplicate_doi_keeps_the_openalex_copy(self, store):
+        duplicate = {"id": "doi:10.1/7", "text": "abstract 7 again, longer",
+                     "metadata": {"title": "Paper 7", "doi": "10.1/7"}}
+        store.add_documents([duplicate], embeddings=np.ones((1, 8), dtype=np.float32))
+
+        assert maintenance.clean()["duplicates"] == 1
+        assert store.get_collection().count() == 121  # dry run changed nothing
+
+        assert maintenance.clean(dry_run=False)["duplicates"] == 1
+        collection = store.get_collection()
+        assert collection.count() == 120
+        assert collection.get(ids=["doi_10.1_7", "https___openalex.org_W7"])["ids"] == ["https___openalex.org_W7"]
+        assert "doi_10.1_7" not in docstore.all_ids()
+
+    def test_orphans_of_dropped_collections_are_removed(self, store):
+        other = store.get_collection("scratch")
+        other.add(ids=[f"s{i}" for i in range(60)], embeddings=np.ones((60, 8), dtype=np.float32))
+        store.drop_collection("scratch")
+        docstore.put_many(["gone"], ["text nobody indexes"])
+
+        found = maintenance.remove_orphans()
+        assert len(found["orphan_segment_dirs"]) == 1
+        assert found["orphan_docstore_ids"] == 1
+
+        maintenance.remove_orphans(dry_run=False)
+        assert maintenance.remove_orphans()["orphan_segment_dirs"] == []
+        assert "gone" not in docstore.all_ids()
+        assert store.get_collection().count() == 120
+
+
+class TestCompact:
+    """Tests for rebuilding into a compact version."""
+
+    def test_compact_rebuilds_without_tombstones(self, store):
+        store.delete_documents("grayson", [f"https___openalex.org_W{i}" for i in range(30)])
+
+        result = maintenance.compact(["grayson"], drop_previous=True, grace_seconds=0, dry_run=False)
+
+        assert result["swapped"] and result["dropped"] == ["grayson"]
+        (collection,) = maintenance.stats()["collections"]
+        assert collection["aliases"] == ["grayson"] and collection["count"] == 90
+        assert collection["tombstones"] == 0
+        hits = store.hydrate(store.query_by_embedding(
+            store.get_collection("grayson").get(ids=["https___openalex.org_W40"], include=["embeddings"])
+            ["embeddings"][0], top_k=1))
+        assert hits[0]["document"] == "abstract 40"
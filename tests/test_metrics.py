@@ -0,0 +1,100 @@
+"""
+Tests for the Prometheus metrics registry and timing spans.
+
+Run with: pytest tests/test_metrics.py -v
+"""
+
+import pytest
+
+from src import metrics
+
+
+class TestRegistry:
+    """Tests for counters, gauges and histograms."""
+
+    def test_counter_renders_labels(self):
+        counter = metrics.Counter("test_widgets_total", "Widgets", ["color"])
+        counter.inc(2, color="red")
+        counter.inc(color="red")
+        assert 'test_widgets_total{color="red"} 3.0' in metrics.render()
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram("test_latency_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="a")
+        histogram.observe(0.5, stage="a")
+        text = "\n".join(histogram.render())
+        assert 'test_latency_seconds_bucket{stage="a",le="0.1"} 1.0' in text
+        assert 'test_latency_seconds_bucket{stage="a",le="1.0"} 2.0' in text
+        assert 'test_latency_seconds_bucket{stage="a",le="+Inf"} 2.0' in text
+        assert histogram.snapshot(stage="a") == (pytest.approx(0.55), 2.0)
+
+    def test_label_values_are_escaped(self):
+        gauge = metrics.Gauge("test_escape", "Escaping", ["path"])
+        gauge.set(1, path='a"b')
+        assert 'test_escape{path="a\\"b"} 1' in "\n".join(gauge.render())
+
+
+class TestSpans:
+    """Tests for stage timing."""
+
+    def test_timed_records_sync_stage(self):
+        _, before = metrics.STAGE_SECONDS.snapshot(stage="test_sync")
+
+        @metrics.timed("test_sync")
+        def work():
+            return 42
+
+        assert work() == 42
+        assert metrics.STAGE_SECONDS.snapshot(stage="test_sync")[1] == before + 1
+
+    async def test_timed_records_async_stage(self):
+        @metrics.timed("test_async")
+        async def work():
+            return "done"
+
+        assert await work() == "done"
+        assert metrics.STAGE_SECONDS.snapshot(stage="test_async")[1] >= 1
+
+
+class TestAggregation:
+    """Tests for combining several workers' metrics through the shared state file."""
+
+    def test_workers_are_combined(self, monkeypatch):
+        counter = metrics.Counter("test_shared_total", "Shared", ["color"])
+        histogram = metrics.Histogram("test_shared_seconds", "Shared", buckets=(1.0,))
+        in_flight = metrics.Gauge("test_shared_in_flight", "Shared")
+        circuit = metrics.Gauge("test_shared_open", "Shared", aggregate="max")
+        counter.inc(2, color="red")
+        histogram.observe(0.5)
+        in_flight.set(3)
+        circuit.set(1)
+        monkeypatch.setattr(metrics.os, "getpid", lambda: 1)
+        metrics.publish()  # "worker 1"
+
+        counter.inc(color="red")
+        histogram.observe(2.0)
+        circuit.set(0)
+        monkeypatch.setattr(metrics.os, "getpid", lambda: 2)
+        text = metrics.render_all()  # "worker 2" answers the scrape
+        assert 'test_shared_total{color="red"} 5.0' in text
+        assert 'test_shared_seconds_bucket{le="1.0"} 2.0' in text
+        assert "test_shared_seconds_count 3.0" in text
+        assert "test_shared_in_flight 6.0" in text
+        assert "test_shared_open 1" in text
+
+    def test_gone_workers_are_dropped(self, monkeypatch):
+        counter = metrics.Counter("test_gone_total", "Gone")
+        counter.inc()
+        monkeypatch.setattr(metrics.os, "getpid", lambda: 1)
+        metrics.publish()
+        monkeypatch.setattr(metrics.time, "time", lambda: 10_000_000_000.0)
+        monkeypatch.setattr(metrics.os, "getpid", lambda: 2)
+        assert "test_gone_total 1.0" in metrics.render_all()
+
+
+def test_metrics_endpoint_serves_prometheus_text(client):
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'grayson_http_request_duration_seconds_count{path="/health",status="200"}' in response.text
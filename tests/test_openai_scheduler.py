@@ -0,0 +1,158 @@
+"""
+Tests for the OpenAI rate-limit scheduler and its use by the embeddings path.
+
+Run with: pytest tests/test_openai_scheduler.py -v
+"""
+
+import json
+import threading
+import time
+
+import httpx
+import numpy as np
+import openai
+import pytest
+
+from src import embeddings, openai_scheduler
+from src.openai_scheduler import BULK, INTERACTIVE, Budget, Scheduler
+
+
+@pytest.fixture(autouse=True)
+def fresh_scheduler(monkeypatch):
+    """Every test starts with no learned budgets and no pause."""
+    monkeypatch.setattr(openai_scheduler, "_scheduler", None)
+
+
+def rate_limit_error(headers=None, code="rate_limit_exceeded"):
+    request = httpx.Request("POST", "http://fake.test/v1/embeddings")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return openai.RateLimitError("slow down", response=response, body={"code": code})
+
+
+class RawResponse:
+    def __init__(self, value, headers=None):
+        self.value = value
+        self.headers = headers or {}
+
+    def parse(self):
+        return self.value
+
+
+class TestBudget:
+    """Tests for budgets learned from x-ratelimit-* headers."""
+
+    def test_parse_duration(self):
+        assert openai_scheduler.parse_duration("6m0s") == 360
+        assert openai_scheduler.parse_duration("1.5s") == 1.5
+        assert openai_scheduler.parse_duration("20ms") == pytest.approx(0.02)
+        assert openai_scheduler.parse_duration("1h2m3s") == 3723
+        assert openai_scheduler.parse_duration("") is None
+
+    def test_waits_for_reset_when_spent(self):
+        budget = Budget()
+        assert budget.wait_time({"requests": 1, "tokens": 10}, 0.0, now=0) == 0  # nothing known yet
+        budget.update({"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "0",
+                       "x-ratelimit-reset-requests": "2s"}, now=0)
+        assert budget.wait_time({"requests": 1, "tokens": 10}, 0.0, now=0.5) == 1.5
+        assert budget.wait_time({"requests": 1, "tokens": 10}, 0.0, now=2.0) == 0  # refilled
+
+    def test_bulk_leaves_a_reserve(self):
+        budget = Budget(tokens_per_minute=1000)
+        budget.reserve({"tokens": 850}, now=0)
+        assert budget.wait_time({"tokens": 100}, 0.1, now=1) > 0  # would dip under the 10% reserve
+        assert budget.wait_time({"tokens": 100}, 0.0, now=1) == 0
+        # Larger than any window: allowed once the window is full rather than never
+        assert budget.wait_time({"tokens": 5000}, 0.1, now=61) == 0
+
+
+class TestScheduler:
+    """Tests for lanes, backoff and retries."""
+
+    def test_interactive_goes_ahead_of_bulk(self):
+        scheduler = Scheduler()
+        scheduler.observe("m", {"x-ratelimit-limit-requests": "1", "x-ratelimit-remaining-requests": "0",
+                                "x-ratelimit-reset-requests": "150ms"})
+        order = []
+
+        def run(lane):
+            scheduler.acquire("m", 1, lane)
+            order.append(lane)
+
+        bulk = threading.Thread(target=run, args=(BULK,))
+        bulk.start()
+        time.sleep(0.03)
+        interactive = threading.Thread(target=run, args=(INTERACTIVE,))
+        interactive.start()
+        interactive.join(timeout=5)
+        # One request per window: the query takes it, ingestion waits for the next
+        assert order == [INTERACTIVE]
+        scheduler.observe("m", {"x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "0s"})
+        bulk.join(timeout=5)
+        assert order == [INTERACTIVE, BULK]
+
+    def test_429_pauses_and_retries_with_retry_after(self):
+        scheduler = Scheduler()
+        attempts = []
+
+        def request():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise rate_limit_error({"retry-after-ms": "100"})
+            return RawResponse("ok")
+
+        assert scheduler.call("m", 1, request) == "ok"
+        assert attempts[1] - attempts[0] >= 0.09
+        # Other callers are held back by the same pause
+        scheduler.backoff({"retry-after-ms": "100"})
+        assert scheduler.acquire("m", 1, BULK) >= 0.09
+
+    def test_exhausted_quota_is_not_retried(self, monkeypatch):
+        scheduler = Scheduler()
+        calls = []
+
+        def request():
+            calls.append(1)
+            raise rate_limit_error(code="insufficient_quota")
+
+        with pytest.raises(openai.RateLimitError):
+            scheduler.call("m", 1, request)
+        assert len(calls) == 1
+
+
+class TestEmbedDocuments:
+    """Tests for batched, concurrent ingestion embeddings through the scheduler."""
+
+    def test_batches_in_order_and_survives_a_429(self, monkeypatch):
+        lock = threading.Lock()
+        state = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+
+        def handler(request):
+            body = json.loads(request.content)
+            with lock:
+                state["requests"] += 1
+                if state["requests"] == 1:
+                    return httpx.Response(429, headers={"retry-after-ms": "10"},
+                                          json={"error": {"message": "slow down", "code": "rate_limit_exceeded"}})
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            time.sleep(0.05)
+            with lock:
+                state["in_flight"] -= 1
+            data = [{"object": "embedding", "index": i, "embedding": [float(text.split()[1]), 0.0]}
+                    for i, text in enumerate(body["input"])]
+            return httpx.Response(200, headers={"x-ratelimit-remaining-requests": "1000"}, json={
+                "object": "list", "data": data, "model": body["model"],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            })
+
+        client = openai.OpenAI(api_key="test", base_url="http://fake.test/v1", max_retries=0,
+                               http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(embeddings, "_CLIENT", client)
+        monkeypatch.setattr(embeddings.SETTINGS, "embedding_batch_size", 2)
+        monkeypatch.setattr(embeddings.SETTINGS, "embedding_concurrency", 3)
+
+        vectors = embeddings.embed_documents([f"doc {i}" for i in range(10)])
+        assert vectors.dtype == np.float32
+        assert vectors[:, 0].tolist() == list(range(10))
+        assert state["requests"] == 6  # five batches plus the rate-limited attempt
+        assert state["max_in_flight"] > 1
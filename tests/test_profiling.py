@@ -0,0 +1,65 @@
+"""
+Tests for the on-demand request profiler.
+
+Run with: pytest tests/test_profiling.py -v
+"""
+
+import json
+import time
+
+from src import profiling
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    """Tests for sampling and output formats."""
+
+    def test_records_busy_function(self):
+        profiler = profiling.SamplingProfiler(interval=0.002)
+        profiler.start()
+        _busy(0.1)
+        profiler.stop()
+
+        assert profiler.sample_count > 0
+        hot = [name for name, _, _ in profiler.top_functions(5)]
+        assert any("_busy" in name for name in hot)
+
+    def test_speedscope_and_collapsed_formats(self):
+        profiler = profiling.SamplingProfiler(interval=0.002)
+        profiler.start()
+        _busy(0.05)
+        profiler.stop()
+
+        doc = profiler.speedscope("test")
+        assert doc["shared"]["frames"]
+        for profile in doc["profiles"]:
+            assert len(profile["samples"]) == len(profile["weights"])
+        assert "_busy" in profiler.collapsed()
+
+
+class TestProfilingMiddleware:
+    """Tests for the header trigger and request IDs."""
+
+    def test_off_by_default(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiling.SETTINGS, "profile_dir", str(tmp_path))
+        response = client.get("/health", headers={profiling.PROFILE_HEADER: "anything"})
+        assert response.headers["X-Request-ID"]
+        assert profiling.PROFILE_HEADER not in response.headers
+        assert not list(tmp_path.iterdir())
+
+    def test_header_with_token_writes_profile(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiling.SETTINGS, "profile_dir", str(tmp_path))
+        monkeypatch.setattr(profiling.SETTINGS, "profile_token", "s3cret")
+        response = client.get("/health", headers={profiling.PROFILE_HEADER: "s3cret", "X-Request-ID": "abc123"})
+        assert response.headers[profiling.PROFILE_HEADER] == "abc123"
+        assert json.loads((tmp_path / "abc123.speedscope.json").read_text())["exporter"] == "grayson"
+        assert (tmp_path / "abc123.collapsed.txt").exists()
+
+    def test_unsafe_request_id_is_replaced(self, client):
+        response = client.get("/health", headers={"X-Request-ID": "../../etc/passwd"})
+        assert response.headers["X-Request-ID"] != "../../etc/passwd"
@@ -0,0 +1,69 @@
+"""
+Tests for the quantized first-stage index.
+
+Run with: pytest tests/test_quantization.py -v
+"""
+
+import numpy as np
+import pytest
+
+from src.quantization import QuantizedIndex, distances, rescore
+from src.retrieval_metrics import exact_top_k, recall_at_k
+
+
+@pytest.fixture
+def corpus():
+    """Unit-normalized vectors clustered around topics, like OpenAI embeddings."""
+    rng = np.random.default_rng(42)
+    centers = rng.standard_normal((20, 256))
+    noise = rng.standard_normal((500, 256)) * 0.5
+    vectors = (centers[np.arange(500) % 20] + noise).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"doc{i}" for i in range(len(vectors))]
+    return ids, vectors
+
+
+class TestQuantizedIndex:
+    """Tests for int8 and binary codes."""
+
+    def test_int8_codes_are_four_times_smaller(self, corpus):
+        ids, vectors = corpus
+        index = QuantizedIndex(ids, vectors, mode="int8")
+        assert index.codes.dtype == np.int8
+        assert index.codes.nbytes * 4 == vectors.nbytes
+
+    def test_binary_codes_are_thirty_two_times_smaller(self, corpus):
+        ids, vectors = corpus
+        index = QuantizedIndex(ids, vectors, mode="binary")
+        assert index.nbytes * 32 == vectors.nbytes
+
+    @pytest.mark.parametrize("mode,multiplier", [("int8", 2), ("binary", 8)])
+    def test_rescored_search_recovers_exact_neighbours(self, corpus, mode, multiplier):
+        ids, vectors = corpus
+        index = QuantizedIndex(ids, vectors, mode=mode)
+        by_id = {doc_id: i for i, doc_id in enumerate(ids)}
+        recalls = []
+        for query in vectors[:50]:
+            candidates, _ = index.search(query, 5 * multiplier)
+            ranked = rescore(query, candidates, vectors[[by_id[c] for c in candidates]], 5)
+            expected = exact_top_k(query, ids, vectors, 5)
+            recalls.append(recall_at_k(expected, [doc_id for doc_id, _ in ranked], 5))
+        assert np.mean(recalls) >= 0.9
+
+    def test_unknown_mode_raises(self, corpus):
+        ids, vectors = corpus
+        with pytest.raises(ValueError):
+            QuantizedIndex(ids, vectors, mode="int4")
+
+
+class TestDistances:
+    """Tests for exact distances in Chroma's spaces."""
+
+    def test_l2_is_squared(self):
+        query = np.array([0.0, 0.0], dtype=np.float32)
+        vectors = np.array([[3.0, 4.0]], dtype=np.float32)
+        assert distances(query, vectors, "l2")[0] == pytest.approx(25.0)
+
+    def test_cosine_of_identical_vectors_is_zero(self):
+        vector = np.array([1.0, 2.0], dtype=np.float32)
+        assert distances(vector, vector[None, :], "cosine")[0] == pytest.approx(0.0, abs=1e-6)
@@ -0,0 +1,135 @@
+"""
+Tests for blue/green reindexing behind collection aliases.
+
+Run with: pytest tests/test_reindex.py -v
+"""
+
+import numpy as np
+import pytest
+
+from src import reindex
+
+
+def _load(store, count=40, dim=8):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((count, dim)).astype(np.float32)
+    records = [{"id": f"W{i}", "text": f"abstract {i}", "metadata": {"title": f"Paper {i}"}}
+               for i in range(count)]
+    store.add_documents(records, embeddings=embeddings)
+    return embeddings
+
+
+@pytest.fixture
+def store(temp_store, monkeypatch):
+    """Temporary store with a small corpus and no pauses between batches."""
+    monkeypatch.setattr(temp_store.SETTINGS, "shard_mode", "none")
+    return temp_store
+
+
+class TestReindex:
+    """Tests for build, validation, swap, rollback and prune."""
+
+    def test_build_validate_and_swap(self, store, monkeypatch):
+        embeddings = _load(store)
+        monkeypatch.setattr(store.SETTINGS, "hnsw_m", 32)
+
+        result = reindex.reindex(["grayson"], batch_size=15, pause=0)
+
+        assert result["swapped"]
+        target = result["builds"]["grayson"]["target"]
+        report = result["validation"]["grayson"]
+        assert report["target_count"] == 40 and report["self_recall"] == 1.0 and report["overlap"] == 1.0
+        assert store.resolve_alias("grayson") == target
+        collection = store.get_collection("grayson")
+        assert collection.name == target and collection.metadata["hnsw:M"] == 32
+        hits = store.hydrate(store.query_by_embedding(embeddings[5], top_k=1))
+        assert hits[0]["id"] == "W5" and hits[0]["document"] == "abstract 5"
+
+    def test_failed_validation_leaves_the_alias_alone(self, store):
+        _load(store)
+        result = reindex.reindex(["grayson"], pause=0, min_self_recall=1.1)
+        assert not result["swapped"]
+        assert store.resolve_alias("grayson") == "grayson"
+        assert result["builds"]["grayson"]["target"] in reindex.versions("grayson")
+
+    def test_rollback_and_prune_keep_current_and_previous(self, store):
+        _load(store)
+        first = reindex.reindex(["grayson"], pause=0)["builds"]["grayson"]["target"]
+        second = reindex.reindex(["grayson"], pause=0)["builds"]["grayson"]["target"]
+        assert store.list_aliases()["grayson"] == {"target": second, "previous": first}
+
+        assert reindex.prune(["grayson"], dry_run=True) == ["grayson"]
+        assert reindex.prune(["grayson"]) == ["grayson"]
+        assert reindex.versions("grayson") == [first, second]
+
+        assert reindex.rollback(["grayson"]) == {"grayson": first}
+        assert store.get_collection("grayson").name == first
+
+    def test_reembeds_when_the_model_changed(self, store, monkeypatch):
+        _load(store)
+        monkeypatch.setattr(reindex.SETTINGS, "embedding_model", "text-embedding-new")
+        assert reindex.needs_reembed(store.get_collection("grayson")) is False  # unrecorded model, same size
+        texts = []
+
+        def fake_embed(batch):
+            texts.extend(batch)
+            return np.asarray([[float(t.split()[1]), 1.0, 0.0, 0.0] for t in batch], dtype=np.float32)
+
+        monkeypatch.setattr(reindex, "embed_documents", fake_embed)
+        built = reindex.build("grayson", reembed=True, batch_size=25, pause=0)
+
+        assert built["reembedded"] and built["copied"] == 40
+        assert sorted(texts) == sorted(f"abstract {i}" for i in range(40))
+        new = store.get_client().get_collection(built["target"])
+        assert new.metadata["embedding_model"] == "text-embedding-new"
+        assert reindex.needs_reembed(new) is False
+        monkeypatch.setattr(reindex.SETTINGS, "embedding_model", "text-embedding-old")
+        assert reindex.needs_reembed(new) is True
+
+
+class TestReaderSwitch:
+    """Tests for readers following an alias swap made by another process."""
+
+    def test_reader_switches_after_warming(self, store, monkeypatch):
+        _load(store)
+        old = store.get_collection("grayson")
+        target = reindex.build("grayson", pause=0)["target"]
+        store.set_aliases({"grayson": target})
+        # Another process swapped: this reader still holds the old handle
+        store._collections["grayson"] = old
+        store._seen_aliases = 0
+
+        switch, started = store.switch_collection, []
+        monkeypatch.setattr(store, "switch_collection", lambda name, new: started.append((name, new)))
+        store._check_aliases()
+        assert started == [("grayson", target)]
+
+        monkeypatch.setattr(store, "switch_collection", switch)
+        assert store.switch_collection("grayson", target)
+        assert store.get_collection("grayson").name == target
+        assert not store.switch_collection("grayson", "grayson-v19700101000000")
+        assert store.get_collection("grayson").name == target
+
+    def test_reader_refuses_a_collection_built_with_another_model(self, store, monkeypatch):
+        _load(store)
+        old = store.get_collection("grayson")
+        monkeypatch.setattr(store.SETTINGS, "embedding_model", "text-embedding-new")
+        target = reindex.build("grayson", reembed=False, pause=0)["target"]
+        store.set_aliases({"grayson": target})
+
+        # This reader was started with the old model: it keeps serving the old collection
+        monkeypatch.setattr(store.SETTINGS, "embedding_model", "text-embedding-old")
+        store._collections["grayson"] = old
+        assert not store.switch_collection("grayson", target)
+        assert store.get_collection("grayson").name == old.name
+
+        # ...and after a reopen it refuses to search the new one rather than embed with the wrong model
+        store._collections.clear()
+        monkeypatch.setattr(store.SETTINGS, "read_only", True)
+        with pytest.raises(RuntimeError, match="restart"):
+            store.get_collection("grayson")
+        assert store.query_by_embedding(np.zeros(8, dtype=np.float32), top_k=3) == []
+
+        monkeypatch.setattr(store.SETTINGS, "embedding_model", "text-embedding-new")
+        assert store.switch_collection("grayson", target)
+        assert store.get_collection("grayson").name == target
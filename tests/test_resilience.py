@@ -0,0 +1,170 @@
+"""
+Tests for circuit breakers, hedged requests and their use in PDF lookups.
+
+Run with: pytest tests/test_resilience.py -v
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from src import pdf_lookup, resilience, shared_state
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    """Every test starts with closed circuits."""
+    monkeypatch.setattr(resilience, "_breakers", {})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+    """Tests for breaker state transitions."""
+
+    async def test_opens_after_consecutive_failures_and_probes_after_reset(self):
+        clock = FakeClock()
+        breaker = resilience.CircuitBreaker("test", failure_threshold=2, slow_call_seconds=10,
+                                            reset_seconds=30, clock=clock)
+
+        async def fail():
+            raise httpx.ConnectError("down")
+
+        async def succeed():
+            return "ok"
+
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await breaker.call(fail)
+        assert breaker.state == resilience.OPEN
+        with pytest.raises(resilience.CircuitOpenError):
+            await breaker.call(succeed)
+
+        clock.now = 31
+        assert breaker.state == resilience.HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()  # only one probe at a time
+        breaker.record(0.01, ok=True)
+        assert breaker.state == resilience.CLOSED
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = resilience.CircuitBreaker("test", failure_threshold=2, slow_call_seconds=1.0,
+                                            reset_seconds=30)
+        breaker.record(0.1, ok=True)
+        breaker.record(5.0, ok=True)
+        assert breaker.state == resilience.CLOSED
+        breaker.record(5.0, ok=True)
+        assert breaker.state == resilience.OPEN
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = resilience.CircuitBreaker("test", failure_threshold=1, slow_call_seconds=10,
+                                            reset_seconds=30, clock=clock)
+        breaker.record(None, ok=False)
+        clock.now = 31
+        assert breaker.allow()
+        breaker.record(None, ok=False)
+        assert breaker.state == resilience.OPEN
+
+    def test_latency_percentile_needs_samples(self):
+        tracker = resilience.LatencyTracker(window=100, min_samples=10)
+        assert tracker.percentile(90) is None
+        for ms in range(1, 101):
+            tracker.record(ms / 1000)
+        assert tracker.percentile(90) == pytest.approx(0.0901, abs=1e-3)
+
+
+class TestHedged:
+    """Tests for hedged primary/fallback calls."""
+
+    async def test_slow_primary_is_hedged(self):
+        async def primary():
+            await asyncio.sleep(5)
+            return "primary"
+
+        async def fallback():
+            return "fallback"
+
+        start = asyncio.get_running_loop().time()
+        assert await resilience.hedged(primary, fallback, delay=0.01) == "fallback"
+        assert asyncio.get_running_loop().time() - start < 1
+
+    async def test_fast_primary_wins_and_empty_primary_falls_back(self):
+        async def found():
+            return "primary"
+
+        async def empty():
+            return None
+
+        async def fallback():
+            return "fallback"
+
+        assert await resilience.hedged(found, fallback, delay=1) == "primary"
+        assert await resilience.hedged(empty, fallback, delay=1) == "fallback"
+
+    async def test_error_without_result_is_raised(self):
+        async def broken():
+            raise httpx.ConnectError("down")
+
+        async def empty():
+            return None
+
+        with pytest.raises(httpx.ConnectError):
+            await resilience.hedged(broken, empty, delay=1)
+
+
+class TestPdfLookup:
+    """Tests for breakers and hedging in the PDF lookup path."""
+
+    @pytest.fixture
+    def upstreams(self, monkeypatch):
+        """Unpaywall returns 503; Semantic Scholar has a PDF. Records calls per host."""
+        calls = {"unpaywall": 0, "semantic_scholar": 0}
+
+        def handler(request):
+            if request.url.host == "unpaywall.test":
+                calls["unpaywall"] += 1
+                return httpx.Response(503)
+            calls["semantic_scholar"] += 1
+            return httpx.Response(200, json={"openAccessPdf": {"url": "https://example.org/a.pdf"}})
+
+        monkeypatch.setattr(pdf_lookup.SETTINGS, "unpaywall_base_url", "http://unpaywall.test")
+        monkeypatch.setattr(pdf_lookup.SETTINGS, "semantic_scholar_base_url", "http://s2.test")
+        monkeypatch.setattr(resilience.SETTINGS, "breaker_failure_threshold", 2)
+        monkeypatch.setattr(pdf_lookup, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        return calls
+
+    async def test_open_circuit_skips_failing_upstream(self, upstreams):
+        for i in range(4):
+            assert await pdf_lookup.lookup_pdf_by_doi(f"10.1/{i}") == "https://example.org/a.pdf"
+        assert upstreams["unpaywall"] == 2
+        assert upstreams["semantic_scholar"] == 4
+        assert resilience.get_breaker("unpaywall").state == resilience.OPEN
+
+    async def test_outage_is_not_cached_as_a_miss(self, upstreams, monkeypatch):
+        async def down(doi):
+            raise resilience.CircuitOpenError("semantic_scholar circuit is open")
+
+        monkeypatch.setattr(pdf_lookup, "_try_semantic_scholar", down)
+        assert await pdf_lookup.lookup_pdf_by_doi("10.1/x") is None
+        assert shared_state.cache_get("pdf:doi:10.1/x") is None
+
+    async def test_sources_are_enriched_concurrently(self, monkeypatch):
+        async def slow_lookup(doi):
+            await asyncio.sleep(0.2)
+            return f"https://example.org/{doi}.pdf"
+
+        monkeypatch.setattr(pdf_lookup, "lookup_pdf_by_doi", slow_lookup)
+        sources = [{"doi": f"10.1/{i}"} for i in range(5)] + [None]
+        start = asyncio.get_running_loop().time()
+        enriched = await pdf_lookup.enrich_sources_with_pdfs(sources)
+        assert asyncio.get_running_loop().time() - start < 0.6
+        assert [s["free_pdf"] for s in enriched[:5]] == [f"https://example.org/10.1/{i}.pdf" for i in range(5)]
+        assert enriched[5] is None
@@ -0,0 +1,37 @@
+"""
+Tests for the ranking metrics used by the retrieval evaluation.
+
+Run with: pytest tests/test_retrieval_metrics.py -v
+"""
+
+import pytest
+
+from src.ingest import normalize_doi
+from src.retrieval_metrics import ndcg_at_k, reciprocal_rank
+
+
+class TestRankingMetrics:
+    """Tests for MRR and nDCG against labelled relevant papers."""
+
+    def test_reciprocal_rank_uses_first_relevant_hit(self):
+        assert reciprocal_rank(["b", "c"], ["a", "b", "c"], k=3) == 0.5
+        assert reciprocal_rank(["z"], ["a", "b", "c"], k=3) == 0.0
+        assert reciprocal_rank(["c"], ["a", "b", "c"], k=2) == 0.0
+
+    def test_ndcg_is_one_for_ideal_ordering(self):
+        assert ndcg_at_k(["a", "b"], ["a", "b", "x"], k=3) == pytest.approx(1.0)
+        assert ndcg_at_k(["a", "b"], ["x", "a", "b"], k=3) < 1.0
+
+    def test_ndcg_respects_graded_relevance(self):
+        graded = {"a": 3, "b": 1}
+        assert ndcg_at_k(graded, ["a", "b"], k=2) == pytest.approx(1.0)
+        assert ndcg_at_k(graded, ["b", "a"], k=2) < ndcg_at_k(graded, ["a", "b"], k=2)
+
+    def test_duplicate_hits_are_not_double_counted(self):
+        assert ndcg_at_k(["a"], ["a", "a"], k=2) == pytest.approx(1.0)
+
+
+def test_normalize_doi_strips_prefixes_and_case():
+    assert normalize_doi("https://doi.org/10.1515/ABC") == "10.1515/abc"
+    assert normalize_doi("doi:10.1515/abc") == "10.1515/abc"
+    assert normalize_doi("https://openalex.org/W123") == "w123"
@@ -0,0 +1,94 @@
+"""
+Tests for complexity-based routing: the question classifier, per-tier settings
+and their use by the LLM client.
+
+Run with: pytest tests/test_router.py -v
+"""
+
+import json
+
+import httpx
+import openai
+import pytest
+
+from src import llm, metrics, openai_scheduler, router, usage_tracker
+
+
+class TestClassify:
+    """Tests for the local heuristics."""
+
+    @pytest.mark.parametrize("question", ["Who wrote the Didache?", "When was the Council of Nicaea?",
+                                          "kenosis", "What does agape mean?"])
+    def test_lookups_are_simple(self, question):
+        assert router.classify(question) == router.SIMPLE
+
+    @pytest.mark.parametrize("question", ["What is the significance of the Exodus for Christian ethics?",
+                                          "Explain the doctrine of the Trinity in the early church fathers",
+                                          "How does Paul describe grace in Romans 5:1?"])
+    def test_explanations_are_standard(self, question):
+        assert router.classify(question) == router.STANDARD
+
+    @pytest.mark.parametrize("question", ["Compare Barth and Rahner and assess their influence on Vatican II",
+                                          "How does kenosis relate to Philippians 2:7 and John 1:14?",
+                                          "What is justification? How did Luther and Trent differ?"])
+    def test_analysis_across_sources_is_complex(self, question):
+        assert router.classify(question) == router.COMPLEX
+
+
+class TestRoute:
+    """Tests for per-tier settings."""
+
+    def test_tier_settings_and_client_top_k(self, monkeypatch):
+        monkeypatch.setattr(router.SETTINGS, "router_complex_model", "gpt-4o")
+        simple = router.route("Who wrote the Didache?")
+        assert (simple["model"], simple["max_tokens"], simple["top_k"]) == ("gpt-3.5-turbo", 200, 3)
+        complex_ = router.route("Compare Barth and Rahner and assess their influence", top_k=4)
+        assert (complex_["model"], complex_["max_tokens"], complex_["top_k"]) == ("gpt-4o", 1024, 4)
+
+    def test_disabled_router_keeps_the_old_budget(self, monkeypatch):
+        monkeypatch.setattr(router.SETTINGS, "router_enabled", False)
+        assert router.route("Who wrote the Didache?") == {
+            "tier": router.STANDARD, "model": "gpt-3.5-turbo", "max_tokens": 512, "top_k": 5}
+
+
+class TestGenerate:
+    """Tests for the LLM client using the routed model and budget."""
+
+    def test_uses_tier_model_and_charges_the_tier(self, monkeypatch):
+        requests = []
+
+        def handler(request):
+            body = json.loads(request.content)
+            requests.append(body)
+            return httpx.Response(200, json={
+                "id": "c1", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "Probably Syrian [S1]."}}],
+                "usage": {"prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100},
+            })
+
+        client = llm.LLMClient()
+        client._client = openai.OpenAI(api_key="test", base_url="http://fake.test/v1", max_retries=0,
+                                       http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(llm.SETTINGS, "openai_api_key", "test")
+        monkeypatch.setattr(router.SETTINGS, "router_simple_model", "gpt-4o-mini")
+        monkeypatch.setattr(openai_scheduler, "_scheduler", None)
+        docs = [{"id": "W1", "document": "The Didache is anonymous.", "metadata": {"title": "Didache"}}]
+        cost_before = metrics.TIER_COST.value(tier="simple")
+
+        answer = client.generate("Who wrote the Didache?", docs)
+
+        assert answer.startswith("Probably Syrian")
+        assert requests[0]["model"] == "gpt-4o-mini" and requests[0]["max_tokens"] == 200
+        assert "two to four sentences" in requests[0]["messages"][0]["content"]
+        expected = 1000 * usage_tracker.PRICING["gpt-4o-mini-input"] + 100 * usage_tracker.PRICING["gpt-4o-mini-output"]
+        assert metrics.TIER_COST.value(tier="simple") - cost_before == pytest.approx(expected)
+        assert usage_tracker.get_usage_stats()["breakdown"]["gpt-4o-mini-output"] == pytest.approx(
+            100 * usage_tracker.PRICING["gpt-4o-mini-output"])
+
+    def test_unpriced_model_is_charged_the_highest_known_price(self, monkeypatch):
+        monkeypatch.setattr(router.SETTINGS, "router_complex_model", "gpt-5-preview")
+        assert usage_tracker.unpriced_models(router.models()) == ["gpt-5-preview"]
+        cost = usage_tracker.record_usage("gpt-5-preview-output", 1000)
+        highest = max(p for model, p in usage_tracker.PRICING.items() if model.endswith("-output"))
+        assert cost == pytest.approx(1000 * highest) and cost > 0
@@ -0,0 +1,102 @@
+"""
+Tests for topic/hash sharding: document placement, query routing, fan-out
+search and rebuilding a single shard.
+
+Run with: pytest tests/test_sharding.py -v
+"""
+
+import numpy as np
+import pytest
+
+import ingest_theology
+from src import sharding
+
+
+def _records(count, prefix="W"):
+    return [{"id": f"{prefix}{i}", "text": f"abstract {prefix}{i}", "metadata": {"title": f"Paper {i}"}}
+            for i in range(count)]
+
+
+@pytest.fixture
+def topic_store(temp_store, monkeypatch):
+    """Temporary store in topic mode: 10 Christology documents and 10 added without a known topic."""
+    monkeypatch.setattr(temp_store.SETTINGS, "shard_mode", "topic")
+    rng = np.random.default_rng(0)
+    christology = rng.standard_normal((10, 8)).astype(np.float32) + 5.0
+    general = rng.standard_normal((10, 8)).astype(np.float32) - 5.0
+    temp_store.add_documents(_records(10, "C"), topic="Christology", embeddings=christology)
+    temp_store.add_documents(_records(10, "G"), topic="a POST /ingest query", embeddings=general)
+    return temp_store, christology, general
+
+
+class TestPlacement:
+    """Tests for which collection a document goes to."""
+
+    def test_topic_mode(self, monkeypatch):
+        monkeypatch.setattr(sharding.SETTINGS, "shard_mode", "topic")
+        assert sharding.shard_for("W1", "  christology ") == "grayson-christology"
+        assert sharding.shard_for("W1", "something else") == sharding.GENERAL_SHARD
+        assert sharding.shard_for("W1", None) == sharding.GENERAL_SHARD
+        assert sharding.GENERAL_SHARD in sharding.all_shards()
+
+    def test_hash_mode_is_stable_and_in_range(self, monkeypatch):
+        monkeypatch.setattr(sharding.SETTINGS, "shard_mode", "hash")
+        monkeypatch.setattr(sharding.SETTINGS, "shard_count", 4)
+        placed = [sharding.shard_for(f"W{i}", "Christology") for i in range(200)]
+        assert placed == [sharding.shard_for(f"W{i}") for i in range(200)]  # the topic doesn't matter
+        assert set(placed) == set(sharding.all_shards()) == {f"grayson-h{i:02d}" for i in range(4)}
+
+    def test_none_mode(self, monkeypatch):
+        monkeypatch.setattr(sharding.SETTINGS, "shard_mode", "none")
+        assert sharding.shard_for("W1", "Christology") == "grayson"
+        assert sharding.all_shards() == ["grayson"]
+
+
+class TestRouting:
+    """Tests for the centroid router and fan-out search."""
+
+    def test_rank_shards_by_cosine_similarity(self):
+        centroids = {"a": np.array([1.0, 0.0]), "b": np.array([0.0, 1.0]), "c": np.array([0.7, 0.7])}
+        assert sharding.rank_shards(np.array([0.9, 0.1]), centroids, 2) == ["a", "c"]
+        assert sharding.rank_shards(np.array([1.0, 0.0]), {}, 2) == []
+
+    def test_fan_out_merges_shards_into_one_top_k(self, topic_store):
+        store, christology, general = topic_store
+        hits = store.query_by_embedding(christology[3], top_k=12)
+        assert len(hits) == 12 and hits[0]["id"] == "C3"
+        assert {h["id"][0] for h in hits} == {"C", "G"}  # both shards contributed
+        distances = [h["distance"] for h in hits]
+        assert distances == sorted(distances)
+
+    def test_router_searches_only_the_closest_shard(self, topic_store, monkeypatch):
+        store, christology, general = topic_store
+        monkeypatch.setattr(store.SETTINGS, "shard_router", True)
+        monkeypatch.setattr(store.SETTINGS, "shard_router_top_n", 1)
+        hits = store.query_by_embedding(general[2], top_k=12)
+        assert hits[0]["id"] == "G2"
+        assert {h["id"][0] for h in hits} == {"G"}
+
+
+class TestRebuildShard:
+    """Tests for `ingest_theology.py --shard`."""
+
+    def test_rebuild_keeps_documents_that_came_through_post_ingest(self, topic_store, monkeypatch):
+        store, christology, general = topic_store
+
+        def no_fetch(*args, **kwargs):
+            raise AssertionError("a shard rebuild must not re-fetch from OpenAlex")
+
+        monkeypatch.setattr(ingest_theology, "ingest_topic", no_fetch)
+        ingest_theology.rebuild_shard(sharding.GENERAL_SHARD)
+
+        collection = store.get_collection(sharding.GENERAL_SHARD)
+        assert collection.name.startswith(f"{sharding.GENERAL_SHARD}-v")
+        assert collection.count() == 10
+        hits = store.hydrate(store.query_by_embedding(general[4], top_k=1))
+        assert hits[0]["id"] == "G4" and hits[0]["document"] == "abstract G4"
+
+    def test_shard_with_nothing_stored_is_refused(self, topic_store):
+        with pytest.raises(SystemExit):
+            ingest_theology.rebuild_shard("grayson-christology-missing")
+        with pytest.raises(SystemExit):
+            ingest_theology.rebuild_shard("grayson-ecclesiology")
@@ -0,0 +1,164 @@
+"""
+Tests for state shared between worker processes: usage budget, caches,
+the ingestion job queue and read-only serving.
+
+Run with: pytest tests/test_shared_state.py -v
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src import jobs, shared_state, usage_tracker
+
+ROOT = Path(__file__).parent.parent
+
+
+class TestUsageBudget:
+    """Tests for the SQLite-backed usage tracker."""
+
+    def test_concurrent_processes_do_not_lose_increments(self, shared_state_db):
+        script = (
+            "from src.usage_tracker import record_usage\n"
+            "for _ in range(50):\n"
+            "    record_usage('gpt-3.5-turbo-output', 1000)\n"
+        )
+        env = dict(os.environ, STATE_DB=str(shared_state_db))
+        procs = [subprocess.Popen([sys.executable, "-c", script], cwd=ROOT, env=env) for _ in range(4)]
+        assert all(p.wait(timeout=60) == 0 for p in procs)
+
+        stats = usage_tracker.get_usage_stats()
+        expected = 4 * 50 * 1000 * usage_tracker.PRICING["gpt-3.5-turbo-output"]
+        assert stats["breakdown"]["gpt-3.5-turbo-output"] == pytest.approx(expected)
+
+    def test_limit_blocks_once_spent(self, monkeypatch):
+        monkeypatch.setattr(usage_tracker, "MONTHLY_LIMIT", 0.001)
+        assert usage_tracker.check_usage_limit()[0]
+        usage_tracker.record_usage("gpt-3.5-turbo-output", 10_000)
+        allowed, remaining, message = usage_tracker.check_usage_limit()
+        assert not allowed and remaining == 0.0 and "limit" in message
+
+
+class TestCache:
+    """Tests for the shared TTL cache."""
+
+    def test_round_trip_and_expiry(self):
+        shared_state.cache_set("a", b"1")
+        shared_state.cache_set("b", b"2", ttl=-1)
+        assert shared_state.cache_get("a") == b"1"
+        assert shared_state.cache_get("b") is None
+        assert shared_state.cache_purge_expired() == 1
+
+    def test_query_embedding_is_cached(self, monkeypatch):
+        from src import embeddings
+
+        calls = []
+
+        def fake_embed(texts):
+            calls.append(texts)
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+        monkeypatch.setattr(embeddings, "embed_texts", fake_embed)
+        first = embeddings.embed_query("What is grace?")
+        second = embeddings.embed_query("What is grace?")
+        assert len(calls) == 1
+        assert np.array_equal(first, second) and second.dtype == np.float32
+
+    def test_batch_embeds_only_new_distinct_queries(self, monkeypatch):
+        from src import embeddings
+
+        calls = []
+
+        def fake_embed(texts):
+            calls.append(list(texts))
+            return np.arange(len(texts) * 4, dtype=np.float32).reshape(len(texts), 4)
+
+        monkeypatch.setattr(embeddings, "embed_texts", fake_embed)
+        embeddings.embed_query("grace")
+        vectors = embeddings.embed_queries(["faith", "grace", "faith", "hope"])
+        assert calls[-1] == ["faith", "hope"]
+        assert vectors.shape == (4, 4)
+        assert np.array_equal(vectors[0], vectors[2])
+
+
+class TestJobQueue:
+    """Tests for the ingestion queue used in multi-worker mode."""
+
+    def test_claim_and_finish(self):
+        job_id = jobs.enqueue("ingest_openalex", {"query": "grace"})
+        job = jobs.claim_next()
+        assert job["id"] == job_id and job["status"] == "running"
+        assert jobs.claim_next() is None
+
+        jobs.finish(job_id, result={"ingested": 3})
+        assert jobs.get_job(job_id)["result"] == {"ingested": 3}
+
+    def test_interrupted_jobs_are_requeued(self):
+        jobs.enqueue("ingest_openalex", {"query": "grace"})
+        jobs.claim_next()
+        assert jobs.requeue_running() == 1
+        assert jobs.claim_next() is not None
+
+    def test_only_one_writer(self):
+        with jobs.writer_lock():
+            with pytest.raises(RuntimeError):
+                with jobs.writer_lock():
+                    pass
+
+    def test_ingest_runs_under_the_writer_lock(self, client, monkeypatch):
+        def fake_run_job(job):
+            with pytest.raises(RuntimeError):  # held by this request
+                with jobs.writer_lock():
+                    pass
+            return {"ingested": 2}
+
+        monkeypatch.setattr(jobs, "run_job", fake_run_job)
+        response = client.post("/ingest", json={"query": "grace", "max_results": 2})
+        assert response.status_code == 200 and response.json() == {"ingested": 2}
+
+    def test_ingest_is_queued_while_another_process_writes(self, client):
+        with jobs.writer_lock():  # e.g. ingest_theology.py or the writer process
+            response = client.post("/ingest", json={"query": "grace", "max_results": 2})
+        assert response.status_code == 202
+        assert jobs.get_job(response.json()["job_id"])["kind"] == "ingest_openalex"
+
+    def test_ingest_script_queues_its_pass_for_the_writer(self, monkeypatch):
+        import argparse
+
+        import ingest_theology
+
+        monkeypatch.setattr(ingest_theology, "ingest", lambda args: pytest.fail("wrote without the lock"))
+        with jobs.writer_lock():
+            ingest_theology.run(argparse.Namespace(shard=None, incremental=True))
+        job = jobs.claim_next()
+        assert job["kind"] == "ingest_incremental" and job["payload"] == {"incremental": True}
+
+
+class TestReadOnlyServing:
+    """Tests for read-only workers."""
+
+    def test_writes_are_refused(self, temp_store, monkeypatch):
+        monkeypatch.setattr(temp_store.SETTINGS, "read_only", True)
+        with pytest.raises(RuntimeError, match="read-only"):
+            temp_store.add_documents([{"id": "a", "text": "x"}], embeddings=np.ones((1, 4)))
+
+    def test_ingest_is_queued(self, client, monkeypatch):
+        from src import main
+
+        monkeypatch.setattr(main.settings, "read_only", True)
+        response = client.post("/ingest", json={"query": "grace", "max_results": 2})
+        assert response.status_code == 202
+        job = client.get(f"/jobs/{response.json()['job_id']}").json()
+        assert job["status"] == "queued" and job["payload"]["query"] == "grace"
+
+    def test_reader_reopens_after_another_process_writes(self, temp_store):
+        temp_store.add_documents([{"id": "a", "text": "x"}], embeddings=np.ones((1, 4)))
+        assert not temp_store.refresh_if_changed(force=True)
+
+        shared_state.bump_counter(temp_store.GENERATION_COUNTER)  # as the writer process would
+        assert temp_store.refresh_if_changed(force=True)
+        assert temp_store.query_by_embedding(np.ones(4, dtype=np.float32), top_k=1)[0]["id"] == "a"
@@ -0,0 +1,67 @@
+"""
+Tests for vector store snapshots: export, import into an empty node and
+alias restoration.
+
+Run with: pytest tests/test_snapshot.py -v
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from src import docstore, reindex, shared_state, snapshot  # noqa: E402
+
+
+@pytest.fixture
+def store(temp_store, monkeypatch):
+    """Temporary store with 30 documents behind the `grayson` alias."""
+    monkeypatch.setattr(temp_store.SETTINGS, "shard_mode", "none")
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((30, 8)).astype(np.float32)
+    records = [{"id": f"W{i}", "text": f"abstract {i}", "metadata": {"title": f"Paper {i}"}} for i in range(30)]
+    temp_store.add_documents(records, embeddings=embeddings)
+    assert reindex.reindex(["grayson"], pause=0)["swapped"]
+    return temp_store, embeddings
+
+
+def _fresh_node(store, tmp_path, monkeypatch):
+    """Point the store, shared state and document store at empty locations, like a new machine."""
+    import chromadb
+
+    node = tmp_path / "node2"
+    monkeypatch.setattr(store.SETTINGS, "chroma_persist_directory", str(node / "chroma_db"))
+    monkeypatch.setattr(store, "_client", chromadb.PersistentClient(path=str(node / "chroma_db")))
+    monkeypatch.setattr(store, "_collections", {})
+    monkeypatch.setattr(store, "_quantized_indexes", {})
+    monkeypatch.setattr(store, "_centroids", {})
+    monkeypatch.setattr(shared_state.SETTINGS, "state_db", str(node / "state.sqlite3"))
+    monkeypatch.setattr(docstore.SETTINGS, "docstore_path", str(node / "docs.sqlite3"))
+
+
+class TestRoundTrip:
+    """Tests for export followed by import on an empty store."""
+
+    def test_export_then_import_restores_documents_and_aliases(self, store, tmp_path, monkeypatch):
+        vectorstore, embeddings = store
+        target = vectorstore.resolve_alias("grayson")
+        manifest = snapshot.export_snapshot(str(tmp_path / "snap"), names=["grayson"])
+        assert list(manifest["collections"]) == [target]
+        assert json.loads((tmp_path / "snap" / snapshot.MANIFEST_FILE).read_text())["aliases"] == {"grayson": target}
+
+        _fresh_node(vectorstore, tmp_path, monkeypatch)
+        assert vectorstore.list_collection_names() == []
+        assert snapshot.import_snapshot(str(tmp_path / "snap")) == {target: 30}
+
+        assert vectorstore.resolve_alias("grayson") == target
+        hits = vectorstore.hydrate(vectorstore.query_by_embedding(embeddings[7], top_k=1))
+        assert hits[0]["id"] == "W7" and hits[0]["document"] == "abstract 7"
+        assert hits[0]["metadata"]["title"] == "Paper 7"
+
+    def test_import_refuses_another_embedding_model(self, store, tmp_path, monkeypatch):
+        snapshot.export_snapshot(str(tmp_path / "snap"))
+        monkeypatch.setattr(snapshot.SETTINGS, "embedding_model", "text-embedding-3-large")
+        with pytest.raises(RuntimeError, match="text-embedding-3-small"):
+            snapshot.import_snapshot(str(tmp_path / "snap"))
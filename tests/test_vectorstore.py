@@ -0,0 +1,92 @@
+"""
+Tests for the Chroma vector store wrapper.
+
+Run with: pytest tests/test_vectorstore.py -v
+"""
+
+import numpy as np
+
+
+def _records(count):
+    return [
+        {"id": f"https://openalex.org/W{i}", "text": f"abstract {i}", "metadata": {"doi": f"10.1/{i}"}}
+        for i in range(count)
+    ]
+
+
+class TestAddDocuments:
+    """Tests for loading documents with precomputed embeddings."""
+
+    def test_precomputed_embeddings_skip_the_api(self, temp_store, monkeypatch):
+        def fail(texts):
+            raise AssertionError("embed_documents should not be called")
+
+        monkeypatch.setattr(temp_store, "embed_documents", fail)
+        records = _records(3)
+        records[1]["text"] = "   "  # skipped; its embedding row must be dropped too
+        embeddings = np.eye(3, 8, dtype=np.float32)
+
+        temp_store.add_documents(records, embeddings=embeddings)
+
+        hits = temp_store.query_by_embedding(embeddings[2], top_k=1)
+        assert hits[0]["id"] == "https___openalex.org_W2"
+        assert temp_store.get_collection().count() == 2
+
+    def test_batches_above_chroma_max_batch_size(self, temp_store):
+        count = temp_store.get_client().get_max_batch_size() + 10
+        embeddings = np.random.default_rng(0).standard_normal((count, 4)).astype(np.float32)
+
+        temp_store.add_documents(_records(count), embeddings=embeddings)
+
+        assert temp_store.get_collection().count() == count
+
+
+class TestQueryMany:
+    """Tests for searching several query vectors at once."""
+
+    def test_matches_single_queries(self, temp_store, monkeypatch):
+        rng = np.random.default_rng(1)
+        embeddings = rng.standard_normal((50, 8)).astype(np.float32)
+        temp_store.add_documents(_records(50), embeddings=embeddings)
+        queries = embeddings[[3, 17, 42]] + 0.01
+
+        batched = temp_store.query_many(queries, top_k=3)
+        singles = [temp_store.query_by_embedding(q, top_k=3) for q in queries]
+        assert [[h["id"] for h in hits] for hits in batched] == [[h["id"] for h in hits] for hits in singles]
+        assert [hits[0]["id"] for hits in batched] == [f"https___openalex.org_W{i}" for i in (3, 17, 42)]
+
+    def test_hash_shards_merge_per_query(self, temp_store, monkeypatch):
+        monkeypatch.setattr(temp_store.SETTINGS, "shard_mode", "hash")
+        monkeypatch.setattr(temp_store.SETTINGS, "shard_count", 3)
+        embeddings = np.random.default_rng(2).standard_normal((30, 8)).astype(np.float32)
+        temp_store.add_documents(_records(30), embeddings=embeddings)
+
+        batched = temp_store.query_many(embeddings[[0, 29]], top_k=4)
+        assert [len(hits) for hits in batched] == [4, 4]
+        assert [hits[0]["id"] for hits in batched] == ["https___openalex.org_W0", "https___openalex.org_W29"]
+        distances = [h["distance"] for h in batched[0]]
+        assert distances == sorted(distances)
+
+
+class TestHnswSettings:
+    """Tests for the HNSW settings new collections are created with."""
+
+    def test_new_collections_use_the_configured_index(self, temp_store, monkeypatch):
+        monkeypatch.setattr(temp_store.SETTINGS, "hnsw_space", "cosine")
+        monkeypatch.setattr(temp_store.SETTINGS, "hnsw_m", 24)
+        monkeypatch.setattr(temp_store.SETTINGS, "hnsw_search_ef", 80)
+        collection = temp_store.get_collection()
+        assert collection.metadata["hnsw:M"] == 24 and collection.metadata["hnsw:search_ef"] == 80
+        assert temp_store.collection_space(collection) == "cosine"
+
+        # Cosine ignores length: a scaled copy of a stored vector is an exact match
+        embeddings = np.eye(3, 8, dtype=np.float32) + 0.1
+        temp_store.add_documents(_records(3), embeddings=embeddings)
+        hits = temp_store.query_by_embedding(embeddings[1] * 10, top_k=1)
+        assert hits[0]["id"] == "https___openalex.org_W1" and hits[0]["distance"] < 1e-4
+
+    def test_existing_collections_keep_their_index(self, temp_store, monkeypatch):
+        temp_store.get_collection()
+        monkeypatch.setattr(temp_store.SETTINGS, "hnsw_m", 48)
+        monkeypatch.setattr(temp_store, "_collections", {})
+        assert temp_store.get_collection().metadata["hnsw:M"] != 48
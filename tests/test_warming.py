@@ -0,0 +1,178 @@
+"""
+Tests for the query log, the answer cache and predictive cache warming.
+
+Run with: pytest tests/test_warming.py -v
+"""
+
+import json
+import time
+from datetime import datetime, timezone
+
+import httpx
+import openai
+import pytest
+
+from src import jobs, shared_state, usage_tracker, warming
+from src.vectorstore import GENERATION_COUNTER
+
+
+def log(question, day, times=1):
+    """Record `question` as asked `times` times on `day`."""
+    warming._today = lambda: day
+    for _ in range(times):
+        warming.record_query(question)
+
+
+@pytest.fixture(autouse=True)
+def today(monkeypatch):
+    """Pin the query log's clock (restored after each test)."""
+    monkeypatch.setattr(warming, "_today", lambda: "2026-10-15")
+
+
+class TestQueryLog:
+    """Tests for recording and ranking questions."""
+
+    def test_variants_are_counted_together(self):
+        log("Who was Karl Barth?", "2026-10-15")
+        log("  who was karl   BARTH ", "2026-10-15")
+        (entry,) = warming.popular_questions()
+        assert entry["count"] == 2 and entry["question"] == "who was karl   BARTH"
+
+    def test_recent_questions_outrank_older_ones(self):
+        log("What is kenosis?", "2026-10-05", times=5)  # popular ten days ago
+        log("What is the filioque?", "2026-10-14", times=3)  # trending now
+        log("What is perichoresis?", "2026-09-01", times=50)  # outside the window
+        warming._today = lambda: "2026-10-15"
+        ranked = [e["question"] for e in warming.popular_questions()]
+        assert ranked == ["What is the filioque?", "What is kenosis?"]
+        assert warming.prune_log() == 1
+
+
+class TestAnswerCache:
+    """Tests for serving repeated questions from the answer cache."""
+
+    @pytest.fixture
+    def stubbed(self, client, monkeypatch):
+        from src import main
+
+        calls = {"search": 0}
+        hits = [{"id": "W1", "document": "Grace.", "metadata": {"title": "Grace", "doi": "10.1/x"}}]
+
+        def fake_query(question, top_k=5):
+            calls["search"] += 1
+            return [dict(h) for h in hits]
+
+        async def no_pdfs(sources):
+            return sources
+
+        monkeypatch.setattr(main, "vector_query", fake_query)
+        monkeypatch.setattr(main, "enrich_sources_with_pdfs", no_pdfs)
+        monkeypatch.setattr(main.llm, "generate", lambda question, docs: f"answer {calls['search']}")
+        monkeypatch.setattr(main.settings, "rate_limit_per_minute", 0.0)
+        return client, calls
+
+    def test_second_asking_skips_search_and_llm(self, stubbed):
+        client, calls = stubbed
+        first = client.post("/query", json={"question": "What is grace?"}).json()
+        second = client.post("/query", json={"question": "what is grace"}).json()
+        assert second == first and calls["search"] == 1
+        assert warming.popular_questions()[0]["count"] == 2
+
+        shared_state.bump_counter(GENERATION_COUNTER)  # the index changed
+        third = client.post("/query", json={"question": "What is grace?"}).json()
+        assert calls["search"] == 2 and third["answer"] == "answer 2"
+
+    def test_warmed_question_is_a_hit_through_post_query(self, stubbed, monkeypatch):
+        from src import pdf_lookup, vectorstore
+
+        client, calls = stubbed
+
+        async def no_pdfs(sources):
+            return sources
+
+        async def no_client():
+            pass
+
+        class FakeLLM:
+            def generate(self, question, hits):
+                return "warmed answer"
+
+        monkeypatch.setattr(vectorstore, "query", lambda question, top_k=5: [])
+        monkeypatch.setattr(pdf_lookup, "enrich_sources_with_pdfs", no_pdfs)
+        monkeypatch.setattr(pdf_lookup, "close_http_client", no_client)
+        for question in ("Who wrote the Didache?",  # simple, standard and complex tiers
+                         "Why does Paul describe grace as a gift in Romans?",
+                         "Compare and contrast Augustine and Pelagius on grace"):
+            assert warming.warm_question(question, FakeLLM())
+            # What the frontend sends: no top_k, so the tier picks it, as it did for warming
+            response = client.post("/query", json={"question": question}).json()
+            assert response["answer"] == "warmed answer"
+        assert calls["search"] == 0
+
+    def test_stream_failing_partway_is_not_cached(self, stubbed, monkeypatch):
+        from src import main, openai_scheduler
+
+        client, calls = stubbed
+        chunk = {"id": "c1", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o-mini",
+                 "choices": [{"index": 0, "delta": {"content": "Grace is "}, "finish_reason": None}]}
+
+        class DropsAfterFirstChunk(httpx.SyncByteStream):
+            def __iter__(self):
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+                raise httpx.ReadError("connection reset")
+
+        def handler(request):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                                  stream=DropsAfterFirstChunk())
+
+        monkeypatch.setattr(main.llm, "_client", openai.OpenAI(
+            api_key="test", base_url="http://fake.test/v1", max_retries=0,
+            http_client=httpx.Client(transport=httpx.MockTransport(handler))))
+        monkeypatch.setattr(main.llm, "mode", "api")
+        monkeypatch.setattr(main.settings, "openai_api_key", "test")
+        monkeypatch.setattr(openai_scheduler, "_scheduler", None)
+
+        lines = client.post("/query/stream", json={"question": "What is grace?"}).text.splitlines()
+        deltas = [json.loads(line)["delta"] for line in lines if "delta" in line]
+        assert deltas[0] == "Grace is " and deltas[-1].startswith("Error calling OpenAI")
+        assert warming.lookup("What is grace?", None) is None
+
+    def test_failed_answers_are_not_cached(self):
+        assert not warming.store_answer("q", None, {"answer": "Error calling OpenAI: boom", "sources": [],
+                                                    "library_links": {}})
+        assert warming.cached_answer("q") is None
+
+
+class TestWarm:
+    """Tests for the warming run and its spend cap."""
+
+    def test_stops_at_the_spend_cap(self, monkeypatch):
+        log("What is grace?", "2026-10-15", times=3)
+        log("Who was Augustine?", "2026-10-15", times=2)
+        log("What is the Trinity?", "2026-10-15")
+        warmed = []
+
+        def fake_warm(question, llm=None):
+            warmed.append(question)
+            usage_tracker.record_usage("gpt-3.5-turbo-output", 100_000)  # $0.15
+            return True
+
+        monkeypatch.setattr(warming, "warm_question", fake_warm)
+        result = warming.warm(spend_cap=0.25, include_topics=False)
+        assert warmed == ["What is grace?", "Who was Augustine?"]
+        assert result["stopped"] == "spend_cap" and result["spent"] == pytest.approx(0.30)
+
+    def test_thin_log_is_filled_with_topics(self):
+        log("What is grace?", "2026-10-15")
+        questions = warming.warm(limit=3, dry_run=True)["questions"]
+        assert questions == ["What is grace?", "systematic theology", "biblical theology"]
+
+    def test_writer_queues_warming_once_in_its_hour(self, monkeypatch):
+        now = time.time()
+        monkeypatch.setattr(jobs.SETTINGS, "warm_cache_hour", datetime.fromtimestamp(now, timezone.utc).hour)
+        assert jobs.schedule_due_jobs(now=now + 3600) is None  # not the warming hour
+        job_id = jobs.schedule_due_jobs(now=now)
+        assert jobs.get_job(job_id)["kind"] == "warm_cache"
+        jobs.finish(jobs.claim_next()["id"], result={})
+        assert jobs.schedule_due_jobs(now=now + 60) is None  # already warmed today
+        assert jobs.schedule_due_jobs(now=now + 24 * 3600) is not None